@@ -0,0 +1,308 @@
+"""
+性能基准测试
+
+对每个数据量倍数生成（或复用）合成的 GroupConfig.db，在独立子进程中以
+QT_QPA_PLATFORM=offscreen 运行各界面的打开、过滤、选择联动，以及规则快照与批量分组，
+结果写成 JSON；指定 --baseline 时与基准结果比较，变慢超过阈值的项目列为回退并以退出码 1 结束。
+
+用法:
+    python -m benchmarks.run_benchmarks --scales 1 10 --output bench.json
+    python -m benchmarks.run_benchmarks --scales 1 --baseline bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CASES = 20000
+DEFAULT_THRESHOLD = 0.25
+# 与基准相差不到该毫秒数的项目不判定为回退（避免极短耗时的抖动）
+MIN_DELTA_MS = 1.0
+
+
+def _timed(fn, repeat=1):
+    """执行 repeat 次，返回 {'ms': 中位数, 'runs': [...]}"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return {'ms': round(statistics.median(runs), 3), 'runs': [round(r, 3) for r in runs]}
+
+
+def _per_call(times):
+    """逐次耗时（如每次按键）汇总：平均值作为比较用的 ms，同时给出最大值"""
+    return {'ms': round(statistics.mean(times), 3), 'max_ms': round(max(times), 3), 'calls': len(times)}
+
+
+class ViewBench:
+    """在一个 QApplication 中运行界面相关的测试"""
+
+    def __init__(self):
+        from PySide6.QtWidgets import QApplication, QMessageBox
+        # 测试中不弹出模态对话框
+        for name in ('information', 'warning', 'critical', 'question'):
+            setattr(QMessageBox, name, staticmethod(lambda *args, **kwargs: None))
+        self.app = QApplication.instance() or QApplication([])
+
+    def pump(self, until=None, timeout=10.0):
+        """处理事件直到 until() 为真（或超时）；until 为空时处理一轮"""
+        end = time.perf_counter() + timeout
+        while True:
+            self.app.processEvents()
+            if until is None or until() or time.perf_counter() > end:
+                return
+
+    def type_filter(self, set_filter, text):
+        """逐字输入 text，返回每次过滤的耗时(毫秒)"""
+        times = []
+        for i in range(1, len(text) + 1):
+            start = time.perf_counter()
+            set_filter(text[:i])
+            times.append((time.perf_counter() - start) * 1000)
+        set_filter('')
+        return times
+
+
+def run_child(db_path, cases_count, workers, output):
+    """子进程：数据库连接配置已由环境变量指向合成库"""
+    results = {}
+
+    from models.database import SessionLocal
+    from models.maindiagindex_model import MainDiagIndex
+    from models.mainsurgeryindex_model import MainSurgeryIndex
+    from engine import snapshot as snapshot_module
+    from engine.snapshot import RuleSnapshot, default_snapshot_path, get_snapshot, load_or_build
+    from benchmarks.synth_db import synth_cases
+
+    views = ViewBench()
+
+    # 快照加载前：分批读取的界面
+    from views.w_except import w_except
+    from views.w_group_query import w_group_query
+    results['view.except.open'] = _timed(w_except)
+    widget = w_except()
+    model = widget.exceptdiag_model
+
+    def drain():
+        while model.canFetchMore():
+            model.fetchMore()
+    results['view.except.drain'] = _timed(drain)
+    results['filter.except.diag'] = _per_call(views.type_filter(model.set_filter, model.value(model.rowCount() // 2, 1)))
+    results['view.group_query.open_paged'] = _timed(w_group_query)
+
+    # 规则快照
+    snapshot_path = default_snapshot_path(db_path)
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+    results['snapshot.build'] = _timed(lambda: load_or_build(db_path, snapshot_path))
+    results['snapshot.load'] = _timed(lambda: RuleSnapshot.load(snapshot_path), repeat=3)
+    results['snapshot.file_bytes'] = {'bytes': os.path.getsize(snapshot_path)}
+    snap = get_snapshot()
+
+    # 快照加载后的界面
+    from views.w_adrg import w_adrg
+    from views.w_cc_query import w_cc_query
+    results['view.group_query.open'] = _timed(w_group_query, repeat=3)
+    results['view.adrg.open'] = _timed(w_adrg, repeat=3)
+    results['view.cc.open'] = _timed(w_cc_query, repeat=3)
+
+    group_query = w_group_query()
+    diag_model = group_query.maindiagindex_model
+    views.pump()
+    diag_model.build_search_index()
+    sample = diag_model.value(diag_model.rowCount() // 3, 1)
+    results['filter.group_query.diag'] = _per_call(views.type_filter(diag_model.set_filter, sample))
+    results['filter.group_query.diag_code'] = _per_call(
+        views.type_filter(diag_model.set_filter, diag_model.value(diag_model.rowCount() // 5, 0)))
+
+    adrg = w_adrg()
+    adrg.show()
+    results['filter.adrg.adrg'] = _per_call(views.type_filter(adrg.adrg_model.set_filter, 'W1'))
+
+    # ADRG 联动：选中后等到五个联动表格刷新
+    loaded = []
+    adrg.drgsgroup_model.modelReset.connect(lambda: loaded.append(1))
+
+    def select_rows(rows):
+        times = []
+        for row in rows:
+            del loaded[:]
+            start = time.perf_counter()
+            adrg.AdrgTable.selectRow(row)
+            views.pump(lambda: bool(loaded))
+            times.append((time.perf_counter() - start) * 1000)
+        return times
+    rows = list(range(0, adrg.adrg_model.rowCount(), max(1, adrg.adrg_model.rowCount() // 20)))
+    results['select.adrg.cold'] = _per_call(select_rows(rows))
+    results['select.adrg.warm'] = _per_call(select_rows(rows))
+
+    # 并发症：按前缀逐字查询，再选中行查询排除表
+    cc = w_cc_query()
+    code = snap.tables['CC'][len(snap.tables['CC']) // 2][0]
+    results['lookup.cc_prefix'] = _per_call(views.type_filter(lambda text: cc.perform_query(text) if text else None, code))
+    cc.perform_query(code[:3])
+
+    def select_cc():
+        times = []
+        for row in range(min(cc.cc_model.rowCount(), 20)):
+            start = time.perf_counter()
+            cc.ccView.selectRow(row)
+            times.append((time.perf_counter() - start) * 1000)
+        return times
+    results['select.cc.excludes'] = _per_call(select_cc())
+
+    # 批量分组
+    from engine.grouper import Grouper
+    from engine.parallel import ParallelGrouper
+    session = SessionLocal()
+    try:
+        diags = [row[0] for row in session.query(MainDiagIndex.diagcode).distinct()]
+        opers = [row[0] for row in session.query(MainSurgeryIndex.opercode).distinct()]
+    finally:
+        session.close()
+    cases = synth_cases(diags, opers, cases_count)
+    grouper = Grouper(snap.rules)
+    result = _timed(lambda: grouper.group_many(cases), repeat=3)
+    result['cases_per_s'] = round(cases_count / result['ms'] * 1000)
+    results['group.serial'] = result
+    if workers > 1:
+        with ParallelGrouper(workers=workers) as pool:
+            pool.start()  # 启动工作进程不计入（只有一个可用 CPU 时不启动，在本进程中分组）
+            result = _timed(lambda: pool.group_many(cases), repeat=3)
+        result['cases_per_s'] = round(cases_count / result['ms'] * 1000)
+        result['workers'] = workers
+        result['pool'] = pool.parallel
+        results['group.parallel'] = result
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def ensure_database(workdir, scale):
+    """合成库按倍数缓存在工作目录中，已存在时直接复用"""
+    from benchmarks.synth_db import generate
+    path = os.path.join(workdir, f'GroupConfig_x{scale:g}.db')
+    if not os.path.exists(path):
+        print(f"生成 {scale:g} 倍合成规则库: {path}")
+        generate(path, scale)
+    return path
+
+
+def run_scale(db_path, cases_count, workers):
+    """在子进程中运行一个数据量下的全部测试（每次从空缓存开始）"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        output = f.name
+    env = dict(os.environ)
+    env.update({
+        'QT_QPA_PLATFORM': 'offscreen',
+        'CHSDRG_DB_PATH': db_path,
+        'CHSDRG_DB_ECHO': 'false',
+    })
+    env.pop('CHSDRG_SQL_TIMING', None)
+    command = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--child', db_path,
+               '--cases', str(cases_count), '--workers', str(workers), '--output', output]
+    try:
+        subprocess.run(command, cwd=APP_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL if not os.environ.get('CHSDRG_BENCH_VERBOSE') else None)
+        with open(output, encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """比较两次结果中同名项目的 ms，返回 [(倍数, 项目, 基准ms, 当前ms, 比值, 是否回退)]"""
+    rows = []
+    for scale, results in current['scales'].items():
+        base_results = baseline.get('scales', {}).get(scale, {})
+        for name, result in results.items():
+            base = base_results.get(name)
+            if not base or 'ms' not in result or 'ms' not in base or not base['ms']:
+                continue
+            ratio = result['ms'] / base['ms']
+            regressed = ratio > 1 + threshold and result['ms'] - base['ms'] > MIN_DELTA_MS
+            rows.append((scale, name, base['ms'], result['ms'], ratio, regressed))
+    return rows
+
+
+def print_results(report):
+    for scale, results in report['scales'].items():
+        print(f"\n== 数据量 x{scale}")
+        for name, result in results.items():
+            if 'ms' in result:
+                extra = ''
+                if 'max_ms' in result:
+                    extra = f"  (最大 {result['max_ms']:.2f} ms, {result['calls']} 次)"
+                if 'cases_per_s' in result:
+                    extra = f"  ({result['cases_per_s']} 例/秒)"
+                print(f"  {name:<32}{result['ms']:>10.2f} ms{extra}")
+            else:
+                print(f"  {name:<32}{result}")
+
+
+def print_comparison(rows, threshold):
+    print(f"\n== 与基准比较（变慢超过 {threshold:.0%} 且超过 {MIN_DELTA_MS:g} ms 判定为回退）")
+    for scale, name, base_ms, ms, ratio, regressed in rows:
+        flag = '回退' if regressed else ''
+        print(f"  x{scale:<5}{name:<32}{base_ms:>10.2f} -> {ms:>10.2f} ms  {ratio:>6.2f}x  {flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="chs-drg 性能基准测试")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0], help="合成规则库的数据量倍数")
+    parser.add_argument('--cases', type=int, default=DEFAULT_CASES, help="批量分组测试的病例数")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help="并行分组的进程数，1 为不测试")
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'chsdrg_bench'), help="合成规则库存放目录")
+    parser.add_argument('--output', help="结果 JSON 文件")
+    parser.add_argument('--baseline', help="基准结果 JSON 文件，与之比较")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="判定回退的变慢比例")
+    parser.add_argument('--child', metavar='DB', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.cases, args.workers, args.output)
+        return 0
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'cases': args.cases,
+            'workers': args.workers,
+        },
+        'scales': {},
+    }
+    for scale in args.scales:
+        db_path = ensure_database(args.workdir, scale)
+        print(f"运行 x{scale:g} ...")
+        report['scales'][f'{scale:g}'] = run_scale(db_path, args.cases, args.workers)
+
+    print_results(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[5] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
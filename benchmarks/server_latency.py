@@ -0,0 +1,65 @@
+"""
+分组服务(server.py)的延迟测试
+
+用一个长连接依次发送单条分组请求，报告 p50/p99/最大延迟；病例由规则库中的诊断、手术编码随机组成。
+
+用法:
+    python server.py --port 8765 &
+    python -m benchmarks.server_latency --db data/GroupConfig.db --requests 5000
+"""
+import argparse
+import http.client
+import json
+import sqlite3
+import time
+from benchmarks.synth_db import synth_cases
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分组服务延迟测试")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', required=True, help="取诊断、手术编码的规则库")
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=0, help="大于 0 时改为测试该条数的批量分组")
+    args = parser.parse_args(argv)
+
+    con = sqlite3.connect(args.db)
+    try:
+        diags = [row[0] for row in con.execute('select distinct diagcode from MainDiagIndex')]
+        opers = [row[0] for row in con.execute('select distinct opercode from MainSurgeryIndex')]
+    finally:
+        con.close()
+    cases = synth_cases(diags, opers, max(args.requests, args.batch))
+
+    conn = http.client.HTTPConnection(args.host, args.port)
+    headers = {'Content-Type': 'application/json'}
+    latencies = []
+    if args.batch:
+        path = '/group/batch'
+        bodies = [json.dumps({'cases': cases[:args.batch]}) for _ in range(max(1, args.requests // args.batch))]
+    else:
+        path = '/group'
+        bodies = [json.dumps({'main_diag': main, 'other_diags': others, 'procedures': procedures})
+                  for main, others, procedures in cases[:args.requests]]
+    for body in bodies:
+        start = time.perf_counter()
+        conn.request('POST', path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status != 200:
+            raise SystemExit(f"请求失败: HTTP {response.status}")
+    conn.close()
+
+    latencies.sort()
+    print(f"{path}: {len(latencies)} 次请求  p50 {percentile(latencies, 0.5):.3f} ms  "
+          f"p99 {percentile(latencies, 0.99):.3f} ms  最大 {latencies[-1]:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+生成合成的 GroupConfig.db，用于性能测试
+
+按 CHS-DRG 一个完整版本的规模（约 400 个 ADRG、3 万诊断、1.2 万手术）生成全部规则表，
+scale 为倍数（如 10 表示十倍数据量）。编码与名称为虚构，但表结构与模型一致，
+各表之间的引用关系（MDC 诊断池、主诊/主手/次诊池、CC 与排除表、DRG 细分组）可以正常分组。
+
+用法: python -m benchmarks.synth_db 输出文件.db [--scale 1] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sqlite3
+
+# 与发布的规则库相同的表结构（列顺序与 models 中的定义一致；Adrg 编码为文本）
+SCHEMA = '''
+CREATE TABLE Adrg (AdrgCode VARCHAR(10) PRIMARY KEY, AdrgName VARCHAR(50) NOT NULL,
+                   ScdLetter VARCHAR(100) NOT NULL, Dept VARCHAR(100) NOT NULL);
+CREATE TABLE AdrgMdcDiag (mdccode VARCHAR(5), diagcode VARCHAR(50), diagname VARCHAR(300), submdc VARCHAR(100),
+                          PRIMARY KEY (mdccode, diagcode));
+CREATE TABLE MainDiagIndex (acode VARCHAR(10), diagcode VARCHAR(50), diagname VARCHAR(300), grpno INTEGER,
+                            PRIMARY KEY (acode, diagcode));
+CREATE TABLE MainSurgeryIndex (acode VARCHAR(10), opercode VARCHAR(50), opername VARCHAR(300), grpno INTEGER,
+                               PRIMARY KEY (acode, opercode));
+CREATE TABLE OtherDiagIndex (acode VARCHAR(10), diagcode VARCHAR(50), diagname VARCHAR(300), grpno INTEGER,
+                             PRIMARY KEY (acode, diagcode));
+CREATE TABLE CC (diagcode VARCHAR(50) PRIMARY KEY, tb VARCHAR(50) NOT NULL UNIQUE,
+                 cctype VARCHAR(100) NOT NULL, ccl INTEGER NOT NULL);
+CREATE TABLE Exclude (tb VARCHAR(50) NOT NULL, maindiag VARCHAR(50) NOT NULL, PRIMARY KEY (tb, maindiag));
+CREATE TABLE DrgsGroup (grpcode VARCHAR(50) PRIMARY KEY, grpname VARCHAR(300) NOT NULL UNIQUE,
+                        iszz INTEGER NOT NULL, iscz INTEGER, isop VARCHAR(1) NOT NULL, rule VARCHAR(100),
+                        paycw NUMERIC(10, 2), acode VARCHAR(10) NOT NULL);
+CREATE TABLE ExceptDiag (diagcode VARCHAR(50) PRIMARY KEY, diagname VARCHAR(200) NOT NULL UNIQUE);
+CREATE TABLE ExceptOper (opercode VARCHAR(50) PRIMARY KEY, opername VARCHAR(200) NOT NULL UNIQUE);
+CREATE INDEX ix_MainDiagIndex_diagcode ON MainDiagIndex (diagcode);
+CREATE INDEX ix_MainSurgeryIndex_opercode ON MainSurgeryIndex (opercode);
+CREATE INDEX ix_OtherDiagIndex_diagcode ON OtherDiagIndex (diagcode);
+CREATE INDEX ix_AdrgMdcDiag_diagcode ON AdrgMdcDiag (diagcode);
+'''
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+# 每个 MDC 的 ADRG：外科、非手术室操作、内科
+SURGICAL_SUFFIXES = 'BCDEFGJ'
+PROCEDURE_SUFFIXES = 'KL'
+MEDICAL_SUFFIXES = 'RSTUVW'
+
+# scale=1 时的行数
+BASE_DIAGS = 30000
+BASE_OPERS = 12000
+BASE_EXCEPT_DIAGS = 800
+BASE_EXCEPT_OPERS = 300
+
+
+def _adrgs():
+    adrgs = []
+    for letter in LETTERS:
+        adrgs += [(letter + s + '1', '外科') for s in SURGICAL_SUFFIXES]
+        adrgs += [(letter + s + '1', '非手术室操作') for s in PROCEDURE_SUFFIXES]
+        adrgs += [(letter + s + '1', '内科') for s in MEDICAL_SUFFIXES]
+    return adrgs
+
+
+def diag_codes(n):
+    return ['%s%02d.%03d%s' % (LETTERS[i % 26], (i // 26) % 100, (i // 2600) % 1000,
+                               '' if i < 2600000 else 'x%d' % (i // 2600000)) for i in range(n)]
+
+
+def oper_codes(n):
+    return ['%02d.%02d%02d%s' % (i % 100, (i // 100) % 100, (i // 10000) % 100,
+                                 '' if i < 1000000 else 'x%d' % (i // 1000000)) for i in range(n)]
+
+
+def generate(path, scale=1.0, seed=1):
+    """生成数据库文件（已存在则覆盖），返回 (诊断编码列表, 手术编码列表)"""
+    rnd = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+
+    adrgs = _adrgs()
+    by_letter = {}
+    for acode, dept in adrgs:
+        by_letter.setdefault(acode[0], []).append((acode, dept))
+
+    diags = diag_codes(int(BASE_DIAGS * scale))
+    opers = oper_codes(int(BASE_OPERS * scale))
+
+    mdc_rows, main_rows, other_rows = [], [], []
+    for code in diags:
+        letter = LETTERS[rnd.randrange(1, 26)]
+        name = '诊断' + code
+        submdc = str(rnd.randrange(1, 9)) if letter == 'Z' else None
+        mdc_rows.append(('MDC' + letter, code, name, submdc))
+        if rnd.random() < 0.05:
+            other_letter = LETTERS[rnd.randrange(1, 26)]
+            if other_letter != letter:
+                mdc_rows.append(('MDC' + other_letter, code, name, None))
+        medical = [a for a, d in by_letter[letter] if d == '内科']
+        for acode in rnd.sample(medical, 2):
+            main_rows.append((acode, code, name, None))
+        if rnd.random() < 0.1:
+            surgical = [a for a, d in by_letter[letter] if d != '内科']
+            main_rows.append((rnd.choice(surgical), code, name, None))
+        if rnd.random() < 0.02:
+            other_rows.append((letter + 'W1', code, name, None))
+
+    oper_rows = set()
+    for code in opers:
+        letter = LETTERS[rnd.randrange(0, 26)]
+        surgical = [a for a, d in by_letter[letter] if d != '内科']
+        for acode in rnd.sample(surgical, 2):
+            oper_rows.add((acode, code, '手术' + code, None))
+
+    cc_rows, exclude_rows = [], []
+    for i, code in enumerate(diags):
+        if rnd.random() < 0.6:
+            tb = 'TB%07d' % i
+            ccl = 2 if rnd.random() < 0.3 else 1
+            cc_rows.append((code, tb, 'MCC' if ccl == 2 else 'CC', ccl))
+            for _ in range(rnd.randrange(1, 15)):
+                main = rnd.choice(diags)
+                exclude_rows.append((tb, main if rnd.random() < 0.8 else main[:3]))
+
+    drg_rows = []
+    for acode, dept in adrgs:
+        for suffix in rnd.choice([('1', '3', '5'), ('3', '5'), ('9',), ('1', '5')]):
+            drg_rows.append((acode + suffix, acode + suffix + '组', 0, 0, '0' if dept == '内科' else '1',
+                             None, round(rnd.uniform(0.3, 5), 2), acode))
+    for letter in LETTERS:
+        drg_rows.append((letter + 'QY', letter + 'QY组', 0, 0, '0', None, 1.0, letter + 'QY'))
+
+    con = sqlite3.connect(path)
+    try:
+        con.executescript(SCHEMA)
+        insert = 'insert or ignore into {} values ({})'
+        con.executemany(insert.format('Adrg', '?,?,?,?'), [(a, a + '组', a[1], d) for a, d in adrgs])
+        con.executemany(insert.format('AdrgMdcDiag', '?,?,?,?'), mdc_rows)
+        con.executemany(insert.format('MainDiagIndex', '?,?,?,?'), main_rows)
+        con.executemany(insert.format('MainSurgeryIndex', '?,?,?,?'), sorted(oper_rows))
+        con.executemany(insert.format('OtherDiagIndex', '?,?,?,?'), other_rows)
+        con.executemany(insert.format('CC', '?,?,?,?'), cc_rows)
+        con.executemany(insert.format('Exclude', '?,?'), exclude_rows)
+        con.executemany(insert.format('DrgsGroup', '?,?,?,?,?,?,?,?'), drg_rows)
+        con.executemany(insert.format('ExceptDiag', '?,?'),
+                        [('Z%02d.%05d' % (i % 100, i), '不应编码诊断%d' % i) for i in range(int(BASE_EXCEPT_DIAGS * scale))])
+        con.executemany(insert.format('ExceptOper', '?,?'),
+                        [('99.%05d' % i, '不应编码手术%d' % i) for i in range(int(BASE_EXCEPT_OPERS * scale))])
+        con.commit()
+    finally:
+        con.close()
+    return diags, opers
+
+
+def synth_cases(diags, opers, n, seed=2):
+    """随机病例 (主要诊断, 其他诊断, 手术)"""
+    rnd = random.Random(seed)
+    cases = []
+    for _ in range(n):
+        others = tuple(rnd.choice(diags) for _ in range(rnd.randrange(0, 8)))
+        procedures = tuple(rnd.choice(opers) for _ in range(rnd.randrange(0, 3)) if rnd.random() < 0.5)
+        cases.append((rnd.choice(diags), others, procedures))
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成的 GroupConfig.db")
+    parser.add_argument('path', help="输出的数据库文件")
+    parser.add_argument('--scale', type=float, default=1.0, help="数据量倍数（1 约为一个完整版本）")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    diags, opers = generate(args.path, args.scale, args.seed)
+    print(f"已生成 {args.path}: {len(diags)} 个诊断, {len(opers)} 个手术")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
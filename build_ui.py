@@ -0,0 +1,79 @@
+"""
+把 ui/*.ui 预编译为 ui/ui_<名称>.py（打包或更新界面后运行）
+
+程序启动时优先导入预编译的界面类，省去 QUiLoader 运行时解析 XML；
+预编译模块不存在或比 .ui 文件旧时自动退回运行时加载。
+
+用法: python build_ui.py [--check]
+"""
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+UI_DIR = os.path.join(APP_DIR, 'ui')
+
+
+def find_uic():
+    """pyside6-uic 命令（PySide6 自带）"""
+    uic = shutil.which('pyside6-uic')
+    if uic:
+        return [uic]
+    scripts = os.path.join(os.path.dirname(sys.executable), 'Scripts' if os.name == 'nt' else 'bin', 'pyside6-uic')
+    if os.path.exists(scripts) or os.path.exists(scripts + '.exe'):
+        return [scripts]
+    raise SystemExit("找不到 pyside6-uic，请确认已安装 PySide6")
+
+
+def top_widget(ui_path):
+    """.ui 文件顶层部件的 (类名, 对象名)"""
+    widget = ET.parse(ui_path).getroot().find('widget')
+    return widget.get('class'), widget.get('name')
+
+
+def compile_ui(uic, ui_path, out_path):
+    """生成界面模块，并在末尾写入 load_ui 使用的类名"""
+    base_class, object_name = top_widget(ui_path)
+    code = subprocess.run(uic + [ui_path], check=True, capture_output=True).stdout.decode('utf-8')
+    code = code.rstrip() + (f"\n\n\nUI_CLASS = Ui_{object_name}\n"
+                            f"UI_BASE_CLASS = '{base_class}'\n")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write(code)
+
+
+def is_stale(ui_path, out_path):
+    return not os.path.exists(out_path) or os.path.getmtime(out_path) < os.path.getmtime(ui_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预编译 ui/*.ui")
+    parser.add_argument('--check', action='store_true', help="只检查是否有需要重新编译的界面，有则以退出码 1 结束")
+    args = parser.parse_args(argv)
+
+    stale = []
+    for ui_path in sorted(glob.glob(os.path.join(UI_DIR, '*.ui'))):
+        name = os.path.splitext(os.path.basename(ui_path))[0]
+        out_path = os.path.join(UI_DIR, f'ui_{name}.py')
+        if is_stale(ui_path, out_path):
+            stale.append((name, ui_path, out_path))
+
+    if args.check:
+        for name, _, _ in stale:
+            print(f"需要重新编译: {name}.ui")
+        return 1 if stale else 0
+
+    uic = find_uic()
+    for name, ui_path, out_path in stale:
+        compile_ui(uic, ui_path, out_path)
+        print(f"已生成 {os.path.relpath(out_path, APP_DIR)}")
+    if not stale:
+        print("界面均已是最新")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
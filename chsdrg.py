@@ -0,0 +1,428 @@
+"""
+chs-drg 命令行工具
+
+用法:
+    python -m chsdrg group 病例.csv -o 结果.csv [--workers N] [--db 规则库]
+    python -m chsdrg regroup 结果.csv -o 新结果.csv --old-db 旧规则库 [--db 新规则库]
+    python -m chsdrg compare 旧规则库 新规则库 [-o 差异明细.csv]
+    python -m chsdrg casemix 结果.csv [-o 汇总.csv] [--by dept adrg_dept month] [--points 点值配置]
+
+group: 流式读取 CSV 病例逐条分组，在原有列之后追加 mdc、adrg、drg、ccl（并发症级别）、
+weight（DrgsGroup.paycw）、status 列，边读边写，内存占用与文件大小无关。
+病例列按表头自动识别（主要诊断/main_diag、其他诊断/other_diags、手术操作/procedures，
+可以是带序号的多列），也可以用 --main-col、--other-cols、--proc-cols 指定；
+一个单元格中的多个编码可用 | ; , 分隔。
+--versions 给出规则版本配置文件（见 engine.rule_store.RuleStore.from_config）时同时加载多个版本的规则库，
+每条病例按出院日期列（出院日期/discharge_date，或 --date-col 指定）选用对应版本，
+不在任何版本有效期内的病例 status 为 no_version。
+--cache-size N 时相同的 (主要诊断, 其他诊断集合, 手术集合) 只分组一次：分组结果按 LRU 缓存（engine.group_cache），
+--cache-size、--cache-memory 为每个分组进程的条数、内存上限，结束时输出命中率和节省的时间。
+默认不缓存：病例各不相同时命中率很低，计算缓存键和查找缓存的开销反而使分组变慢，
+重复病例多的数据（如同一病种的历年病例）再打开。
+--profile 时结束后再输出 MDC 确定、ADRG 匹配、CC/MCC 判定、DRG 细分组各阶段的用时，
+以及手术/内科路径入组、歧义组、未入组的病例数（engine.group_profile）。
+--normalize-codes format 时先规范编码写法（小写、全角、空格、缺小数点、扩展码、星号剑号标记，
+见 engine.code_index），ancestor 时再把规则表中没有的编码换成规则表中最近的上级编码；默认按原样分组。
+regroup 须与原结果分组时使用相同的设置；ancestor 时病例按新旧两版规则分别规范化，结果不同的也重新分组。
+
+输入为 Parquet（.parquet）或 Arrow IPC（.arrow/.feather）文件时按记录批逐批处理：
+其他诊断、手术可以是列表列，结果写成同样格式的列式文件，mdc/adrg/drg/status 为字典编码列
+（需要安装 pyarrow）。
+
+regroup: 新版规则库发布后对已有的分组结果文件（group 的输出）增量重新分组：
+逐表比较新旧两版规则得到受影响的编码，只重新分组含这些编码（或原结果落在变化的 ADRG/DRG）
+的病例，其余行原样沿用。
+
+compare: 比较两个版本的规则库，输出各规则表新增、删除、修改、移动（编码换了 ADRG/MDC）的条数，
+-o 写出逐条差异明细（规则表, 变化, 编码, 字段, 旧值, 新值）。
+
+casemix: 按科室、ADRG 内外科、出院月份等维度汇总分组结果文件的病例数、总权重和 CMI，
+权重取 --db 规则库的 DrgsGroup.paycw；--point-value 或 --points（按统筹区、月份的点值配置文件，
+见 engine.casemix.PointValueTable.from_config）给出点值时增加预估费用列。
+"""
+import argparse
+import contextlib
+import csv
+import gc
+import sys
+from collections import Counter
+from models.database import BATCH_PROFILE
+from engine.snapshot import default_db_path, default_snapshot_path, load_or_build
+from engine.parallel import DEFAULT_CHUNK_SIZE, ParallelGrouper, available_cpus
+from engine.group_cache import DEFAULT_MAX_BYTES, DEFAULT_MAX_ENTRIES, GroupCache
+from engine.group_profile import GroupProfile
+from engine.code_index import CodeIndex, CodeNormalizer
+from engine.rule_store import RuleStore, make_grouper
+from engine.batch_io import (CsvCaseReader, CsvResultWriter, Progress, group_batches, group_stream,
+                             result_values, stored_result_start)
+
+
+def print_messages(messages, quiet=False, stream=sys.stderr):
+    """规则快照重新生成等提示（输出到标准错误，不混入 -o - 的结果）"""
+    if not quiet:
+        for message in messages:
+            print(message, file=stream)
+
+
+def load_rules(db_path=None, quiet=False):
+    """按 batch 连接配置加载规则快照，返回 (快照, 规则库路径, 快照路径)"""
+    db_path = db_path or default_db_path(BATCH_PROFILE)
+    snapshot_path = default_snapshot_path(db_path)
+    snapshot = load_or_build(db_path, snapshot_path, BATCH_PROFILE)
+    print_messages(snapshot.messages, quiet)
+    # 规则常驻且只读，移出垃圾回收的扫描范围
+    gc.freeze()
+    return snapshot, db_path, snapshot_path
+
+
+def load_group_rules(args):
+    """group 命令的规则：给出 --versions 时为多版本 RuleStore，返回 (规则, 规则库路径, 快照路径)"""
+    if not args.versions:
+        snapshot, db_path, snapshot_path = load_rules(args.db, args.quiet)
+        return snapshot.rules, db_path, snapshot_path
+    store = RuleStore.from_config(args.versions)
+    gc.freeze()
+    if not args.quiet:
+        for version in store:
+            print_messages(version.messages)
+            print(f"规则版本 {version.name}: {version.start or '不限'} ~ {version.end or '不限'}  {version.db_path}",
+                  file=sys.stderr)
+    return store, None, None
+
+
+def make_cache(args):
+    """--cache-size 为 0 时不缓存分组结果"""
+    if args.cache_size <= 0:
+        return None
+    return GroupCache(args.cache_size, int(args.cache_memory * 1024 * 1024))
+
+
+def print_cache_summary(cache, stream=sys.stderr):
+    if cache is not None:
+        print(cache.summary(), file=stream)
+
+
+def make_profile(args):
+    """--profile 时分阶段计时，否则返回 None（使用不带计时的 Grouper）"""
+    return GroupProfile() if args.profile else None
+
+
+def print_profile_summary(profile, stream=sys.stderr):
+    if profile is not None:
+        print("\n".join(profile.summary_lines()), file=stream)
+
+
+def make_normalizer(args, rules):
+    """--normalize-codes：off 不处理，format 只规范写法，ancestor 再换成规则表中最近的上级编码（多版本时查各版本）"""
+    if args.normalize_codes == 'off':
+        return None
+    if args.normalize_codes == 'format':
+        return CodeNormalizer()
+    if isinstance(rules, RuleStore):
+        return CodeNormalizer(CodeIndex.union(rule_set.codes for rule_set in rules.rule_sets()))
+    return CodeNormalizer(rules.codes)
+
+
+def make_regroup_normalizers(args, old_rules, rules):
+    """
+    增量重新分组的编码规范化，返回 (读取病例时用的 normalizer, 交给 regroup_stream 的 normalizers)
+    ancestor 的上级编码取决于规则表，读入原始编码，由 regroup_stream 按新旧两版规则分别规范化
+    """
+    if args.normalize_codes == 'ancestor':
+        return None, (make_normalizer(args, old_rules), make_normalizer(args, rules))
+    return make_normalizer(args, rules), None
+
+
+def print_normalizer_summary(normalizer, stream=sys.stderr):
+    if normalizer is not None:
+        print(normalizer.summary(), file=stream)
+
+
+def print_summary(counts, stream=sys.stderr):
+    total = sum(counts.values())
+    parts = [f"{status} {count:,} ({count / total:.1%})" for status, count in counts.most_common()]
+    print(f"共 {total:,} 条: " + ", ".join(parts) if total else "没有病例", file=stream)
+
+
+def cmd_group(args):
+    from engine.columnar_io import columnar_format
+    input_format, output_format = columnar_format(args.input), columnar_format(args.output)
+    if input_format or output_format:
+        if not (input_format and output_format):
+            raise ValueError("列式文件（Parquet/Arrow）的输入和输出须同为列式文件")
+        return group_columnar(args)
+
+    rules, db_path, snapshot_path = load_group_rules(args)
+    cache = make_cache(args)
+    profile = make_profile(args)
+    normalizer = make_normalizer(args, rules)
+    counts = Counter()
+    count = 0
+    with CsvCaseReader(args.input, args.encoding, args.delimiter, args.main_col, args.other_cols, args.proc_cols,
+                       with_date=bool(args.versions), date_col=args.date_col, normalizer=normalizer) as reader, \
+            CsvResultWriter(args.output, reader.header, args.output_encoding, args.delimiter) as writer:
+        progress = Progress(reader.size, reader.position, enabled=not args.quiet)
+        results = group_stream(reader, rules, args.workers, args.chunk_size, snapshot_path, db_path, cache,
+                               profile)
+        for count, (row, result) in enumerate(results, 1):
+            writer.write(row, result)
+            counts[result.status] += 1
+            progress.update(count)
+        progress.finish(count)
+    if not args.quiet:
+        print_summary(counts)
+        print_normalizer_summary(normalizer)
+        print_cache_summary(cache)
+        print_profile_summary(profile)
+    return 0
+
+
+def group_columnar(args):
+    """Parquet / Arrow 输入输出：逐个记录批读取、分组、写出"""
+    from engine.columnar_io import ColumnarCaseReader, ColumnarResultWriter
+    rules, db_path, snapshot_path = load_group_rules(args)
+    cache = make_cache(args)
+    profile = make_profile(args)
+    normalizer = make_normalizer(args, rules)
+    counts = Counter()
+    count = 0
+    with ColumnarCaseReader(args.input, args.main_col, args.other_cols, args.proc_cols, args.batch_size,
+                            with_date=bool(args.versions), date_col=args.date_col, normalizer=normalizer) as reader, \
+            ColumnarResultWriter(args.output, reader.schema, rules) as writer:
+        progress = Progress(reader.num_rows, lambda: count, enabled=not args.quiet)
+        results = group_batches(reader, rules, args.workers, args.chunk_size, snapshot_path, db_path, cache,
+                               profile)
+        for batch, batch_results in results:
+            writer.write(batch, batch_results)
+            counts.update(result.status for result in batch_results)
+            count += len(batch_results)
+            progress.update(count)
+        progress.finish(count)
+    if not args.quiet:
+        print_summary(counts)
+        print_normalizer_summary(normalizer)
+        print_cache_summary(cache)
+        print_profile_summary(profile)
+    return 0
+
+
+def print_regroup_summary(regrouped, changed, kept, stream=sys.stderr):
+    print(f"重新分组 {regrouped:,} 条（结果变化 {changed:,} 条），沿用原结果 {kept:,} 条", file=stream)
+
+
+def open_grouper(args, rules, snapshot_path, db_path, cache=None, profile=None):
+    """单进程用 Grouper，多进程用 ParallelGrouper（第一次分组时才启动进程池）"""
+    if args.workers <= 1:
+        return contextlib.nullcontext(make_grouper(rules, cache, profile))
+    return ParallelGrouper(args.workers, args.chunk_size, snapshot_path, db_path, rules=rules, cache=cache,
+                           profile=profile)
+
+
+def cmd_regroup(args):
+    from engine.columnar_io import columnar_format
+    from engine.rule_diff import affected_codes
+    input_format, output_format = columnar_format(args.input), columnar_format(args.output)
+    if bool(input_format) != bool(output_format):
+        raise ValueError("列式文件（Parquet/Arrow）的输入和输出须同为列式文件")
+
+    old_snapshot = load_or_build(args.old_db, default_snapshot_path(args.old_db), BATCH_PROFILE)
+    print_messages(old_snapshot.messages, args.quiet)
+    snapshot, db_path, snapshot_path = load_rules(args.db, args.quiet)
+    affected = affected_codes(old_snapshot, snapshot)
+    if not args.quiet:
+        print(f"受规则变化影响: {affected.summary() if affected else '无'}", file=sys.stderr)
+    cache = make_cache(args)
+    profile = make_profile(args)
+    normalizer, normalizers = make_regroup_normalizers(args, old_snapshot.rules, snapshot.rules)
+    if input_format:
+        return regroup_columnar(args, affected, old_snapshot, snapshot, db_path, snapshot_path, cache, profile,
+                                normalizer, normalizers)
+
+    from engine.rule_diff import regroup_stream
+    regrouped = changed = kept = count = 0
+    with CsvCaseReader(args.input, args.encoding, args.delimiter,
+                       args.main_col, args.other_cols, args.proc_cols, normalizer=normalizer) as reader:
+        start = stored_result_start(reader.header)
+        with CsvResultWriter(args.output, reader.header[:start], args.output_encoding, args.delimiter) as writer, \
+                open_grouper(args, snapshot.rules, snapshot_path, db_path, cache, profile) as grouper:
+            progress = Progress(reader.size, reader.position, enabled=not args.quiet)
+            items = ((row, case, row[start + 1], row[start + 2]) for row, case in reader)
+            for count, (row, result) in enumerate(regroup_stream(items, affected, grouper,
+                                                                 normalizers=normalizers), 1):
+                if result is None:
+                    writer.write_row(row)
+                    kept += 1
+                else:
+                    writer.write(row[:start], result)
+                    regrouped += 1
+                    if [str(value) for value in result_values(result)] != row[start:]:
+                        changed += 1
+                progress.update(count)
+            progress.finish(count)
+    if not args.quiet:
+        print_regroup_summary(regrouped, changed, kept)
+        print_normalizer_summary(normalizers[1] if normalizers else normalizer)
+        print_cache_summary(cache)
+        print_profile_summary(profile)
+    return 0
+
+
+def regroup_columnar(args, affected, old_snapshot, snapshot, db_path, snapshot_path, cache=None, profile=None,
+                     normalizer=None, normalizers=None):
+    """Parquet / Arrow 分组结果文件的增量重新分组，逐批处理"""
+    from engine.columnar_io import ColumnarCaseReader, ColumnarResultWriter, case_columns, stored_results
+    from engine.rule_diff import regroup_stream
+    regrouped = changed = kept = count = 0
+    with ColumnarCaseReader(args.input, args.main_col, args.other_cols, args.proc_cols, args.batch_size,
+                            normalizer=normalizer) as reader:
+        indexes, schema = case_columns(reader.schema)
+        with ColumnarResultWriter(args.output, schema, snapshot.rules, old_snapshot.rules) as writer, \
+                open_grouper(args, snapshot.rules, snapshot_path, db_path, cache, profile) as grouper:
+            progress = Progress(reader.num_rows, lambda: count, enabled=not args.quiet)
+            for batch in reader.batches():
+                stored = stored_results(batch)
+                items = ((old, case, old.adrg, old.drg) for old, case in zip(stored, reader.cases(batch)))
+                results = []
+                for old, result in regroup_stream(items, affected, grouper, block_size=max(len(stored), 1),
+                                                  normalizers=normalizers):
+                    if result is None:
+                        results.append(old)
+                        kept += 1
+                    else:
+                        results.append(result)
+                        regrouped += 1
+                        changed += result != old
+                writer.write(batch.select(indexes), results)
+                count += len(results)
+                progress.update(count)
+            progress.finish(count)
+    if not args.quiet:
+        print_regroup_summary(regrouped, changed, kept)
+        print_normalizer_summary(normalizers[1] if normalizers else normalizer)
+        print_cache_summary(cache)
+        print_profile_summary(profile)
+    return 0
+
+
+def cmd_compare(args):
+    from engine.release_compare import ENTRY_HEADERS, compare_databases
+    comparison = compare_databases(args.old_db, args.new_db, BATCH_PROFILE)
+    print(f"旧版: {args.old_db}")
+    print(f"新版: {args.new_db}")
+    print("\n".join(comparison.summary_lines()))
+    print(f"共 {comparison.total():,} 处差异，比较用时 {comparison.elapsed:.2f} 秒")
+    if args.output:
+        with open(args.output, 'w', encoding=args.output_encoding, newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(ENTRY_HEADERS)
+            writer.writerows(comparison.entries())
+    return 0
+
+
+def cmd_casemix(args):
+    from engine.casemix import PointValueTable, read_case_columns, summarize
+    snapshot, _, _ = load_rules(args.db, args.quiet)
+    point_values = None
+    if args.points:
+        point_values = PointValueTable.from_config(args.points)
+    elif args.point_value is not None:
+        point_values = PointValueTable.fixed(args.point_value)
+    columns = read_case_columns(args.input, args.encoding, args.delimiter, args.dept_col, args.date_col,
+                                args.region_col, args.batch_size)
+    report = summarize(columns, snapshot.rules, args.by, point_values)
+    with open(args.output, 'w', encoding=args.output_encoding, newline='') if args.output != '-' \
+            else contextlib.nullcontext(sys.stdout) as f:
+        writer = csv.writer(f)
+        writer.writerow(report.headers)
+        writer.writerows(report.rows())
+    if not args.quiet:
+        cases, grouped, weights, cmi, payments = report.totals()
+        line = f"共 {cases:,} 条，入组 {grouped:,} 条，总权重 {weights:,.2f}，CMI {cmi:.4f}" if cmi is not None \
+            else f"共 {cases:,} 条，没有入组病例"
+        if payments is not None:
+            line += f"，预估费用 {payments:,.2f}"
+        print(f"{line}（{len(report):,} 行，汇总用时 {report.elapsed:.2f} 秒）", file=sys.stderr)
+    return 0
+
+
+def add_case_options(parser):
+    """group / regroup 共用的参数"""
+    parser.add_argument('--workers', type=int, default=available_cpus(), help="分组进程数（默认为可用的 CPU 数），1 为单进程")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="多进程时每块病例数")
+    parser.add_argument('--batch-size', type=int, default=65536, help="列式文件每批读取的行数")
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help=f"分组结果缓存条数上限（每个分组进程），默认 0 不缓存；重复病例多时可设为 {DEFAULT_MAX_ENTRIES}")
+    parser.add_argument('--cache-memory', type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help="分组结果缓存内存上限(MB，每个分组进程)")
+    parser.add_argument('--profile', action='store_true', help="分阶段统计分组用时和各分组路径的病例数")
+    parser.add_argument('--normalize-codes', choices=('off', 'format', 'ancestor'), default='off',
+                        help="编码规范化：format 规范写法，ancestor 再换成规则表中最近的上级编码")
+    parser.add_argument('--encoding', default='utf-8-sig', help="输入文件编码（HIS 导出常为 gbk）")
+    parser.add_argument('--output-encoding', default='utf-8-sig', help="输出文件编码")
+    parser.add_argument('--delimiter', default=',', help="列分隔符")
+    parser.add_argument('--main-col', help="主要诊断列名")
+    parser.add_argument('--other-cols', nargs='+', help="其他诊断列名（可多列）")
+    parser.add_argument('--proc-cols', nargs='+', help="手术操作列名（可多列）")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不输出进度")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='chsdrg', description="chs-drg 命令行工具")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    group = commands.add_parser('group', help="CSV 病例批量分组")
+    group.add_argument('input', help="病例 CSV 文件")
+    group.add_argument('-o', '--output', default='-', help="结果 CSV 文件，默认输出到标准输出")
+    group.add_argument('--db', help="规则库路径，默认按 batch 连接配置")
+    group.add_argument('--versions', help="规则版本配置文件：按出院日期选用多个版本的规则库")
+    group.add_argument('--date-col', help="出院日期列名（与 --versions 一起使用）")
+    add_case_options(group)
+    group.set_defaults(func=cmd_group)
+
+    regroup = commands.add_parser('regroup', help="新版规则库发布后对分组结果增量重新分组")
+    regroup.add_argument('input', help="原分组结果文件（group 命令的输出）")
+    regroup.add_argument('-o', '--output', default='-', help="新结果文件，默认输出到标准输出")
+    regroup.add_argument('--old-db', required=True, help="原结果所用的旧版规则库")
+    regroup.add_argument('--db', help="新版规则库路径，默认按 batch 连接配置")
+    add_case_options(regroup)
+    regroup.set_defaults(func=cmd_regroup)
+
+    compare = commands.add_parser('compare', help="比较两个版本的规则库")
+    compare.add_argument('old_db', help="旧版规则库")
+    compare.add_argument('new_db', help="新版规则库")
+    compare.add_argument('-o', '--output', help="差异明细 CSV 文件")
+    compare.add_argument('--output-encoding', default='utf-8-sig', help="明细文件编码")
+    compare.set_defaults(func=cmd_compare)
+
+    from engine.casemix import DEFAULT_DIMENSIONS, DIMENSIONS
+    casemix = commands.add_parser('casemix', help="按科室、内外科、月份汇总总权重和 CMI")
+    casemix.add_argument('input', help="分组结果文件（group 命令的输出，CSV 或 Parquet/Arrow）")
+    casemix.add_argument('-o', '--output', default='-', help="汇总 CSV 文件，默认输出到标准输出")
+    casemix.add_argument('--by', nargs='*', choices=list(DIMENSIONS), default=list(DEFAULT_DIMENSIONS),
+                         help="汇总维度，默认 " + " ".join(DEFAULT_DIMENSIONS) + "，不给出时只输出合计")
+    casemix.add_argument('--db', help="取权重的规则库路径，默认按 batch 连接配置")
+    casemix.add_argument('--point-value', type=float, help="统一点值（1.0 权重对应的金额）")
+    casemix.add_argument('--points', help="按统筹区、月份的点值配置文件")
+    casemix.add_argument('--dept-col', help="科室列名")
+    casemix.add_argument('--date-col', help="出院日期列名")
+    casemix.add_argument('--region-col', help="统筹区列名")
+    casemix.add_argument('--batch-size', type=int, default=65536, help="每批读取的行数")
+    casemix.add_argument('--encoding', default='utf-8-sig', help="输入文件编码")
+    casemix.add_argument('--output-encoding', default='utf-8-sig', help="输出文件编码")
+    casemix.add_argument('--delimiter', default=',', help="列分隔符")
+    casemix.add_argument('-q', '--quiet', action='store_true', help="不输出合计")
+    casemix.set_defaults(func=cmd_casemix)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -1,3 +1,4 @@
+from controllers import startup_timing
 from views.main_window import MainWindow
 
 class MainController:
@@ -5,4 +6,11 @@ class MainController:
         self.main_window = MainWindow()
     
     def show_main_window(self):
-        self.main_window.show()
\ No newline at end of file
+        self.main_window.show()
+
+    def on_started(self):
+        """首次进入事件循环：结束启动计时，开始空闲预读"""
+        total = startup_timing.finish()
+        self.main_window.start_prefetch()
+        if startup_timing.is_enabled():
+            self.main_window.statusbar.showMessage(f"就绪（启动用时 {total:.0f} ms）")
\ No newline at end of file
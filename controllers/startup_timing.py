@@ -0,0 +1,79 @@
+import json
+import os
+import time
+
+# 环境变量：CHSDRG_STARTUP_TIMING=1 时在控制台和状态栏显示启动各阶段耗时，
+# CHSDRG_STARTUP_TIMING_FILE 为写入 JSON 的文件（设置后也会记录）
+STARTUP_ENV = 'CHSDRG_STARTUP_TIMING'
+STARTUP_FILE_ENV = 'CHSDRG_STARTUP_TIMING_FILE'
+
+# 计时起点为本模块被导入时（main.py 第一行导入），不含解释器自身的启动
+_start = time.perf_counter()
+_last = _start
+_phases = []   # (阶段, 距起点毫秒, 本阶段毫秒)
+
+
+def mark(phase):
+    """记录一个启动阶段的结束（耗时为距上一个阶段结束）"""
+    global _last
+    now = time.perf_counter()
+    _phases.append((phase, (now - _start) * 1000, (now - _last) * 1000))
+    _last = now
+
+
+def record(phase, elapsed_ms):
+    """记录启动后的单独操作（如首次打开某个标签页）的耗时，不影响启动阶段的计时"""
+    _phases.append((phase, (time.perf_counter() - _start) * 1000, elapsed_ms))
+
+
+def phases():
+    return list(_phases)
+
+
+def total_ms():
+    """起点到最后一个启动阶段结束的毫秒数"""
+    return (_last - _start) * 1000
+
+
+def is_enabled(environ=None):
+    environ = os.environ if environ is None else environ
+    return (environ.get(STARTUP_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on')
+            or bool(environ.get(STARTUP_FILE_ENV)))
+
+
+def report():
+    lines = [f"{'阶段':<16}{'时刻(ms)':>10}{'耗时(ms)':>10}"]
+    for phase, at_ms, elapsed_ms in _phases:
+        lines.append(f"{phase:<16}{at_ms:>10.1f}{elapsed_ms:>10.1f}")
+    lines.append(f"启动共 {total_ms():.1f} ms")
+    return "\n".join(lines)
+
+
+def dump(path):
+    data = {
+        'total_ms': round(total_ms(), 3),
+        'phases': [{'phase': phase, 'at_ms': round(at_ms, 3), 'elapsed_ms': round(elapsed_ms, 3)}
+                   for phase, at_ms, elapsed_ms in _phases],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def dump_from_env(environ=None):
+    """设置了 CHSDRG_STARTUP_TIMING_FILE 时导出（退出时再次调用，补上之后打开标签页的耗时）"""
+    environ = os.environ if environ is None else environ
+    path = environ.get(STARTUP_FILE_ENV)
+    if path:
+        try:
+            dump(path)
+        except OSError as e:
+            print(f"导出启动计时失败: {e}")
+
+
+def finish(environ=None):
+    """启动完成（首次进入事件循环）时调用：开启了计时则输出报告，返回启动总毫秒数"""
+    mark('首次事件循环')
+    if is_enabled(environ):
+        print(report())
+        dump_from_env(environ)
+    return total_ms()
\ No newline at end of file
@@ -0,0 +1,316 @@
+import csv
+import io
+import os
+import re
+import sys
+import time
+from collections import deque
+from engine.parallel import DEFAULT_CHUNK_SIZE, ParallelGrouper
+from engine.rule_store import make_grouper
+
+# 输出时在原有列之后追加的分组结果列
+RESULT_FIELDS = ('mdc', 'adrg', 'drg', 'ccl', 'weight', 'status')
+
+# 未指定列名时按表头识别病例列（不区分大小写，忽略末尾序号，如“其他诊断1”“other_diag_2”）
+MAIN_DIAG_NAMES = ('main_diag', '主要诊断', '主要诊断编码', '主诊断编码')
+OTHER_DIAG_NAMES = ('other_diags', 'other_diag', '其他诊断', '其他诊断编码')
+PROCEDURE_NAMES = ('procedures', 'procedure', '手术操作', '手术操作编码', '手术编码')
+DISCHARGE_DATE_NAMES = ('discharge_date', '出院日期', '出院时间')
+# 一个单元格中有多个编码时的分隔符
+CODE_SEPARATORS = '|;,，；'
+
+# 进度输出间隔(秒)
+PROGRESS_INTERVAL = 2.0
+
+_NUMBER_SUFFIX = re.compile(r'[_\s]*\d+$')
+_SEPARATOR_TABLE = str.maketrans({sep: '|' for sep in CODE_SEPARATORS})
+
+
+def _base_name(name):
+    return _NUMBER_SUFFIX.sub('', name.strip().lower())
+
+
+def _find_columns(header, names, label, required=False, allow_many=True):
+    """按列名找列下标：names 为 None 时按候选名自动识别"""
+    lowered = [name.strip().lower() for name in header]
+    indexes = []
+    for name in names:
+        if name.strip().lower() not in lowered:
+            raise ValueError(f"找不到{label}列: {name}")
+        indexes.append(lowered.index(name.strip().lower()))
+    if required and not indexes:
+        raise ValueError(f"找不到{label}列，请用参数指定列名")
+    if not allow_many and len(indexes) > 1:
+        raise ValueError(f"{label}只能有一列")
+    return indexes
+
+
+def resolve_columns(header, main_col=None, other_cols=None, proc_cols=None):
+    """返回 (主要诊断列, [其他诊断列...], [手术列...]) 的下标"""
+    def detect(candidates):
+        return [name for name in header if _base_name(name) in candidates]
+
+    main = _find_columns(header, [main_col] if main_col else detect(MAIN_DIAG_NAMES)[:1], "主要诊断",
+                         required=True, allow_many=False)[0]
+    others = _find_columns(header, other_cols if other_cols else detect(OTHER_DIAG_NAMES), "其他诊断")
+    procedures = _find_columns(header, proc_cols if proc_cols else detect(PROCEDURE_NAMES), "手术操作")
+    return main, others, procedures
+
+
+def find_column(header, candidates, label, name=None, required=False):
+    """单列的下标：name 为 None 时按候选名自动识别；找不到且非必需时返回 None"""
+    if name:
+        names = [name]
+    else:
+        names = [column for column in header if _base_name(column) in candidates][:1]
+    indexes = _find_columns(header, names, label, required=required, allow_many=False)
+    return indexes[0] if indexes else None
+
+
+def resolve_date_column(header, date_col=None):
+    """出院日期列的下标（按多个规则版本分组时需要）"""
+    return find_column(header, DISCHARGE_DATE_NAMES, "出院日期", date_col, required=True)
+
+
+def split_codes(row, indexes):
+    """取若干列中的编码，单元格内多个编码按 CODE_SEPARATORS 拆分"""
+    codes = []
+    for i in indexes:
+        if i < len(row) and row[i]:
+            for code in row[i].translate(_SEPARATOR_TABLE).split('|'):
+                code = code.strip()
+                if code:
+                    codes.append(code)
+    return tuple(codes)
+
+
+def stored_result_start(header):
+    """分组结果文件（group 命令的输出）中结果列的起始下标，结果列须为末尾的 RESULT_FIELDS"""
+    start = len(header) - len(RESULT_FIELDS)
+    if start < 0 or [name.strip().lower() for name in header[start:]] != list(RESULT_FIELDS):
+        raise ValueError("不是分组结果文件：末尾须为 " + ", ".join(RESULT_FIELDS) + " 列")
+    return start
+
+
+def result_values(result):
+    """分组结果转为输出列的值"""
+    return [
+        result.mdc or '',
+        result.adrg or '',
+        result.drg,
+        result.ccl,
+        '' if result.weight is None else result.weight,
+        result.status,
+    ]
+
+
+class CsvCaseReader:
+    """
+    逐行读取 CSV 病例文件，迭代得到 (原始行, (主要诊断, 其他诊断元组, 手术元组))
+    with_date 为真时病例末尾再加出院日期（原始文本），用于按多个规则版本分组。
+    给出 normalizer（engine.code_index.CodeNormalizer）时病例中的编码先经规范化。
+
+    文件按缓冲区流式读取，不会整个读入内存；position() 为已读字节数，用于显示进度。
+    """
+
+    def __init__(self, path, encoding='utf-8-sig', delimiter=',', main_col=None, other_cols=None, proc_cols=None,
+                 with_date=False, date_col=None, normalizer=None):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.normalizer = normalizer
+        self._binary = open(path, 'rb')
+        try:
+            self._text = io.TextIOWrapper(self._binary, encoding=encoding, newline='')
+            self._reader = csv.reader(self._text, delimiter=delimiter)
+            self.header = next(self._reader, None)
+            if not self.header:
+                raise ValueError(f"文件为空或没有表头: {path}")
+            self.main_index, self.other_indexes, self.proc_indexes = resolve_columns(
+                self.header, main_col, other_cols, proc_cols)
+            self.date_index = resolve_date_column(self.header, date_col) if with_date else None
+        except Exception:
+            self._binary.close()
+            raise
+
+    def position(self):
+        return self._binary.tell()
+
+    def __iter__(self):
+        if self.normalizer is not None:
+            normalize = self.normalizer.case
+            for row, case in self._cases():
+                yield row, normalize(case)
+        else:
+            yield from self._cases()
+
+    def _cases(self):
+        main_index, other_indexes, proc_indexes = self.main_index, self.other_indexes, self.proc_indexes
+        date_index = self.date_index
+        for row in self._reader:
+            if not row:
+                continue
+            main_diag = row[main_index].strip() if main_index < len(row) else ''
+            if date_index is None:
+                yield row, (main_diag, split_codes(row, other_indexes), split_codes(row, proc_indexes))
+            else:
+                discharge_date = row[date_index] if date_index < len(row) else ''
+                yield row, (main_diag, split_codes(row, other_indexes), split_codes(row, proc_indexes), discharge_date)
+
+    def close(self):
+        self._text.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvResultWriter:
+    """输出原有各列加分组结果列，path 为 '-' 时写到标准输出"""
+
+    def __init__(self, path, header, encoding='utf-8-sig', delimiter=','):
+        if path == '-':
+            self._file = None
+            stream = sys.stdout
+        else:
+            self._file = stream = open(path, 'w', encoding=encoding, newline='')
+        self._writer = csv.writer(stream, delimiter=delimiter)
+        self._writer.writerow(list(header) + list(RESULT_FIELDS))
+
+    def write(self, row, result):
+        self._writer.writerow(row + result_values(result))
+
+    def write_row(self, row):
+        """原样写出一行（已含结果列）"""
+        self._writer.writerow(row)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def group_stream(items, rules, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, snapshot_path=None, db_path=None,
+                 cache=None, profile=None):
+    """
+    流式分组：items 为 (原始行, 病例) 的可迭代对象，按输入顺序 yield (原始行, 分组结果)。
+    rules 为 RuleSet，或按出院日期选版本的 RuleStore（病例末尾带出院日期）。
+    多进程时只有已提交未取回的块驻留内存（见 ParallelGrouper.imap）。
+    cache 为 GroupCache 时分组结果经缓存，命中统计累计在 cache 中；profile 为 GroupProfile 时分阶段计时。
+    """
+    if workers <= 1:
+        group_case = make_grouper(rules, cache, profile).group_case
+        for row, case in items:
+            yield row, group_case(case)
+        return
+
+    rows = deque()
+
+    def cases():
+        for row, case in items:
+            rows.append(row)
+            yield case
+
+    with ParallelGrouper(workers, chunk_size, snapshot_path, db_path, rules=rules, cache=cache,
+                         profile=profile) as pool:
+        for result in pool.imap(cases()):
+            yield rows.popleft(), result
+
+
+def group_batches(batches, rules, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, snapshot_path=None, db_path=None,
+                  cache=None, profile=None):
+    """
+    按批分组：batches 为 (批数据, [病例, ...]) 的可迭代对象，按输入顺序 yield (批数据, [分组结果, ...])。
+    单进程时整批调用 group_many；多进程时各批病例连续送入 ParallelGrouper，结果再按批切开。
+    """
+    if workers <= 1:
+        grouper = make_grouper(rules, cache, profile)
+        for payload, cases in batches:
+            yield payload, grouper.group_many(cases)
+        return
+
+    pending = deque()   # 已送入进程池的 (批数据, 病例数)
+
+    def cases():
+        for payload, batch_cases in batches:
+            pending.append((payload, len(batch_cases)))
+            yield from batch_cases
+
+    with ParallelGrouper(workers, chunk_size, snapshot_path, db_path, rules=rules, cache=cache,
+                         profile=profile) as pool:
+        buffer = []
+        for result in pool.imap(cases()):
+            buffer.append(result)
+            while pending and len(buffer) >= pending[0][1]:
+                payload, count = pending.popleft()
+                yield payload, buffer[:count]
+                buffer = buffer[count:]
+        # 末尾没有病例的批
+        while pending:
+            payload, count = pending.popleft()
+            yield payload, buffer[:count]
+            buffer = buffer[count:]
+
+
+def _format_seconds(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}小时{seconds % 3600 // 60}分"
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds}秒"
+
+
+class Progress:
+    """
+    每隔 interval 秒向 stderr 输出一次处理进度（条数、百分比、速度、预计剩余时间）
+    total 与 position() 为进度的总量和当前量（如文件字节数和已读字节数），未给出时不显示百分比
+    """
+
+    def __init__(self, total=None, position=None, interval=PROGRESS_INTERVAL, stream=None, enabled=True):
+        self.total = total
+        self.position = position
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.enabled = enabled
+        self.started = time.monotonic()
+        self._next = self.started + interval
+        self._check_at = 0
+        self._tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+
+    def update(self, count):
+        # 每处理约 1000 条才看一次时间
+        if not self.enabled or count < self._check_at:
+            return
+        self._check_at = count + 1000
+        now = time.monotonic()
+        if now >= self._next:
+            self._next = now + self.interval
+            self._print(count, now)
+
+    def finish(self, count):
+        if self.enabled:
+            self._print(count, time.monotonic(), done=True)
+
+    def _print(self, count, now, done=False):
+        elapsed = max(now - self.started, 1e-9)
+        parts = [f"已分组 {count:,} 条", f"{count / elapsed:,.0f} 条/秒"]
+        if done:
+            parts.append(f"用时 {_format_seconds(elapsed)}")
+        elif self.total and self.position is not None:
+            fraction = min(self.position() / self.total, 1.0)
+            parts.insert(1, f"{fraction:6.1%}")
+            if fraction > 0:
+                parts.append(f"预计剩余 {_format_seconds(elapsed / fraction - elapsed)}")
+        line = "  ".join(parts)
+        if self._tty:
+            self.stream.write('\r' + line + ('\n' if done else ''))
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
\ No newline at end of file
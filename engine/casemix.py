@@ -0,0 +1,385 @@
+"""
+病组结构（CMI）与权重汇总
+
+管理报表按科室、ADRG 内外科（Adrg.Dept）、出院月份等维度汇总分组结果文件（group 命令的输出）：
+病例数、入组病例数、总权重（DrgsGroup.paycw 之和）、CMI（总权重 / 入组病例数），
+给出点值时再按统筹区、月份的点值估算费用（权重 × 点值）。
+
+读入时每一列都编码成从 0 开始的整数编号，DRG、科室、日期的不同取值很少，
+权重、内外科、月份只对每个不同的取值查表或解析一次，再按编号取数组；
+汇总时把各维度编号合成一个整数键，用 NumPy 的 unique + bincount 分组求和，
+不在 Python 中逐条病例累加，百万级病例的全年汇总在秒级完成。
+"""
+import codecs
+import configparser
+import csv
+import itertools
+import time
+from operator import itemgetter
+from engine.batch_io import DISCHARGE_DATE_NAMES, find_column
+from engine.rule_store import parse_date
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖，只在汇总时需要
+    np = None
+
+# 未指定列名时按表头识别科室、统筹区列
+DEPT_NAMES = ('dept', 'department', '科室', '科室名称', '出院科室', '出院科别')
+REGION_NAMES = ('region', '统筹区', '参保地', '医保区划')
+
+# 汇总维度 -> 表头
+DIMENSIONS = {
+    'dept': '科室',
+    'adrg_dept': '内外科',
+    'month': '月份',
+    'region': '统筹区',
+    'adrg': 'ADRG',
+    'drg': 'DRG',
+}
+DEFAULT_DIMENSIONS = ('dept', 'adrg_dept', 'month')
+# 维度 -> 需要的输入列
+DIMENSION_COLUMNS = {'dept': 'dept', 'month': 'date', 'region': 'region'}
+COLUMN_LABELS = {'drg': "DRG", 'dept': "科室", 'date': "出院日期", 'region': "统筹区"}
+
+MEASURE_HEADERS = ('病例数', '入组病例数', '总权重', 'CMI')
+PAYMENT_HEADER = '预估费用'
+
+# 逐块读取 CSV 的行数
+CSV_BLOCK_SIZE = 65536
+
+
+def _require_numpy():
+    if np is None:
+        raise ValueError("病组结构汇总需要安装 numpy（pip install numpy）")
+
+
+def month_of(value):
+    """出院日期 -> 'YYYY-MM'，空值或无法识别时为 ''"""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        return ''
+    return f"{day.year:04d}-{day.month:02d}" if day else ''
+
+
+class Factor:
+    """
+    取值 -> 从 0 开始的整数编号，首尾空白不同的原值编号相同
+    每块取值先求出新出现的原值登记编号，再用 map 整块查编号，不逐个值执行 Python 代码
+    """
+
+    def __init__(self):
+        self.index = {}     # 原值 -> 编号
+        self.labels = {}    # 去空白的取值 -> 编号
+
+    @property
+    def values(self):
+        """各编号对应的取值"""
+        return list(self.labels)
+
+    def encode(self, values):
+        index, labels = self.index, self.labels
+        for value in set(values).difference(index):
+            index[value] = labels.setdefault(value.strip() if value.__class__ is str else value, len(labels))
+        return np.fromiter(map(index.__getitem__, values), np.int32, len(values))
+
+
+def recode(ids, values, func):
+    """
+    由一列编号派生另一列：func 只对每个不同的取值调用一次
+    返回 (新编号数组, 新编号对应的取值)
+    """
+    factor = Factor()
+    mapping = factor.encode([func(value) for value in values])
+    return mapping[ids], factor.values
+
+
+class CaseColumns:
+    """分组结果文件中汇总用到的列（DRG、科室、出院日期、统筹区），逐块编码为整数编号数组"""
+
+    NAMES = ('drg', 'dept', 'date', 'region')
+
+    def __init__(self):
+        _require_numpy()
+        self.factors = {name: Factor() for name in self.NAMES}
+        self.present = set()   # 文件中有的列
+        self.count = 0
+        self._blocks = {name: [] for name in self.NAMES}
+
+    def append_rows(self, rows, indexes):
+        """一块 CSV 行；indexes 为 {列: 下标或 None}，缺少的列记为空值"""
+        for name, i in indexes.items():
+            if i is None:
+                values = [''] * len(rows)
+            else:
+                try:
+                    values = list(map(itemgetter(i), rows))
+                except IndexError:   # 有的行列数不足
+                    values = [row[i] if i < len(row) else '' for row in rows]
+            self._blocks[name].append(self.factors[name].encode(values))
+        self.count += len(rows)
+
+    def append_batch(self, batch, indexes):
+        """
+        一个 Arrow 记录批（indexes 中为列下标或列名）：
+        各列先在 Arrow 中字典编码，只对字典中的取值做 Python 查找
+        """
+        from engine.columnar_io import pa, pc
+        for name, i in indexes.items():
+            if i is None:
+                self._blocks[name].append(self.factors[name].encode([''] * batch.num_rows))
+                continue
+            column = batch.column(i)
+            if not pa.types.is_dictionary(column.type):
+                if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+                    column = pc.cast(column, pa.string())
+                column = pc.dictionary_encode(column)
+            dictionary = ['' if value is None else str(value) for value in column.dictionary.to_pylist()]
+            # 空值的编号放在字典末尾
+            mapping = self.factors[name].encode(dictionary + [''])
+            indices = column.indices.fill_null(len(dictionary)).to_numpy(zero_copy_only=False)
+            self._blocks[name].append(mapping[indices])
+        self.count += batch.num_rows
+
+    def ids(self, name):
+        blocks = self._blocks[name]
+        if len(blocks) > 1:
+            self._blocks[name] = blocks = [np.concatenate(blocks)]
+        return blocks[0] if blocks else np.zeros(0, np.int32)
+
+    def values(self, name):
+        return self.factors[name].values
+
+
+def resolve_case_mix_columns(header, dept_col=None, date_col=None, region_col=None):
+    """{列: 下标}，DRG 列必需，其他列找不到时为 None"""
+    return {
+        'drg': find_column(header, ('drg',), "DRG", None, required=True),
+        'dept': find_column(header, DEPT_NAMES, "科室", dept_col),
+        'date': find_column(header, DISCHARGE_DATE_NAMES, "出院日期", date_col),
+        'region': find_column(header, REGION_NAMES, "统筹区", region_col),
+    }
+
+
+def read_case_columns(path, encoding='utf-8-sig', delimiter=',', dept_col=None, date_col=None, region_col=None,
+                      batch_size=CSV_BLOCK_SIZE):
+    """读取分组结果文件（CSV，或按扩展名识别的 Parquet / Arrow）中汇总用到的列"""
+    from engine.columnar_io import ColumnarBatchReader, columnar_format
+    if columnar_format(path):
+        columns = CaseColumns()
+        with ColumnarBatchReader(path, batch_size) as reader:
+            indexes = resolve_case_mix_columns(reader.header, dept_col, date_col, region_col)
+            for batch in reader.batches():
+                columns.append_batch(batch, indexes)
+    else:
+        with open(path, encoding=encoding, newline='') as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            header = next(reader, None)
+            if not header:
+                raise ValueError(f"文件为空或没有表头: {path}")
+            indexes = resolve_case_mix_columns(header, dept_col, date_col, region_col)
+            columns = _read_csv_batches(path, encoding, delimiter, header, indexes)
+            if columns is None:
+                columns = CaseColumns()
+                while True:
+                    rows = [row for row in itertools.islice(reader, batch_size) if row]
+                    if not rows:
+                        break
+                    columns.append_rows(rows, indexes)
+    columns.present = {name for name, i in indexes.items() if i is not None}
+    return columns
+
+
+def _read_csv_batches(path, encoding, delimiter, header, indexes):
+    """
+    安装了 pyarrow 时用它的 CSV 解析器逐块读取需要的几列，比 csv 模块逐行解析快数倍；
+    没有 pyarrow、表头有重名列或文件中有列数不一致的行时返回 None，改用 csv 模块读取
+    """
+    from engine.columnar_io import pa
+    if pa is None or len(set(header)) < len(header):
+        return None
+    import pyarrow.csv as pa_csv
+    names = {name: header[i] for name, i in indexes.items() if i is not None}
+    if codecs.lookup(encoding).name in ('utf-8', 'utf-8-sig'):
+        encoding = 'utf8'    # pyarrow 自行跳过 BOM，不经过 Python 转码
+    columns = CaseColumns()
+    try:
+        reader = pa_csv.open_csv(
+            path, read_options=pa_csv.ReadOptions(encoding=encoding, block_size=1 << 22),
+            parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+            convert_options=pa_csv.ConvertOptions(include_columns=list(names.values()),
+                                                  column_types={column: pa.string() for column in names.values()}))
+        for batch in reader:
+            columns.append_batch(batch, {name: names.get(name) for name in indexes})
+    except pa.ArrowInvalid:
+        return None
+    return columns
+
+
+class PointValueTable:
+    """
+    按统筹区、月份的点值（1.0 权重对应的金额），作为 summarize 的 point_values
+
+    values 为 {统筹区: {月份: 点值}}，统筹区或月份为 '' 表示不限；
+    查找顺序为 (统筹区, 月份)、(统筹区, '')、('', 月份)、('', '')，都没有时为 None（不估算费用）。
+    任何 (统筹区, 'YYYY-MM') -> 点值或 None 的函数都可以代替本类。
+    """
+
+    def __init__(self, values=None):
+        self.values = values or {}
+
+    @classmethod
+    def fixed(cls, value):
+        """所有统筹区、月份使用同一点值"""
+        return cls({'': {'': float(value)}})
+
+    @classmethod
+    def from_config(cls, path):
+        """
+        从点值配置文件加载，每节一个统筹区，[DEFAULT] 节适用于其他统筹区：
+            [DEFAULT]
+            point = 50.0        ; 默认点值
+            2024-07 = 52.5      ; 按月调整（出院月份）
+            [广州]
+            point = 55.0
+        """
+        # 不使用 configparser 的默认节继承，[DEFAULT] 按普通节读取
+        parser = configparser.ConfigParser(default_section='', inline_comment_prefixes=(';', '#'))
+        if not parser.read(path, encoding='utf-8'):
+            raise ValueError(f"找不到点值配置文件: {path}")
+        values = {}
+        for section in parser.sections():
+            region = '' if section == 'DEFAULT' else section
+            months = values.setdefault(region, {})
+            for key, value in parser.items(section):
+                month = '' if key == 'point' else month_of(key + '-01')
+                if key != 'point' and not month:
+                    raise ValueError(f"点值配置 [{section}] 中的月份不正确: {key}")
+                try:
+                    months[month] = float(value)
+                except ValueError:
+                    raise ValueError(f"点值配置 [{section}] {key} 不是数值: {value}")
+        return cls(values)
+
+    def __call__(self, region, month):
+        for region_key, month_key in ((region, month), (region, ''), ('', month), ('', '')):
+            value = self.values.get(region_key, {}).get(month_key)
+            if value is not None:
+                return value
+        return None
+
+
+class CaseMixReport:
+    """汇总结果：每个维度一列取值，各指标为与之对应的 NumPy 数组"""
+
+    def __init__(self, dimensions, labels, cases, grouped, weights, payments=None, elapsed=0.0):
+        self.dimensions = tuple(dimensions)
+        self.labels = labels          # [[维度取值, ...], ...]，每个维度一个列表
+        self.cases = cases            # 病例数
+        self.grouped = grouped        # 入组病例数（DRG 有权重）
+        self.weights = weights        # 总权重
+        self.payments = payments      # 预估费用，没有点值时为 None
+        self.elapsed = elapsed        # 汇总用时(秒)，不含读文件
+
+    def __len__(self):
+        return len(self.cases)
+
+    @property
+    def headers(self):
+        headers = [DIMENSIONS[name] for name in self.dimensions] + list(MEASURE_HEADERS)
+        if self.payments is not None:
+            headers.append(PAYMENT_HEADER)
+        return headers
+
+    def cmi(self):
+        """各行 CMI，没有入组病例的行为 NaN"""
+        return np.where(self.grouped > 0, self.weights / np.maximum(self.grouped, 1), np.nan)
+
+    def rows(self):
+        """各行 (维度取值..., 病例数, 入组病例数, 总权重, CMI[, 预估费用])"""
+        cmi = self.cmi()
+        columns = [*self.labels, self.cases.tolist(), self.grouped.tolist(),
+                   [round(value, 4) for value in self.weights.tolist()],
+                   ['' if value != value else round(value, 4) for value in cmi.tolist()]]
+        if self.payments is not None:
+            columns.append([round(value, 2) for value in self.payments.tolist()])
+        return zip(*columns)
+
+    def totals(self):
+        """合计 (病例数, 入组病例数, 总权重, CMI, 预估费用或 None)"""
+        cases, grouped, weights = int(self.cases.sum()), int(self.grouped.sum()), float(self.weights.sum())
+        cmi = weights / grouped if grouped else None
+        payments = float(self.payments.sum()) if self.payments is not None else None
+        return cases, grouped, weights, cmi, payments
+
+
+def _dimension(columns, rules, name, adrg_of):
+    """维度 -> (每条病例的编号, 编号对应的取值)"""
+    if name in ('drg', 'dept', 'region'):
+        return columns.ids(name), columns.values(name)
+    if name == 'month':
+        return recode(columns.ids('date'), columns.values('date'), month_of)
+    if name == 'adrg':
+        return recode(columns.ids('drg'), columns.values('drg'), lambda drg: adrg_of.get(drg, ''))
+    if name == 'adrg_dept':
+        return recode(columns.ids('drg'), columns.values('drg'),
+                      lambda drg: rules.adrg_dept.get(adrg_of.get(drg), '') or '')
+    raise ValueError(f"不支持的汇总维度: {name}（可选 {', '.join(DIMENSIONS)}）")
+
+
+def summarize(columns, rules, by=DEFAULT_DIMENSIONS, point_values=None):
+    """
+    按维度汇总（by 为 DIMENSIONS 中的维度名，空序列时只有一行合计）
+    权重取 rules 中 DrgsGroup.paycw，不在规则中或没有权重的 DRG（如未入组的 0000）不计入入组病例；
+    point_values 为 (统筹区, 'YYYY-MM') -> 点值 的函数（如 PointValueTable），给出时增加预估费用列
+    """
+    _require_numpy()
+    start = time.perf_counter()
+    for name in by:
+        column = DIMENSION_COLUMNS.get(name)
+        if column is not None and column not in columns.present:
+            raise ValueError(f"按{DIMENSIONS[name]}汇总需要{COLUMN_LABELS[column]}列，请用参数指定列名")
+    adrg_of = {grpcode: acode for acode, items in rules.drgs.items() for grpcode, _, _ in items}
+
+    # 每条病例的权重：按 DRG 编号查表，NaN 表示未入组
+    drg_weights = np.array([np.nan if rules.drg_weight.get(drg) is None else rules.drg_weight[drg]
+                            for drg in columns.values('drg')], np.float64)
+    case_weights = drg_weights[columns.ids('drg')]
+    grouped = ~np.isnan(case_weights)
+    case_weights = np.where(grouped, case_weights, 0.0)
+
+    # 各维度编号合成一个整数键后分组
+    dimensions = [_dimension(columns, rules, name, adrg_of) for name in by]
+    if dimensions:
+        shape = tuple(max(len(labels), 1) for _, labels in dimensions)
+        keys = np.ravel_multi_index([ids.astype(np.int64) for ids, _ in dimensions], shape)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        parts = np.unravel_index(unique_keys, shape)
+        labels = [[values[i] for i in part.tolist()] for part, (_, values) in zip(parts, dimensions)]
+    else:
+        inverse = np.zeros(columns.count, np.int64)
+        labels = []
+    size = len(labels[0]) if labels else 1
+    inverse = inverse.ravel()
+
+    cases = np.bincount(inverse, minlength=size)
+    grouped_counts = np.bincount(inverse, weights=grouped, minlength=size).astype(np.int64)
+    weights = np.bincount(inverse, weights=case_weights, minlength=size)
+
+    payments = None
+    if point_values is not None:
+        # 点值按 (统筹区, 月份) 的不同组合各取一次
+        region_ids, regions = _dimension(columns, rules, 'region', adrg_of)
+        month_ids, months = _dimension(columns, rules, 'month', adrg_of)
+        table = np.array([[np.nan if (value := point_values(region, month)) is None else value
+                           for month in months] for region in regions], np.float64).reshape(len(regions), len(months))
+        points = table[region_ids, month_ids] if columns.count else np.zeros(0)
+        payments = np.bincount(inverse, weights=np.nan_to_num(case_weights * points), minlength=size)
+
+    # 按维度取值排序
+    order = sorted(range(size), key=lambda i: tuple(values[i] for values in labels)) if labels else [0]
+    labels = [[values[i] for i in order] for values in labels]
+    order = np.array(order, np.int64)
+    return CaseMixReport(by, labels, cases[order], grouped_counts[order], weights[order],
+                         payments[order] if payments is not None else None, time.perf_counter() - start)
\ No newline at end of file
@@ -0,0 +1,90 @@
+from engine.snapshot import get_snapshot
+
+# 排除表按类目前缀匹配时的最短编码长度（如 I10）
+MIN_PREFIX_LEN = 3
+
+_NO_TBS = frozenset()
+
+
+class CCEngine:
+    """
+    并发症/严重并发症判定
+
+    CC 表给出其他诊断的排除表(tb)和级别(ccl)，Exclude 表给出每个排除表排除的主要诊断。
+    规则加载时已建好 主要诊断 -> 排除它的 tb 倒排索引；每个主要诊断第一次出现时
+    合并其编码与各级类目前缀对应的 tb 集合并缓存，之后判定只需一次集合查找。
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else get_snapshot().rules
+        self._excluded_tbs = {}
+
+    def excluded_tbs(self, main_diag):
+        """排除了该主要诊断的全部 tb"""
+        tbs = self._excluded_tbs.get(main_diag)
+        if tbs is None:
+            tbs = self._collect_tbs(main_diag)
+            self._excluded_tbs[main_diag] = tbs
+        return tbs
+
+    def _collect_tbs(self, main_diag):
+        if not main_diag:
+            return _NO_TBS
+        by_main = self.rules.exclude_by_main
+        found = None
+        for n in range(len(main_diag), MIN_PREFIX_LEN - 1, -1):
+            tbs = by_main.get(main_diag[:n])
+            if tbs:
+                found = tbs if found is None else found | tbs
+        return found or _NO_TBS
+
+    def level(self, other_diag, main_diag):
+        """其他诊断在该主要诊断下的有效级别：0 无效，1 CC，2 MCC"""
+        entry = self.rules.cc.get(other_diag)
+        if entry is None or entry[0] in self.excluded_tbs(main_diag):
+            return 0
+        return entry[1]
+
+    def is_cc(self, other_diag, main_diag):
+        """是否为有效并发症（含严重并发症）"""
+        return self.level(other_diag, main_diag) > 0
+
+    def is_mcc(self, other_diag, main_diag):
+        """是否为有效严重并发症"""
+        return self.level(other_diag, main_diag) >= 2
+
+    def case_level(self, main_diag, other_diags):
+        """病例的并发症级别：其他诊断中的最高有效级别"""
+        cc = self.rules.cc
+        excluded = None
+        level = 0
+        for code in other_diags:
+            entry = cc.get(code)
+            if entry is None or entry[1] <= level:
+                continue
+            if excluded is None:
+                excluded = self.excluded_tbs(main_diag)
+            if entry[0] in excluded:
+                continue
+            level = entry[1]
+            if level >= 2:
+                break
+        return level
+
+    def score_many(self, cases):
+        """
+        批量判定，cases 为 (主要诊断, 其他诊断, ...) 序列。
+        返回每条病例的 (病例级别, 各其他诊断的有效级别元组)。
+        """
+        cc = self.rules.cc
+        excluded_tbs = self.excluded_tbs
+        results = []
+        for case in cases:
+            main_diag, other_diags = case[0], case[1]
+            excluded = excluded_tbs(main_diag)
+            levels = []
+            for code in other_diags:
+                entry = cc.get(code)
+                levels.append(0 if entry is None or entry[0] in excluded else entry[1])
+            results.append((max(levels, default=0), tuple(levels)))
+        return results
\ No newline at end of file
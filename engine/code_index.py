@@ -0,0 +1,204 @@
+"""
+编码规范化与统一编码索引
+
+病例中的诊断、手术编码写法不一：小写、全角、夹带空格、省略小数点（A00001、000200）、
+带扩展码（A01.000X001）或星号剑号标记（G01*、A17.0†）。规则表中的编码是 ICD-10 诊断
+A00.001、ICD-9-CM-3 手术 00.0200 的形式，分组时按字符串原样查找，这些写法都查不到。
+
+- normalize_code：只规范写法（去掉空白和标记、全角转半角、转大写、补小数点、扩展码前缀统一为小写 x）；
+- CodeIndex：全部规则表编码去重排序的数组，每个编码带所在规则表的位掩码，
+  一次自顶向下的区间收缩同时得到精确匹配、前缀区间和最近的上级编码；
+- CodeNormalizer：带记忆的批量规范化，给出 CodeIndex 时再把规则表中没有的编码换成最近的上级编码
+  （如 A01.000x001 -> A01.000）。
+"""
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from engine.prefix_index import PrefixIndex
+
+# 含编码的规则表 -> 编码列下标（与 read_tables 的列顺序一致）
+CODE_COLUMNS = {
+    'CC': 0,
+    'AdrgMdcDiag': 1,
+    'MainDiagIndex': 1,
+    'OtherDiagIndex': 1,
+    'Exclude': 1,
+    'ExceptDiag': 0,
+    'MainSurgeryIndex': 1,
+    'ExceptOper': 0,
+}
+TABLE_BITS = {name: 1 << i for i, name in enumerate(CODE_COLUMNS)}
+ALL_TABLES = (1 << len(CODE_COLUMNS)) - 1
+# 分组时按编码原样查找的表，规范化时病例编码只换成这些表中的上级编码
+GROUPING_DIAG_TABLES = (TABLE_BITS['CC'] | TABLE_BITS['AdrgMdcDiag'] | TABLE_BITS['MainDiagIndex']
+                        | TABLE_BITS['OtherDiagIndex'])
+GROUPING_OPER_TABLES = TABLE_BITS['MainSurgeryIndex']
+
+# 诊断：字母 + 两位数字（类目）；手术：两位数字（类目）；其后为细目（可以 x 占位，如 I10.x00）和可选的扩展码
+_CODE_PATTERN = re.compile(r'([A-Z][0-9]{2}|[0-9]{2})\.?(X?[0-9]*)(?:X([0-9]+))?')
+_CODE_TABLE = str.maketrans({'。': '.'})
+# 剑号、星号等附加标记
+_MARKS = '*†‡+'
+
+# lookup 的结果：mask 为编码所在规则表的位掩码（不在任何表中为 0），ancestor 为最近的上级编码，
+# [lo, hi) 为以该编码为前缀的编码在索引中的下标区间
+CodeMatch = namedtuple('CodeMatch', ['code', 'mask', 'ancestor', 'lo', 'hi'])
+
+
+def normalize_code(code):
+    """规范一个编码的写法，不认识的格式只去空白、转大写"""
+    if not code:
+        return ''
+    if not code.isascii():
+        code = unicodedata.normalize('NFKC', code)
+    code = ''.join(code.split()).translate(_CODE_TABLE).strip(_MARKS).upper()
+    match = _CODE_PATTERN.fullmatch(code)
+    if match is None:
+        return code
+    code, detail, extension = match.groups()
+    if detail:
+        code += '.' + detail.lower()
+    if extension is not None:
+        code += 'x' + extension
+    return code
+
+
+def table_names(mask):
+    """位掩码 -> 规则表名列表"""
+    return [name for name, bit in TABLE_BITS.items() if mask & bit]
+
+
+class CodeIndex(PrefixIndex):
+    """
+    规则表编码的统一索引
+
+    全部规则表的编码去重后排成一个数组，values 为对应的规则表位掩码（TABLE_BITS）。
+    前缀相同的编码在数组中相邻，沿编码逐个字符收缩下标区间即相当于在字典树上逐层下行：
+    区间的第一个编码等于当前前缀时，这个前缀本身就是规则表中的编码。
+    """
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self.values = array('H', self.values)
+
+    @classmethod
+    def from_tables(cls, tables):
+        """由 read_tables 读出的整表数据建立索引，tables 中没有的规则表跳过"""
+        masks = {}
+        for name, column in CODE_COLUMNS.items():
+            bit = TABLE_BITS[name]
+            for row in tables.get(name, ()):
+                code = row[column]
+                if code:
+                    masks[code] = masks.get(code, 0) | bit
+        return cls(masks.items())
+
+    @classmethod
+    def union(cls, indexes):
+        """合并多个索引（如各规则版本），同一编码的位掩码按位或"""
+        masks = {}
+        for index in indexes:
+            for code, mask in zip(index.keys, index.values):
+                masks[code] = masks.get(code, 0) | mask
+        return cls(masks.items())
+
+    def __eq__(self, other):
+        return isinstance(other, CodeIndex) and self.keys == other.keys and self.values == other.values
+
+    def tables(self, code):
+        """编码所在规则表的位掩码，不在任何表中时为 0"""
+        keys = self.keys
+        i = bisect_left(keys, code)
+        return self.values[i] if i < len(keys) and keys[i] == code else 0
+
+    def codes(self, prefix, tables=ALL_TABLES, limit=None):
+        """以 prefix 开头、出现在 tables 中的编码（按编码排序，与 prefix 相同的在最前）"""
+        lo, hi = self.span(prefix)
+        keys, values = self.keys, self.values
+        if tables == ALL_TABLES:
+            return keys[lo:hi if limit is None else min(hi, lo + limit)]
+        codes = []
+        for i in range(lo, hi):
+            if values[i] & tables:
+                codes.append(keys[i])
+                if limit is not None and len(codes) >= limit:
+                    break
+        return codes
+
+    def lookup(self, code, tables=ALL_TABLES):
+        """
+        一次下行同时得到编码所在的规则表、以它为前缀的编码区间，
+        以及最近的上级编码（出现在 tables 中、是 code 真前缀的最长编码）
+        """
+        keys, values = self.keys, self.values
+        lo, hi = 0, len(keys)
+        ancestor = None
+        for n in range(1, len(code) + 1):
+            prefix = code[:n]
+            lo, hi = self.span(prefix, lo, hi)
+            if lo == hi:
+                return CodeMatch(code, 0, ancestor, lo, hi)
+            if n < len(code) and keys[lo] == prefix and values[lo] & tables:
+                ancestor = prefix
+        mask = values[lo] if code and keys[lo] == code else 0
+        return CodeMatch(code, mask, ancestor, lo, hi)
+
+    def ancestor(self, code, tables=ALL_TABLES):
+        """最近的上级编码，没有时为 None"""
+        return self.lookup(code, tables).ancestor
+
+
+class CodeNormalizer:
+    """
+    带记忆的编码规范化：同一写法只处理一次，批量处理整列编码时按不同值计算
+
+    给出 index（CodeIndex）时，规范化后仍不在分组用规则表中的编码换成其中最近的上级编码
+    （诊断查 diag_tables，手术查 oper_tables），没有上级编码时保持规范化后的写法。
+    """
+
+    def __init__(self, index=None, diag_tables=GROUPING_DIAG_TABLES, oper_tables=GROUPING_OPER_TABLES):
+        self.index = index
+        self.diag_tables = diag_tables
+        self.oper_tables = oper_tables
+        self._memo = {}
+        self.changed = 0    # 写法有变化的不同编码个数
+        self.resolved = 0   # 其中换成上级编码的个数
+
+    def __call__(self, code):
+        value = self._memo.get(code)
+        if value is None:
+            value = self._memo[code] = self._normalize(code)
+        return value
+
+    def _normalize(self, code):
+        normalized = normalize_code(code)
+        if self.index is not None and normalized:
+            tables = self.oper_tables if normalized[0].isdigit() else self.diag_tables
+            match = self.index.lookup(normalized, tables)
+            if not match.mask & tables and match.ancestor is not None:
+                normalized = match.ancestor
+                self.resolved += 1
+        if normalized != code:
+            self.changed += 1
+        return normalized
+
+    def many(self, codes):
+        """批量规范化，结果与输入一一对应"""
+        memo = self._memo
+        normalize = self.__call__
+        return [memo[code] if code in memo else normalize(code) for code in codes]
+
+    def codes(self, codes):
+        """其他诊断或手术元组：逐个规范化，规范化后为空的去掉"""
+        return tuple(code for code in self.many(codes) if code)
+
+    def case(self, case):
+        """病例 (主要诊断, 其他诊断, 手术[, 出院日期]) 中的编码规范化"""
+        return (self(case[0]), self.codes(case[1]), self.codes(case[2])) + tuple(case[3:])
+
+    def summary(self):
+        """一行统计文本"""
+        return (f"编码规范化: 不同编码 {len(self._memo):,} 个，改写 {self.changed:,} 个，"
+                f"其中换成上级编码 {self.resolved:,} 个")
\ No newline at end of file
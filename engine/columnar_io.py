@@ -0,0 +1,273 @@
+import os
+import re
+from engine.grouper import QY_SUFFIX, UNGROUPED_DRG, GroupResult
+from engine.batch_io import CODE_SEPARATORS, RESULT_FIELDS, resolve_columns, resolve_date_column
+from engine.rule_store import NO_VERSION, RuleStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖，只在读写 Parquet / Arrow 文件时需要
+    pa = pc = pq = None
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+# 每批读取的行数
+DEFAULT_BATCH_SIZE = 65536
+
+STATUSES = ('ok', 'qy', 'no_mdc', 'no_adrg', 'no_drg', NO_VERSION)
+_SEPARATOR_PATTERN = '[' + re.escape(CODE_SEPARATORS) + ']'
+
+
+def columnar_format(path):
+    """按扩展名判断列式文件格式：'parquet'、'arrow'，其他返回 None"""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in PARQUET_SUFFIXES:
+        return 'parquet'
+    if suffix in ARROW_SUFFIXES:
+        return 'arrow'
+    return None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ValueError("读写 Parquet / Arrow 文件需要安装 pyarrow（pip install pyarrow）")
+
+
+def normalize_column(column, normalizer):
+    """
+    一列编码（字符串列或列表列）经 CodeNormalizer 规范化：
+    字典编码后只规范化各个不同的编码，再按下标取回整列
+    """
+    if pa.types.is_list(column.type) or pa.types.is_large_list(column.type):
+        values = normalize_column(column.values, normalizer)
+        return type(column).from_arrays(column.offsets, values, mask=column.is_null() if column.null_count else None)
+    encoded = column.dictionary_encode()
+    dictionary = pa.array(normalizer.many(encoded.dictionary.to_pylist()), pa.string())
+    return dictionary.take(encoded.indices)
+
+
+def code_lists(column, normalizer=None):
+    """
+    一列编码 -> 每行的编码列表（None 表示空）
+    列表列直接取值；字符串列在 Arrow 中按 CODE_SEPARATORS 拆分成列表列后再取值
+    """
+    if not (pa.types.is_list(column.type) or pa.types.is_large_list(column.type)):
+        if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            column = pc.cast(column, pa.string())
+        column = pc.split_pattern_regex(column, _SEPARATOR_PATTERN)
+    if normalizer is not None:
+        column = normalize_column(column, normalizer)
+    return column.to_pylist()
+
+
+def _merge_codes(lists):
+    """同一行的多列编码列表合并为去空白的编码元组"""
+    codes = []
+    for values in lists:
+        if values:
+            for code in values:
+                if code is not None:
+                    code = code.strip()
+                    if code:
+                        codes.append(code)
+    return tuple(codes)
+
+
+class ColumnarBatchReader:
+    """逐批读取 Parquet / Arrow IPC 文件的记录批"""
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        _require_pyarrow()
+        self.path = path
+        self.format = columnar_format(path)
+        self.batch_size = batch_size
+        self._source = None
+        if self.format == 'parquet':
+            self._file = pq.ParquetFile(path)
+            self.schema = self._file.schema_arrow
+            self.num_rows = self._file.metadata.num_rows
+        elif self.format == 'arrow':
+            self._source = pa.memory_map(path)
+            self._file = pa.ipc.open_file(self._source)
+            self.schema = self._file.schema
+            self.num_rows = sum(self._file.get_batch(i).num_rows for i in range(self._file.num_record_batches))
+        else:
+            raise ValueError(f"不支持的列式文件: {path}")
+        self.header = self.schema.names
+
+    def batches(self):
+        if self.format == 'parquet':
+            yield from self._file.iter_batches(batch_size=self.batch_size)
+        else:
+            for i in range(self._file.num_record_batches):
+                yield self._file.get_batch(i)
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ColumnarCaseReader(ColumnarBatchReader):
+    """
+    逐批读取 Parquet / Arrow IPC 病例文件，迭代得到 (记录批, [病例, ...])
+
+    病例列的识别规则与 CSV 相同；其他诊断、手术可以是列表列（list<string>），
+    也可以是用分隔符拼接的字符串列，或带序号的多列。
+    with_date 为真时病例末尾再加出院日期（日期、时间戳或字符串列的原值）。
+    给出 normalizer（engine.code_index.CodeNormalizer）时编码按列规范化。
+    """
+
+    def __init__(self, path, main_col=None, other_cols=None, proc_cols=None, batch_size=DEFAULT_BATCH_SIZE,
+                 with_date=False, date_col=None, normalizer=None):
+        super().__init__(path, batch_size)
+        self.normalizer = normalizer
+        self.main_index, self.other_indexes, self.proc_indexes = resolve_columns(
+            self.header, main_col, other_cols, proc_cols)
+        self.date_index = resolve_date_column(self.header, date_col) if with_date else None
+
+    def cases(self, batch):
+        """一批记录中的病例 (主要诊断, 其他诊断元组, 手术元组)"""
+        main_column = batch.column(self.main_index)
+        if not (pa.types.is_string(main_column.type) or pa.types.is_large_string(main_column.type)):
+            main_column = pc.cast(main_column, pa.string())
+        normalizer = self.normalizer
+        if normalizer is not None:
+            mains = normalize_column(main_column, normalizer).to_pylist()
+        else:
+            mains = pc.utf8_trim_whitespace(main_column).to_pylist()
+        others = [code_lists(batch.column(i), normalizer) for i in self.other_indexes]
+        procedures = [code_lists(batch.column(i), normalizer) for i in self.proc_indexes]
+        cases = []
+        for row, main_diag in enumerate(mains):
+            cases.append((main_diag or '',
+                          _merge_codes(column[row] for column in others),
+                          _merge_codes(column[row] for column in procedures)))
+        if self.date_index is not None:
+            dates = batch.column(self.date_index).to_pylist()
+            cases = [case + (discharge_date,) for case, discharge_date in zip(cases, dates)]
+        return cases
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield batch, self.cases(batch)
+
+
+def case_columns(schema):
+    """分组结果文件中原有各列（结果列以外）的 (下标列表, schema)，缺少结果列时抛出 ValueError"""
+    missing = [name for name in RESULT_FIELDS if schema.get_field_index(name) < 0]
+    if missing:
+        raise ValueError("不是分组结果文件：缺少 " + ", ".join(missing) + " 列")
+    indexes = [i for i, name in enumerate(schema.names) if name not in RESULT_FIELDS]
+    return indexes, pa.schema([schema.field(i) for i in indexes])
+
+
+def stored_results(batch):
+    """分组结果文件一批记录中已有的分组结果 [GroupResult, ...]"""
+    columns = [batch.column(batch.schema.get_field_index(name)).to_pylist() for name in RESULT_FIELDS]
+    return [GroupResult(*values) for values in zip(*columns)]
+
+
+class CodeDictionary:
+    """
+    固定字典的字典编码：取值全部来自规则（ADRG、DRG、MDC、状态），
+    每批共用同一个字典，文件中只存一份，也满足 Arrow IPC 文件各批字典必须一致的要求
+    """
+
+    def __init__(self, values):
+        self.values = sorted(set(values))
+        self.index = {value: i for i, value in enumerate(self.values)}
+        self.dictionary = pa.array(self.values, pa.string())
+        self.type = pa.dictionary(pa.int32(), pa.string())
+
+    def encode(self, values):
+        index = self.index
+        try:
+            indices = [None if value is None else index[value] for value in values]
+        except KeyError as e:
+            raise ValueError(f"分组结果 {e.args[0]} 不在规则字典中")
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), self.dictionary)
+
+
+def result_dictionaries(rules, previous_rules=None):
+    """
+    由规则得到 mdc、adrg、drg、status 各列的全部可能取值
+    previous_rules 为增量重新分组时的旧版规则，沿用的原结果也要能编码；rules 为 RuleStore 时取各版本的并集
+    """
+    rule_sets = rules.rule_sets() if isinstance(rules, RuleStore) else [rules]
+    if previous_rules is not None:
+        rule_sets.append(previous_rules)
+    mdcs, adrgs, drgs = {'MDCA'}, set(), {UNGROUPED_DRG}
+    for item in rule_sets:
+        if item is not None:
+            mdcs.update(mdc for codes in item.diag_mdcs.values() for mdc in codes)
+            adrgs.update(item.adrg_rank)
+            drgs.update(item.drg_weight)
+    drgs.update(mdc[3:] + QY_SUFFIX for mdc in mdcs)
+    return {
+        'mdc': CodeDictionary(mdcs),
+        'adrg': CodeDictionary(adrgs),
+        'drg': CodeDictionary(drgs),
+        'status': CodeDictionary(STATUSES),
+    }
+
+
+class ColumnarResultWriter:
+    """
+    逐批写出原有各列加分组结果列（Parquet 或 Arrow IPC 文件，按扩展名）
+
+    mdc、adrg、drg、status 为字典编码列，ccl 为 int8，weight 为 float64。
+    """
+
+    def __init__(self, path, schema, rules, previous_rules=None):
+        _require_pyarrow()
+        self.format = columnar_format(path)
+        self.dictionaries = result_dictionaries(rules, previous_rules)
+        self.schema = schema
+        for name in ('mdc', 'adrg', 'drg'):
+            self.schema = self.schema.append(pa.field(name, self.dictionaries[name].type))
+        self.schema = (self.schema.append(pa.field('ccl', pa.int8()))
+                       .append(pa.field('weight', pa.float64()))
+                       .append(pa.field('status', self.dictionaries['status'].type)))
+        self._sink = None
+        if self.format == 'parquet':
+            self._writer = pq.ParquetWriter(path, self.schema)
+        elif self.format == 'arrow':
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        else:
+            raise ValueError(f"不支持的列式文件: {path}")
+
+    def result_arrays(self, results):
+        dictionaries = self.dictionaries
+        return [
+            dictionaries['mdc'].encode([result.mdc for result in results]),
+            dictionaries['adrg'].encode([result.adrg for result in results]),
+            dictionaries['drg'].encode([result.drg for result in results]),
+            pa.array([result.ccl for result in results], pa.int8()),
+            pa.array([result.weight for result in results], pa.float64()),
+            dictionaries['status'].encode([result.status for result in results]),
+        ]
+
+    def write(self, batch, results):
+        arrays = batch.columns + self.result_arrays(results)
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+分组结果缓存
+
+很多病例的主要诊断、其他诊断集合和手术集合完全相同（如顺产、白内障手术）。
+分组结果只取决于这三者和规则版本，与其他诊断、手术的先后顺序和重复无关，
+因此以规范化的 (规则版本, 主要诊断, 排序去重的其他诊断, 排序去重的手术) 为键缓存分组结果，
+相同的病例只分组一次。缓存按 LRU 淘汰，条数和估算内存双重上限。
+"""
+import os
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 200000
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+# 估算内存：每个条目（键元组、主要诊断、哈希表槽位和链表节点、(结果, 字节数) 元组）的字节数，
+# 以及其他诊断、手术中每个编码（字符串及其在元组中的指针）的字节数，按 sys.getsizeof 实测取整
+ENTRY_BYTES = 240
+CODE_BYTES = 72
+
+
+def canonical_codes(codes):
+    """其他诊断或手术 -> 排序去重的元组"""
+    if len(codes) < 2:
+        return tuple(codes)
+    return tuple(sorted(set(codes)))
+
+
+def cache_key(version, main_diag, other_diags, procedures):
+    """缓存键：与其他诊断、手术的顺序和重复无关"""
+    return version, main_diag, canonical_codes(other_diags), canonical_codes(procedures)
+
+
+def estimate_key_size(key):
+    """估算一个缓存条目占用的内存（按编码个数，不逐个对象计算，避免拖慢未命中的分组）"""
+    return ENTRY_BYTES + CODE_BYTES * (len(key[2]) + len(key[3]))
+
+
+class GroupCache:
+    """
+    按条数和估算字节数双重限制的 LRU 分组结果缓存
+
+    任一上限超出时淘汰最久未使用的条目；相同的分组结果共用一个对象，只计算键的内存。
+    每个分组进程各用一个（不加锁）；多进程分组时父进程中的实例只保存配置，
+    并汇总各工作进程缓存的统计（见 take_counts / merge_counts）。
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # 键 -> (分组结果, 字节数)
+        self._results = {}          # 分组结果 -> 共用的结果对象
+        self._bytes = 0
+        self._workers = {}          # 工作进程 pid -> (条数, 字节数)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.group_seconds = 0.0    # 未命中时实际分组的用时(秒)
+        self.total_seconds = 0.0    # 经缓存分组的总用时(秒)，含查找缓存和未命中时的分组
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def limits(self):
+        return self.max_entries, self.max_bytes
+
+    def get(self, key):
+        """命中时返回缓存的分组结果，否则返回 None"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, result):
+        """缓存一个分组结果，返回共用的结果对象"""
+        result = self._results.setdefault(result, result)
+        size = estimate_key_size(key)
+        if size > self.max_bytes:
+            return result
+        data = self._data
+        old = data.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        data[key] = (result, size)
+        self._bytes += size
+        while len(data) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = data.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+        return result
+
+    def clear(self):
+        self._data.clear()
+        self._results.clear()
+        self._bytes = 0
+
+    def take_counts(self):
+        """工作进程中调用：取出上次以来的命中统计并清零，连同当前占用一起交给父进程合并"""
+        counts = (os.getpid(), self.hits, self.misses, self.evictions, self.group_seconds, self.total_seconds,
+                  len(self._data), self._bytes)
+        self.hits = self.misses = self.evictions = 0
+        self.group_seconds = self.total_seconds = 0.0
+        return counts
+
+    def merge_counts(self, counts):
+        """父进程中调用：合并工作进程的统计"""
+        pid, hits, misses, evictions, group_seconds, total_seconds, entries, size = counts
+        self.hits += hits
+        self.misses += misses
+        self.evictions += evictions
+        self.group_seconds += group_seconds
+        self.total_seconds += total_seconds
+        self._workers[pid] = (entries, size)
+
+    def stats(self):
+        """
+        命中统计与当前占用（多进程时为各工作进程之和）
+        saved_seconds 为节省的时间：按未命中时的平均分组用时估算不用缓存时全部病例的分组用时，
+        减去经缓存的实际用时（含计算键、查找缓存的开销），命中率很低时可能为负
+        """
+        total = self.hits + self.misses
+        average = self.group_seconds / self.misses if self.misses else 0.0
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._data) + sum(entries for entries, _ in self._workers.values()),
+            'bytes': self._bytes + sum(size for _, size in self._workers.values()),
+            'group_seconds': self.group_seconds,
+            'total_seconds': self.total_seconds,
+            'saved_seconds': total * average - self.total_seconds if self.misses else 0.0,
+        }
+
+    def summary(self):
+        """一行统计文本"""
+        stats = self.stats()
+        saved = stats['saved_seconds']
+        saved = f"约节省 {saved:.2f} 秒" if saved >= 0 else f"约多用 {-saved:.2f} 秒"
+        return (f"分组缓存: 命中 {stats['hits']:,} 条 ({stats['hit_rate']:.1%})，未命中 {stats['misses']:,} 条，"
+                f"{saved}；缓存 {stats['entries']:,} 条 / "
+                f"{stats['bytes'] / 1024 / 1024:.1f} MB，淘汰 {stats['evictions']:,} 条")
+
+
+class CachingGrouper:
+    """
+    带结果缓存的分组引擎：包装 Grouper，接口相同
+    同一个 GroupCache 可由多个规则版本共用，version 区分各版本的键。
+    """
+
+    def __init__(self, grouper, cache, version=None):
+        self.grouper = grouper
+        self.rules = grouper.rules
+        self.cache = cache
+        self.version = version
+
+    def group(self, main_diag, other_diags=(), procedures=()):
+        cache = self.cache
+        start = time.perf_counter()
+        # 即 cache_key()，在这里展开以减少函数调用
+        key = (self.version, main_diag,
+               tuple(other_diags) if len(other_diags) < 2 else tuple(sorted(set(other_diags))),
+               tuple(procedures) if len(procedures) < 2 else tuple(sorted(set(procedures))))
+        result = cache.get(key)
+        if result is None:
+            group_start = time.perf_counter()
+            result = self.grouper.group(main_diag, other_diags, procedures)
+            cache.group_seconds += time.perf_counter() - group_start
+            result = cache.put(key, result)
+        cache.total_seconds += time.perf_counter() - start
+        return result
+
+    def group_case(self, case):
+        return self.group(case[0], case[1], case[2])
+
+    def group_many(self, cases):
+        group = self.group
+        return [group(case[0], case[1], case[2]) for case in cases]
+
+    def cc_level(self, main_diag, other_diags):
+        return self.grouper.cc_level(main_diag, other_diags)
\ No newline at end of file
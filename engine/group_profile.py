@@ -0,0 +1,153 @@
+"""
+分组分阶段计时与计数
+
+ProfilingGrouper 是 Grouper 的子类，逐阶段累计用时并统计各分组路径的病例数：
+- MDC 确定：主要诊断查 AdrgMdcDiag、多发创伤部位判断（按总用时减去其他阶段计算，含流程开销）；
+- ADRG 匹配：手术、主要诊断入池（MainSurgeryIndex / MainDiagIndex / OtherDiagIndex）；
+- CC/MCC 判定：其他诊断查 CC 表并按 Exclude 排除；
+- DRG 细分组：按并发症级别选 DrgsGroup 中的细分组。
+不需要剖析时直接使用 Grouper，分组流程中没有任何计时代码。
+"""
+import os
+from collections import Counter
+from time import perf_counter_ns
+from engine.grouper import Grouper
+from engine.rules import PRE_MDC_LETTER
+
+STAGES = ('mdc', 'adrg', 'cc', 'drg')
+STAGE_TITLES = {
+    'mdc': 'MDC确定',
+    'adrg': 'ADRG匹配',
+    'cc': 'CC/MCC判定',
+    'drg': 'DRG细分组',
+}
+
+# 计数项 -> 名称
+COUNTER_TITLES = {
+    'surgical': '手术路径入组',
+    'pre_mdc': '其中先期分组(MDCA)',
+    'medical': '内科路径入组',
+    'qy': '歧义组(QY)',
+    'no_mdc': '无MDC',
+    'no_adrg': '无ADRG',
+    'no_drg': '无DRG细分组',
+    'multiple_sites': '多发创伤部位判断',
+    'ccl_0': '无并发症',
+    'ccl_1': '伴CC',
+    'ccl_2': '伴MCC',
+}
+
+
+class GroupProfile:
+    """
+    分阶段用时（纳秒）与计数
+
+    多进程分组时每个工作进程各有一个，父进程中的实例汇总各进程的数据（见 take_counts / merge_counts）。
+    """
+
+    def __init__(self):
+        self.cases = 0
+        self.total_ns = 0
+        self.stage_ns = dict.fromkeys(STAGES, 0)
+        self.stage_calls = dict.fromkeys(STAGES, 0)
+        self.counts = Counter()
+
+    def take_counts(self):
+        """工作进程中调用：取出上次以来的数据并清零"""
+        counts = (os.getpid(), self.cases, self.total_ns, dict(self.stage_ns), dict(self.stage_calls),
+                  dict(self.counts))
+        self.__init__()
+        return counts
+
+    def merge_counts(self, counts):
+        """父进程中调用：合并工作进程的数据"""
+        _, cases, total_ns, stage_ns, stage_calls, other_counts = counts
+        self.cases += cases
+        self.total_ns += total_ns
+        for stage in STAGES:
+            self.stage_ns[stage] += stage_ns[stage]
+            self.stage_calls[stage] += stage_calls[stage]
+        self.counts.update(other_counts)
+
+    def stage_seconds(self):
+        """各阶段用时(秒)，MDC 确定为总用时减去其他阶段"""
+        seconds = {stage: self.stage_ns[stage] / 1e9 for stage in STAGES}
+        seconds['mdc'] = max(self.total_ns - sum(self.stage_ns[stage] for stage in STAGES if stage != 'mdc'), 0) / 1e9
+        return seconds
+
+    def summary_lines(self):
+        """统计文本"""
+        if not self.cases:
+            return ["分组剖析: 没有分组的病例"]
+        total = self.total_ns / 1e9
+        lines = [f"分组剖析: {self.cases:,} 条，分组用时 {total:.2f} 秒（平均 {self.total_ns / self.cases / 1000:.1f} 微秒/条）"]
+        seconds = self.stage_seconds()
+        for stage in STAGES:
+            calls = f"{self.stage_calls[stage]:>12,} 次" if stage != 'mdc' else ''
+            share = seconds[stage] / total if total else 0.0
+            lines.append(f"  {STAGE_TITLES[stage]:<10}{seconds[stage]:>10.3f} 秒{share:>8.1%}{calls}")
+        counts = self.counts
+        paths = [f"{COUNTER_TITLES[key]} {counts[key]:,} ({counts[key] / self.cases:.1%})"
+                 for key in ('surgical', 'pre_mdc', 'medical', 'qy', 'no_mdc', 'no_adrg', 'no_drg')]
+        lines.append("  " + "，".join(paths))
+        levels = [f"{COUNTER_TITLES[key]} {counts[key]:,}" for key in ('ccl_0', 'ccl_1', 'ccl_2')]
+        lines.append("  入组病例" + "，".join(levels) + f"；{COUNTER_TITLES['multiple_sites']} {counts['multiple_sites']:,} 次")
+        return lines
+
+
+class ProfilingGrouper(Grouper):
+    """按阶段计时、计数的分组引擎，结果与 Grouper 相同"""
+
+    def __init__(self, rules=None, profile=None):
+        super().__init__(rules)
+        self.profile = profile if profile is not None else GroupProfile()
+
+    def group(self, main_diag, other_diags=(), procedures=()):
+        profile = self.profile
+        start = perf_counter_ns()
+        result = super().group(main_diag, other_diags, procedures)
+        profile.total_ns += perf_counter_ns() - start
+        profile.cases += 1
+        if result.status != 'ok':
+            profile.counts[result.status] += 1
+        if result.adrg is not None:
+            profile.counts['ccl_%d' % result.ccl] += 1
+        return result
+
+    def _timed(self, stage, method, *args):
+        start = perf_counter_ns()
+        value = method(*args)
+        self.profile.stage_ns[stage] += perf_counter_ns() - start
+        self.profile.stage_calls[stage] += 1
+        return value
+
+    def _match_surgical(self, letter, main_diag, other_diags, procedures):
+        adrg = self._timed('adrg', super()._match_surgical, letter, main_diag, other_diags, procedures)
+        if adrg is not None:
+            self.profile.counts['surgical'] += 1
+            if letter == PRE_MDC_LETTER:
+                self.profile.counts['pre_mdc'] += 1
+        return adrg
+
+    def _match_medical(self, letter, main_diag, other_diags):
+        adrg = self._timed('adrg', super()._match_medical, letter, main_diag, other_diags)
+        if adrg is not None:
+            self.profile.counts['medical'] += 1
+        return adrg
+
+    def _multiple_sites(self, submdc, main_diag, other_diags):
+        self.profile.counts['multiple_sites'] += 1
+        return Grouper._multiple_sites(submdc, main_diag, other_diags)
+
+    def cc_level(self, main_diag, other_diags):
+        return self._timed('cc', super().cc_level, main_diag, other_diags)
+
+    def _finish(self, mdc, adrg, main_diag, other_diags):
+        """DRG 细分组的用时不含其中 CC/MCC 判定的用时"""
+        stage_ns = self.profile.stage_ns
+        cc_before = stage_ns['cc']
+        start = perf_counter_ns()
+        result = super()._finish(mdc, adrg, main_diag, other_diags)
+        stage_ns['drg'] += perf_counter_ns() - start - (stage_ns['cc'] - cc_before)
+        self.profile.stage_calls['drg'] += 1
+        return result
\ No newline at end of file
@@ -0,0 +1,140 @@
+from collections import namedtuple
+from engine.rules import PRE_MDC_LETTER
+from engine.snapshot import get_snapshot
+from engine.cc import CCEngine
+
+# 分组输入：主要诊断、其他诊断、手术操作
+Case = namedtuple('Case', ['main_diag', 'other_diags', 'procedures'], defaults=((), ()))
+
+# 分组结果：status 为 ok / qy（歧义组）/ no_mdc / no_adrg / no_drg
+GroupResult = namedtuple('GroupResult', ['mdc', 'adrg', 'drg', 'ccl', 'weight', 'status'])
+
+UNGROUPED_DRG = '0000'
+QY_SUFFIX = 'QY'
+
+
+class Grouper:
+    """
+    DRG 分组引擎（无界面）
+
+    分组顺序：主要诊断确定 MDC -> 诊断/手术入池确定 ADRG -> 并发症级别确定 DRG 细分组。
+    规则全部来自 RuleSet 的内存索引，单条病例分组只做字典查找。
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else get_snapshot().rules
+        self.cc = CCEngine(self.rules)
+
+    def group_case(self, case):
+        """分组单条 Case"""
+        return self.group(case[0], case[1], case[2])
+
+    def group_many(self, cases):
+        """批量分组，结果与输入顺序一致"""
+        group = self.group
+        return [group(case[0], case[1], case[2]) for case in cases]
+
+    def group(self, main_diag, other_diags=(), procedures=()):
+        """分组单条病例"""
+        rules = self.rules
+        mdcs = rules.diag_mdcs.get(main_diag)
+
+        # 先期分组：不论 MDC，手术命中 A 开头的 ADRG 即入组
+        if procedures:
+            adrg = self._match_surgical(PRE_MDC_LETTER, main_diag, other_diags, procedures)
+            if adrg is not None:
+                return self._finish('MDCA', adrg, main_diag, other_diags)
+
+        if not mdcs:
+            return GroupResult(None, None, UNGROUPED_DRG, 0, None, 'no_mdc')
+
+        for mdc in mdcs:
+            submdc = rules.mdc_submdc.get(mdc)
+            if submdc and not self._multiple_sites(submdc, main_diag, other_diags):
+                continue
+            letter = mdc[3:]
+            if procedures:
+                adrg = self._match_surgical(letter, main_diag, other_diags, procedures)
+                if adrg is not None:
+                    return self._finish(mdc, adrg, main_diag, other_diags)
+                if any(code in rules.or_opers for code in procedures):
+                    # 有手术室手术但与本 MDC 的主要诊断不匹配，进入歧义组
+                    drg = letter + QY_SUFFIX
+                    return GroupResult(mdc, None, drg, self.cc_level(main_diag, other_diags),
+                                       rules.drg_weight.get(drg), 'qy')
+            adrg = self._match_medical(letter, main_diag, other_diags)
+            if adrg is not None:
+                return self._finish(mdc, adrg, main_diag, other_diags)
+
+        return GroupResult(mdcs[0], None, UNGROUPED_DRG, 0, None, 'no_adrg')
+
+    def _finish(self, mdc, adrg, main_diag, other_diags):
+        """根据并发症级别选定 DRG 细分组"""
+        levels = self.rules.drg_by_level.get(adrg)
+        ccl = self.cc_level(main_diag, other_diags)
+        if levels is None:
+            return GroupResult(mdc, adrg, UNGROUPED_DRG, ccl, None, 'no_drg')
+        drg, weight = levels[ccl]
+        return GroupResult(mdc, adrg, drg, ccl, weight, 'ok')
+
+    def _match_surgical(self, letter, main_diag, other_diags, procedures):
+        """按手术匹配 ADRG，返回优先级最高者"""
+        rules = self.rules
+        best = None
+        best_rank = None
+        for code in procedures:
+            for acode in rules.oper_adrgs.get(code, ()):
+                if acode[:1] != letter:
+                    continue
+                rank = rules.adrg_rank[acode]
+                if best_rank is not None and rank >= best_rank:
+                    continue
+                if not self._conditions_met(acode, main_diag, other_diags):
+                    continue
+                best, best_rank = acode, rank
+        return best
+
+    def _match_medical(self, letter, main_diag, other_diags):
+        """按主要诊断匹配不需要手术的 ADRG"""
+        rules = self.rules
+        best = None
+        best_rank = None
+        for acode in rules.main_diag_adrgs.get(main_diag, ()):
+            if acode[:1] != letter or acode in rules.oper_required:
+                continue
+            rank = rules.adrg_rank[acode]
+            if best_rank is not None and rank >= best_rank:
+                continue
+            if acode in rules.other_required and not self._other_diag_hit(acode, other_diags):
+                continue
+            best, best_rank = acode, rank
+        return best
+
+    def _conditions_met(self, acode, main_diag, other_diags):
+        """手术组对主要诊断、其他诊断的附加要求"""
+        rules = self.rules
+        if acode in rules.diag_required and acode not in rules.main_diag_adrgs.get(main_diag, ()):
+            return False
+        if acode in rules.other_required and not self._other_diag_hit(acode, other_diags):
+            return False
+        return True
+
+    def _other_diag_hit(self, acode, other_diags):
+        other_diag_adrgs = self.rules.other_diag_adrgs
+        return any(acode in other_diag_adrgs.get(code, ()) for code in other_diags)
+
+    @staticmethod
+    def _multiple_sites(submdc, main_diag, other_diags):
+        """多发创伤：主要诊断与其他诊断须涉及两个及以上不同部位"""
+        site = submdc.get(main_diag)
+        if site is None:
+            return False
+        for code in other_diags:
+            other = submdc.get(code)
+            if other is not None and other != site:
+                return True
+        return False
+
+    def cc_level(self, main_diag, other_diags):
+        """其他诊断中未被主要诊断排除的最高 CC 级别"""
+        return self.cc.case_level(main_diag, other_diags)
\ No newline at end of file
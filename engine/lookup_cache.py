@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import threading
+import time
+from engine.snapshot import default_db_path, get_snapshot, reload_snapshot
+
+# 两次检查数据库是否变化的最短间隔(秒)
+CHANGE_CHECK_INTERVAL = 1.0
+
+
+class DbChangeMonitor:
+    """
+    检测数据库文件是否被修改
+
+    同时比较数据库文件(及 WAL 文件)的大小和修改时间，以及一个只读连接上的
+    PRAGMA data_version（其他连接提交后该值会变化，WAL 模式下文件时间可能不变）。
+    两次检查至少间隔 interval 秒，间隔内直接返回 False。
+    """
+
+    def __init__(self, db_path=None, interval=CHANGE_CHECK_INTERVAL):
+        self.db_path = db_path or default_db_path()
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._checked_at = time.monotonic()
+        self._state = self._read_state()
+
+    def _file_state(self):
+        state = []
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                state.append(None)
+        return tuple(state)
+
+    def _data_version(self):
+        try:
+            if self._conn is None:
+                uri = 'file:' + os.path.abspath(self.db_path) + '?mode=ro'
+                self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+        except sqlite3.Error:
+            self._conn = None
+            return None
+
+    def _read_state(self):
+        return self._file_state(), self._data_version()
+
+    def changed(self):
+        """距上次检查后数据库是否有变化"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.interval:
+                return False
+            self._checked_at = now
+            state = self._read_state()
+            if state == self._state:
+                return False
+            self._state = state
+            return True
+
+
+class RuleLookup:
+    """
+    按键查询规则明细（排除表、DRG、各诊断/手术池）
+
+    直接取规则快照中按键分好的行（与 cc_prefix 等其他界面查询同一来源），不查询数据库，
+    界面线程上调用也不会等待磁盘。每次查询前检查数据库是否变化，变化后在后台线程重新加载快照，
+    加载完成前继续使用旧快照。
+    """
+
+    def __init__(self, db_path=None):
+        self.monitor = DbChangeMonitor(db_path)
+        self._lock = threading.Lock()
+        self._reloading = None    # 正在重新加载快照的线程
+        self._reload_again = False
+        self.reload_error = None  # 最近一次重新加载失败的异常（失败时继续使用旧快照）
+
+    def _snapshot(self):
+        if self.monitor.changed():
+            self.reload()
+        return get_snapshot()
+
+    def reload(self):
+        """在后台线程重新加载规则快照并返回该线程；正在加载时不另起线程，加载完成后再加载一次"""
+        with self._lock:
+            if self._reloading is not None:
+                self._reload_again = True
+                return self._reloading
+            self._reloading = threading.Thread(target=self._reload, name='snapshot-reload', daemon=True)
+            self._reloading.start()
+            return self._reloading
+
+    def _reload(self):
+        while True:
+            try:
+                reload_snapshot()
+                self.reload_error = None
+            except Exception as e:
+                self.reload_error = e
+            with self._lock:
+                if not self._reload_again:
+                    self._reloading = None
+                    return
+                self._reload_again = False
+
+    def excludes_of(self, tb):
+        return self._snapshot().excludes_of(tb)
+
+    def drgs_of(self, acode):
+        return self._snapshot().drgs_of(acode)
+
+    def mdc_diags(self, mdccode):
+        return self._snapshot().mdc_diags(mdccode)
+
+    def main_diags_of(self, acode):
+        return self._snapshot().main_diags_of(acode)
+
+    def opers_of(self, acode):
+        return self._snapshot().opers_of(acode)
+
+    def other_diags_of(self, acode):
+        return self._snapshot().other_diags_of(acode)
+
+
+_lookup = None
+_lookup_lock = threading.Lock()
+
+
+def get_lookup():
+    """进程内共享的规则明细查询"""
+    global _lookup
+    if _lookup is None:
+        with _lookup_lock:
+            if _lookup is None:
+                _lookup = RuleLookup()
+    return _lookup
\ No newline at end of file
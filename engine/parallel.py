@@ -0,0 +1,192 @@
+import gc
+import itertools
+import multiprocessing
+import os
+from collections import deque
+from models.database import BATCH_PROFILE
+from engine.snapshot import get_snapshot, load_or_build
+from engine.rule_store import RuleStore, make_grouper
+from engine.group_cache import GroupCache
+from engine.group_profile import GroupProfile
+
+DEFAULT_CHUNK_SIZE = 5000
+# 每个工作进程最多同时排队几块，限制流式处理时驻留内存的病例数
+PENDING_CHUNKS_PER_WORKER = 2
+
+# 工作进程内的分组引擎、分组结果缓存和分阶段计时
+_worker_grouper = None
+_worker_cache = None
+_worker_profile = None
+# fork 前在父进程准备好的规则，子进程通过写时复制直接共享
+_shared_rules = None
+# 本进程是否已冻结垃圾回收（只在 fork 的进程中冻结一次）
+_gc_frozen = False
+
+
+def available_cpus():
+    """本进程可用的 CPU 数（考虑 CPU 亲和性限制）"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def _init_worker(snapshot_path, db_path, store_specs=None, cache_limits=None, profile=False):
+    """
+    工作进程初始化：fork 方式沿用父进程规则，spawn 方式加载快照文件（多版本时加载各版本的快照）
+    cache_limits 为 (条数上限, 字节数上限) 时每个工作进程各建一个分组结果缓存，profile 为真时分阶段计时
+    """
+    global _worker_grouper, _worker_cache, _worker_profile, _shared_rules
+    rules = _shared_rules
+    _shared_rules = None
+    if rules is None:
+        if store_specs is not None:
+            rules = RuleStore.from_specs(store_specs)
+        else:
+            rules = load_or_build(db_path, snapshot_path, BATCH_PROFILE).rules
+    _worker_cache = GroupCache(*cache_limits) if cache_limits is not None else None
+    _worker_profile = GroupProfile() if profile else None
+    _worker_grouper = make_grouper(rules, _worker_cache, _worker_profile)
+
+
+def _group_chunk(chunk):
+    """一块病例的分组结果，以及这块的缓存统计和分阶段计时（没有时为 None）"""
+    results = _worker_grouper.group_many(chunk)
+    return (results,
+            _worker_cache.take_counts() if _worker_cache is not None else None,
+            _worker_profile.take_counts() if _worker_profile is not None else None)
+
+
+def iter_chunks(cases, chunk_size):
+    """把输入切成列表块，支持任意可迭代对象（不会一次读入全部）"""
+    iterator = iter(cases)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ParallelGrouper:
+    """
+    多进程批量分组
+
+    输入按块分发给进程池，结果按输入顺序返回。
+    支持 fork 的平台上，规则在父进程中加载一次后 fork，
+    工作进程只读共享同一份内存页；其他平台由各进程加载同一个快照文件。
+    调用方已加载规则时可通过 rules 传入，fork 时直接共享而不再加载一次；
+    rules 为 RuleStore 时按病例的出院日期选用规则版本。
+    给出 cache（GroupCache）时各工作进程按它的上限各建一个缓存，统计汇总到 cache 中；
+    给出 profile（GroupProfile）时各工作进程分阶段计时，汇总到 profile 中。
+
+    只有一个可用 CPU，或进程池尚未启动而整个输入不足一块时，直接在本进程中分组，不启动进程池：
+    多进程只在有多个 CPU 同时分组时才有收益，否则进程间传递病例和结果的开销使其比单进程慢。
+
+    spawn 方式（Windows 等）下每个工作进程各自反序列化一份完整的规则快照，不与父进程共享，
+    每个进程约多占 95 MB 内存（现有规则库），工作进程数应按可用内存设定。
+    """
+
+    def __init__(self, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, snapshot_path=None, db_path=None, rules=None,
+                 cache=None, profile=None):
+        self.workers = workers or available_cpus()
+        self.chunk_size = chunk_size
+        self.snapshot_path = snapshot_path
+        self.db_path = db_path
+        self.rules = rules
+        self.cache = cache
+        self.profile = profile
+        self.parallel = self.workers > 1 and available_cpus() > 1
+        self._pool = None
+        self._grouper = None
+
+    def start(self):
+        """提前启动进程池（如在创建其他线程之前 fork），否则在第一次分组时启动；不需要多进程时什么也不做"""
+        if self.parallel:
+            self._start()
+
+    def _load_rules(self):
+        if self.rules is not None:
+            return self.rules
+        if self.snapshot_path or self.db_path:
+            return load_or_build(self.db_path, self.snapshot_path, BATCH_PROFILE).rules
+        return get_snapshot().rules
+
+    def _serial(self):
+        """本进程内分组用的分组引擎（缓存和计时直接记在 cache、profile 中）"""
+        if self._grouper is None:
+            self._grouper = make_grouper(self._load_rules(), self.cache, self.profile)
+        return self._grouper
+
+    def _start(self):
+        global _shared_rules, _gc_frozen
+        if self._pool is not None:
+            return
+        methods = multiprocessing.get_all_start_methods()
+        if 'fork' in methods:
+            context = multiprocessing.get_context('fork')
+            _shared_rules = self._load_rules()
+            # 冻结现有对象，避免子进程垃圾回收时改写共享页（每个进程只需冻结一次）
+            if not _gc_frozen:
+                gc.freeze()
+                _gc_frozen = True
+        else:
+            context = multiprocessing.get_context('spawn')
+        store_specs = self.rules.specs() if isinstance(self.rules, RuleStore) else None
+        cache_limits = self.cache.limits if self.cache is not None else None
+        try:
+            self._pool = context.Pool(self.workers, _init_worker,
+                                      (self.snapshot_path, self.db_path, store_specs, cache_limits,
+                                       self.profile is not None))
+        finally:
+            _shared_rules = None
+
+    def imap(self, cases):
+        """
+        逐条返回分组结果（按输入顺序），适合流式处理大文件。
+        输入按需读取：已提交未取回的块不超过 进程数 x PENDING_CHUNKS_PER_WORKER，
+        内存占用与输入总量无关（Pool.imap 会在后台线程一次读完整个输入）。
+        """
+        chunks = iter_chunks(cases, self.chunk_size)
+        if self._pool is None:
+            first = next(chunks, None)
+            if first is None:
+                return
+            if not self.parallel or len(first) < self.chunk_size:
+                grouper = self._serial()
+                yield from grouper.group_many(first)
+                for chunk in chunks:
+                    yield from grouper.group_many(chunk)
+                return
+            chunks = itertools.chain([first], chunks)
+        self._start()
+        max_pending = self.workers * PENDING_CHUNKS_PER_WORKER
+        pending = deque()
+        for chunk in chunks:
+            pending.append(self._pool.apply_async(_group_chunk, (chunk,)))
+            if len(pending) >= max_pending:
+                yield from self._collect(pending.popleft())
+        while pending:
+            yield from self._collect(pending.popleft())
+
+    def _collect(self, pending):
+        results, cache_counts, profile_counts = pending.get()
+        if cache_counts is not None:
+            self.cache.merge_counts(cache_counts)
+        if profile_counts is not None:
+            self.profile.merge_counts(profile_counts)
+        return results
+
+    def group_many(self, cases):
+        """批量分组，返回与输入顺序一致的结果列表"""
+        return list(self.imap(cases))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
\ No newline at end of file
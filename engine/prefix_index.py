@@ -0,0 +1,46 @@
+from bisect import bisect_left
+
+# 比任何编码字符都大的字符，用于确定前缀区间的上界
+_MAX_CHAR = '\U0010ffff'
+
+
+class PrefixIndex:
+    """
+    编码前缀索引
+
+    按编码排序的键数组与对应的值数组，一次二分查找得到以某前缀开头的全部编码，
+    精确匹配的编码排在结果最前面（排序后它是区间内最小的键）。
+    """
+
+    def __init__(self, items=()):
+        items = sorted(items, key=lambda item: item[0])
+        self.keys = [key for key, _ in items]
+        self.values = [value for _, value in items]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def span(self, prefix, lo=0, hi=None):
+        """以 prefix 开头的键在数组中的下标区间 [lo, hi)，已知它们都在某个区间内时可以只在其中查找"""
+        keys = self.keys
+        if hi is None:
+            hi = len(keys)
+        lo = bisect_left(keys, prefix, lo, hi)
+        hi = bisect_left(keys, prefix + _MAX_CHAR, lo, hi)
+        return lo, hi
+
+    def prefix(self, prefix, limit=None):
+        """以 prefix 开头的全部值（按编码排序，精确匹配在前），limit 限制返回条数"""
+        lo, hi = self.span(prefix)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.values[lo:hi]
+
+    def exact(self, key):
+        """编码等于 key 的全部值"""
+        keys = self.keys
+        lo = bisect_left(keys, key)
+        hi = lo
+        while hi < len(keys) and keys[hi] == key:
+            hi += 1
+        return self.values[lo:hi]
\ No newline at end of file
@@ -0,0 +1,243 @@
+"""
+规则库版本对比
+
+比较两个版本的 GroupConfig.db 中各模型表的差异（编码在 ADRG 之间移动、CC 级别变化、DRG 权重调整等）。
+每张表按主键建立 主键 -> 非主键列值 的字典：新增、删除由两版主键集合的差集得到，
+共有的主键直接比较非主键列的值（不用哈希值代替，不会因哈希碰撞漏掉修改），
+只有值不同的行才逐列列出差异，整版比对在秒级完成。
+两个规则库直接整表读取，不生成也不保存规则快照（比对的往往是临时下载的发布包）。
+"""
+import os
+import time
+import unicodedata
+from operator import itemgetter
+from sqlalchemy.orm import Session
+from models.database import BATCH_PROFILE, create_read_only_engine
+from engine.rules import read_tables
+from engine.snapshot import SNAPSHOT_MODELS
+
+# 表名 -> 显示名称
+TABLE_TITLES = {
+    'Adrg': 'ADRG',
+    'AdrgMdcDiag': 'MDC诊断表',
+    'MainDiagIndex': 'ADRG主要诊断表',
+    'MainSurgeryIndex': 'ADRG主要手术表',
+    'OtherDiagIndex': 'ADRG其他诊断表',
+    'CC': '并发症表',
+    'Exclude': '排除表',
+    'DrgsGroup': 'DRG细分组',
+    'ExceptDiag': '不应编码诊断',
+    'ExceptOper': '不应编码手术',
+}
+
+# 主键中表示“所属分组”的列：同一编码从一组删除、加入另一组时报告为“移动”
+MOVE_COLUMNS = {
+    'MainDiagIndex': 'acode',
+    'MainSurgeryIndex': 'acode',
+    'OtherDiagIndex': 'acode',
+    'AdrgMdcDiag': 'mdccode',
+}
+
+ADDED, REMOVED, CHANGED, MOVED = '新增', '删除', '修改', '移动'
+CHANGE_KINDS = (ADDED, REMOVED, CHANGED, MOVED)
+
+# 明细的列：规则表、变化、主键、字段、旧值、新值
+ENTRY_HEADERS = ('规则表', '变化', '编码', '字段', '旧值', '新值')
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _pad(text, width):
+    """按显示宽度（中文占两格）左对齐"""
+    used = sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+    return text + ' ' * max(width - used, 0)
+
+
+def _join(values):
+    return ' / '.join(_text(value) for value in values if value is not None and value != '')
+
+
+class TableLayout:
+    """一张模型表的列名、主键列与非主键列下标"""
+
+    def __init__(self, model):
+        table = model.__table__
+        self.name = table.name
+        self.title = TABLE_TITLES.get(self.name, self.name)
+        self.columns = [column.name for column in table.columns]
+        self.key_indexes = tuple(i for i, column in enumerate(table.columns) if column.primary_key)
+        self.value_indexes = tuple(i for i in range(len(self.columns)) if i not in self.key_indexes)
+        # 取主键 / 非主键列的函数（单列主键时得到的是值本身而不是元组）
+        self.key_getter = itemgetter(*self.key_indexes)
+        self.value_getter = itemgetter(*self.value_indexes) if self.value_indexes else None
+
+    def values_by_key(self, rows):
+        """主键 -> 非主键列的值；同一主键重复出现时后者为准。全部列都是主键时值恒为 None"""
+        if self.value_getter is None:
+            return dict.fromkeys(map(self.key_getter, rows))
+        return dict(zip(map(self.key_getter, rows), map(self.value_getter, rows)))
+
+    def key_of(self, row):
+        return tuple(row[i] for i in self.key_indexes)
+
+
+class TableComparison:
+    """一张表两个版本的差异，各列表中保存原始行元组"""
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.added = []      # 新版行
+        self.removed = []    # 旧版行
+        self.changed = []    # (旧版行, 新版行)
+        self.moved = []      # (旧版行, 新版行)
+
+    @property
+    def name(self):
+        return self.layout.name
+
+    @property
+    def title(self):
+        return self.layout.title
+
+    def counts(self):
+        return {ADDED: len(self.added), REMOVED: len(self.removed),
+                CHANGED: len(self.changed), MOVED: len(self.moved)}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed or self.moved)
+
+    def entries(self):
+        """差异明细 (规则表, 变化, 主键, 字段, 旧值, 新值)，修改按列各一条"""
+        layout = self.layout
+        title, columns = layout.title, layout.columns
+        values = layout.value_indexes
+        move_index = columns.index(MOVE_COLUMNS[layout.name]) if layout.name in MOVE_COLUMNS else None
+        for row in self.added:
+            yield title, ADDED, _join(layout.key_of(row)), '', '', _join(row[i] for i in values)
+        for row in self.removed:
+            yield title, REMOVED, _join(layout.key_of(row)), '', _join(row[i] for i in values), ''
+        for old, new in self.changed:
+            key = _join(layout.key_of(new))
+            for i in values:
+                if old[i] != new[i]:
+                    yield title, CHANGED, key, columns[i], _text(old[i]), _text(new[i])
+        for old, new in self.moved:
+            key = _join(new[i] for i in layout.key_indexes if i != move_index)
+            yield title, MOVED, key, columns[move_index], _text(old[move_index]), _text(new[move_index])
+
+
+def _rows_by_key(layout, rows, keys):
+    if not keys:
+        return {}
+    return {key: row for key, row in zip(map(layout.key_getter, rows), rows) if key in keys}
+
+
+def compare_table(layout, old_rows, new_rows):
+    """按主键比较一张表的两个版本"""
+    comparison = TableComparison(layout)
+    old_values, new_values = layout.values_by_key(old_rows), layout.values_by_key(new_rows)
+    removed_keys = old_values.keys() - new_values.keys()
+    added_keys = new_values.keys() - old_values.keys()
+    changed_keys = {key for key, values in new_values.items()
+                    if key in old_values and old_values[key] != values}
+
+    # 只有差异行才取出完整的行（同一主键重复出现时后者为准）
+    old_by_key = _rows_by_key(layout, old_rows, removed_keys | changed_keys)
+    new_by_key = _rows_by_key(layout, new_rows, added_keys | changed_keys)
+    comparison.changed = [(old_by_key[key], row) for key, row in new_by_key.items() if key in changed_keys]
+    removed = [row for key, row in old_by_key.items() if key in removed_keys]
+    added = [row for key, row in new_by_key.items() if key in added_keys]
+    key_of = layout.key_getter
+
+    move_column = MOVE_COLUMNS.get(layout.name)
+    if move_column is not None:
+        # 编码（主键中分组列以外的部分）在旧版只出现于被删除的分组、新版只出现于新增的分组时，视为移动
+        move_index = layout.columns.index(move_column)
+        rest = [i for i in layout.key_indexes if i != move_index]
+
+        def code_of(row):
+            return tuple(row[i] for i in rest)
+
+        removed_by_code, added_by_code = {}, {}
+        for row in removed:
+            removed_by_code.setdefault(code_of(row), []).append(row)
+        for row in added:
+            added_by_code.setdefault(code_of(row), []).append(row)
+        moved_old, moved_new = set(), set()
+        for code, new_rows_of_code in added_by_code.items():
+            old_rows_of_code = removed_by_code.get(code)
+            if old_rows_of_code and len(old_rows_of_code) == 1 and len(new_rows_of_code) == 1:
+                comparison.moved.append((old_rows_of_code[0], new_rows_of_code[0]))
+                moved_old.add(key_of(old_rows_of_code[0]))
+                moved_new.add(key_of(new_rows_of_code[0]))
+        removed = [row for row in removed if key_of(row) not in moved_old]
+        added = [row for row in added if key_of(row) not in moved_new]
+
+    comparison.removed = removed
+    comparison.added = added
+    return comparison
+
+
+class ReleaseComparison:
+    """两个版本规则库的对比结果"""
+
+    def __init__(self, old_path=None, new_path=None):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.tables = {}      # 表名 -> TableComparison
+        self.elapsed = 0.0    # 比较用时(秒)，不含加载规则
+
+    def counts(self):
+        """{表名: {变化: 条数}}"""
+        return {name: table.counts() for name, table in self.tables.items()}
+
+    def total(self):
+        return sum(sum(counts.values()) for counts in self.counts().values())
+
+    def entries(self):
+        for table in self.tables.values():
+            yield from table.entries()
+
+    def summary_lines(self):
+        """各表各类变化条数的文本表格"""
+        lines = [_pad('规则表', 16) + ''.join(' ' * 6 + kind for kind in CHANGE_KINDS)]
+        for table in self.tables.values():
+            counts = table.counts()
+            lines.append(_pad(table.title, 16) + ''.join(f"{counts[kind]:>10,}" for kind in CHANGE_KINDS))
+        return lines
+
+
+def compare_tables(old_tables, new_tables, models=SNAPSHOT_MODELS, old_path=None, new_path=None):
+    """比较 read_tables / 规则快照形式的两版整表数据"""
+    start = time.perf_counter()
+    comparison = ReleaseComparison(old_path, new_path)
+    for model in models:
+        layout = TableLayout(model)
+        comparison.tables[layout.name] = compare_table(
+            layout, old_tables.get(layout.name, []), new_tables.get(layout.name, []))
+    comparison.elapsed = time.perf_counter() - start
+    return comparison
+
+
+def read_release(path, profile=BATCH_PROFILE, models=SNAPSHOT_MODELS):
+    """
+    整表读取一个规则库文件（只在内存中，不生成规则快照）：为该文件单独建只读引擎，
+    读完即关闭连接，不在进程内留下引擎和打开的文件
+    """
+    # 只读连接不会新建文件，但先检查可以给出明确的提示
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"规则库文件不存在: {path}")
+    engine = create_read_only_engine(path, profile)
+    try:
+        with Session(engine) as session:
+            return read_tables(session, models)
+    finally:
+        engine.dispose()
+
+
+def compare_databases(old_path, new_path, profile=BATCH_PROFILE):
+    """比较两个规则库文件"""
+    return compare_tables(read_release(old_path, profile), read_release(new_path, profile),
+                          old_path=old_path, new_path=new_path)
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+规则库版本差异与增量重新分组
+
+新版 GroupConfig.db 发布后，逐表比较新旧两版规则，得到受影响的编码：
+只有包含这些编码（或原结果落在受影响 ADRG/DRG）的病例才需要按新规则重新分组，
+其余病例的原分组结果原样沿用。
+"""
+from engine.parallel import iter_chunks
+
+# 参与比较的规则表，以及各表中影响分组结果的列（名称等说明性列的修改不影响分组）
+DIFF_COLUMNS = {
+    'Adrg': (0, 3),                 # ADRG, 内外科
+    'AdrgMdcDiag': (0, 1, 3),       # MDC, 诊断编码, 损伤部位
+    'MainDiagIndex': (0, 1),        # ADRG, 主要诊断编码
+    'MainSurgeryIndex': (0, 1),     # ADRG, 手术编码
+    'OtherDiagIndex': (0, 1),       # ADRG, 其他诊断编码
+    'CC': (0, 1, 3),                # 诊断编码, 排除表, 级别
+    'Exclude': (0, 1),              # 排除表, 主要诊断编码/类目
+    'DrgsGroup': (0, 6, 7),         # DRG, 权重, ADRG
+}
+
+# 每块读入的行数：块内先筛出受影响的病例再一次分组，内存占用与文件大小无关
+DEFAULT_BLOCK_SIZE = 65536
+
+
+class TableDiff:
+    """一张表新旧两版的差异：removed 为只在旧版中的行，added 为只在新版中的行"""
+
+    def __init__(self, name, removed, added):
+        self.name = name
+        self.removed = removed
+        self.added = added
+
+    def rows(self):
+        return self.removed + self.added
+
+    def __bool__(self):
+        return bool(self.removed or self.added)
+
+    def __repr__(self):
+        return f"<TableDiff(name='{self.name}', removed={len(self.removed)}, added={len(self.added)})>"
+
+
+def _project(rows, columns):
+    return [tuple(row[i] for i in columns) for row in rows]
+
+
+def diff_tables(old_tables, new_tables, columns=DIFF_COLUMNS):
+    """逐表按行集合比较，返回 {表名: TableDiff}，行只保留 columns 中的列，顺序与表内一致"""
+    diffs = {}
+    for name, indexes in columns.items():
+        old_rows = _project(old_tables[name], indexes)
+        new_rows = _project(new_tables[name], indexes)
+        old_set, new_set = set(old_rows), set(new_rows)
+        removed = [row for row in dict.fromkeys(old_rows) if row not in new_set]
+        added = [row for row in dict.fromkeys(new_rows) if row not in old_set]
+        diffs[name] = TableDiff(name, removed, added)
+    return diffs
+
+
+class AffectedCodes:
+    """
+    受规则变化影响的编码
+
+    病例的主要诊断在 main_diags 中、任一其他诊断在 other_diags 中、任一手术在 procedures 中，
+    或原分组结果的 ADRG 在 adrgs 中、DRG 在 drgs 中时需要重新分组；everything 为真时全部重新分组。
+    """
+
+    def __init__(self):
+        self.main_diags = set()
+        self.other_diags = set()
+        self.procedures = set()
+        self.adrgs = set()
+        self.drgs = set()
+        self.everything = False
+        self.reasons = []
+
+    def __bool__(self):
+        return bool(self.everything or self.main_diags or self.other_diags or self.procedures
+                    or self.adrgs or self.drgs)
+
+    def affects(self, case, adrg=None, drg=None):
+        """病例 (主要诊断, 其他诊断, 手术) 及其原分组结果是否受影响"""
+        if self.everything:
+            return True
+        if case[0] in self.main_diags or adrg in self.adrgs or drg in self.drgs:
+            return True
+        other_diags = self.other_diags
+        for code in case[1]:
+            if code in other_diags:
+                return True
+        procedures = self.procedures
+        for code in case[2]:
+            if code in procedures:
+                return True
+        return False
+
+    def summary(self):
+        if self.everything:
+            return "全部病例（" + "；".join(self.reasons) + "）"
+        return (f"主要诊断 {len(self.main_diags):,} 个，其他诊断 {len(self.other_diags):,} 个，"
+                f"手术 {len(self.procedures):,} 个，ADRG {len(self.adrgs):,} 个，DRG {len(self.drgs):,} 个")
+
+
+def _rank_order_changed(old_rules, new_rules):
+    """新旧两版都有的 ADRG 之间优先级先后是否变化"""
+    common = [acode for acode in old_rules.adrg_rank if acode in new_rules.adrg_rank]
+    return common != sorted(common, key=new_rules.adrg_rank.get)
+
+
+def _pool_codes(by_adrg, acode):
+    return {row[1] for row in by_adrg.get(acode, ())}
+
+
+def affected_codes(old_snapshot, new_snapshot, diffs=None):
+    """
+    由两版规则快照的逐表差异计算受影响的编码
+
+    编码入池/出池只影响含该编码的病例；ADRG 内外科或入池要求（是否有主要诊断、手术、
+    其他诊断池）变化时，按该 ADRG 新旧两版池中的全部主要诊断和手术扩展；
+    DRG 细分组或权重变化只影响原结果落在该 ADRG/DRG 的病例。
+    """
+    if diffs is None:
+        diffs = diff_tables(old_snapshot.tables, new_snapshot.tables)
+    old_rules, new_rules = old_snapshot.rules, new_snapshot.rules
+    affected = AffectedCodes()
+
+    if _rank_order_changed(old_rules, new_rules):
+        affected.everything = True
+        affected.reasons.append("ADRG 优先级顺序变化")
+
+    changed_adrgs = set()
+    for acode, _ in diffs['Adrg'].rows():
+        changed_adrgs.add(str(acode))
+    for name in ('diag_required', 'oper_required', 'other_required'):
+        changed_adrgs |= getattr(old_rules, name) ^ getattr(new_rules, name)
+
+    for acode, code in diffs['MainDiagIndex'].rows():
+        affected.main_diags.add(code)
+    for acode, code in diffs['MainSurgeryIndex'].rows():
+        affected.procedures.add(code)
+    for acode, code in diffs['OtherDiagIndex'].rows():
+        affected.other_diags.add(code)
+
+    # MDC 诊断表：决定主要诊断所属 MDC，损伤部位还用于判断多发创伤（其他诊断也会用到）
+    changed_mdcs = set()
+    for mdccode, code, _ in diffs['AdrgMdcDiag'].rows():
+        affected.main_diags.add(code)
+        affected.other_diags.add(code)
+        changed_mdcs.add(mdccode)
+    for mdccode in changed_mdcs:
+        if bool(old_rules.mdc_submdc.get(mdccode)) != bool(new_rules.mdc_submdc.get(mdccode)):
+            # 该 MDC 是否需要判断多发创伤发生变化，全部主要诊断都受影响
+            for snapshot in (old_snapshot, new_snapshot):
+                affected.main_diags.update(row[1] for row in snapshot.mdc_diags(mdccode))
+
+    # CC 表：其他诊断的级别和排除表
+    for code, _, _ in diffs['CC'].rows():
+        affected.other_diags.add(code)
+    # 排除表变化：属于这些排除表的其他诊断受影响
+    changed_tbs = {tb for tb, _ in diffs['Exclude'].rows()}
+    if changed_tbs:
+        for rules in (old_rules, new_rules):
+            affected.other_diags.update(code for code, (tb, _) in rules.cc.items() if tb in changed_tbs)
+
+    for grpcode, _, acode in diffs['DrgsGroup'].rows():
+        affected.drgs.add(grpcode)
+        affected.adrgs.add(acode)
+
+    for acode in changed_adrgs:
+        affected.adrgs.add(acode)
+        for snapshot in (old_snapshot, new_snapshot):
+            affected.main_diags |= _pool_codes(snapshot.main_diags_by_adrg, acode)
+            affected.procedures |= _pool_codes(snapshot.opers_by_adrg, acode)
+    return affected
+
+
+def regroup_stream(items, affected, grouper, block_size=DEFAULT_BLOCK_SIZE, normalizers=None):
+    """
+    增量重新分组：items 为 (原始数据, 病例, 原 ADRG, 原 DRG) 的可迭代对象，
+    按输入顺序 yield (原始数据, 新分组结果)，不受影响的病例新分组结果为 None（沿用原结果）。
+    grouper 为 Grouper 或 ParallelGrouper，每块只对受影响的病例调用一次 group_many。
+
+    normalizers 为按旧版、新版规则换上级编码的两个 CodeNormalizer 时，items 中为未规范化的病例：
+    上级编码随规则表变化，两版规范化结果不同、或其中任一个受影响的病例都要重新分组，分组用新版的结果。
+    """
+    for block in iter_chunks(items, block_size):
+        if normalizers is None:
+            flags = [affected.affects(case, adrg, drg) for _, case, adrg, drg in block]
+            cases = [item[1] for item, flag in zip(block, flags) if flag]
+        else:
+            old_normalize, new_normalize = normalizers[0].case, normalizers[1].case
+            flags, cases = [], []
+            for _, case, adrg, drg in block:
+                old_case, new_case = old_normalize(case), new_normalize(case)
+                flag = (old_case != new_case or affected.affects(new_case, adrg, drg)
+                        or affected.affects(old_case, adrg, drg))
+                flags.append(flag)
+                if flag:
+                    cases.append(new_case)
+        results = iter(grouper.group_many(cases) if cases else ())
+        for item, flag in zip(block, flags):
+            yield item[0], next(results) if flag else None
\ No newline at end of file
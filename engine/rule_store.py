@@ -0,0 +1,344 @@
+"""
+多版本规则库
+
+医保结算按地区、出院年份使用不同版本的 GroupConfig.db，需要在一个进程中同时按多个版本分组。
+RuleStore 保存多个版本的规则快照，病例按出院日期选用对应版本：
+- 各版本中相同的编码、名称字符串和相同的行元组、编码元组只保存一份；
+- 与已加载版本相同的整表、按 ADRG/MDC/tb 划分的分区以及 RuleSet 中的索引直接共用同一个对象，
+  内存随版本之间的差异增长，而不是随版本数成倍增长。
+"""
+import bisect
+import configparser
+import datetime
+import os
+import re
+from models.database import BATCH_PROFILE
+from engine.grouper import Grouper, GroupResult, UNGROUPED_DRG
+from engine.group_cache import CachingGrouper
+from engine.group_profile import ProfilingGrouper
+from engine.snapshot import RuleSnapshot, default_snapshot_path, load_or_build
+
+# 出院日期不在任何版本有效期内（或无法识别）时的分组状态
+NO_VERSION = 'no_version'
+
+# RuleSnapshot 中按 ADRG/MDC/tb 分区的索引：{键: [行, ...]}
+PARTITIONED_INDEXES = ('drgs_by_adrg', 'mdc_pool', 'main_diags_by_adrg', 'opers_by_adrg',
+                       'other_diags_by_adrg', 'exclude_by_tb')
+# 只由 CC 表决定的索引，CC 表与已有版本相同时直接共用
+CC_INDEXES = ('cc_by_code',)
+
+_DATE_SEPARATORS = re.compile(r'[-/.年月日]')
+
+
+def parse_date(value):
+    """
+    出院日期 -> datetime.date
+    支持 date/datetime 对象和 '2024-05-01'、'2024/5/1'、'20240501'、'2024-05-01 10:30:00' 等字符串，
+    空值返回 None，无法识别时抛出 ValueError
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    text = str(value).strip().split(' ')[0].split('T')[0]
+    if not text:
+        return None
+    try:
+        if text.isdigit() and len(text) == 8:
+            return datetime.date(int(text[:4]), int(text[4:6]), int(text[6:]))
+        parts = [part for part in _DATE_SEPARATORS.split(text) if part]
+        if len(parts) == 3:
+            return datetime.date(*map(int, parts))
+    except ValueError:
+        pass
+    raise ValueError(f"无法识别的日期: {value}")
+
+
+class RuleVersion:
+    """一个规则版本：出院日期在 [start, end) 内的病例使用（start/end 为 None 表示不限）"""
+
+    def __init__(self, name, snapshot, start=None, end=None, db_path=None, snapshot_path=None):
+        self.name = name
+        self.snapshot = snapshot
+        self.start = start
+        self.end = end
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path
+        self.messages = []    # 加载该版本快照时的提示（见 load_or_build）
+
+    @property
+    def rules(self):
+        return self.snapshot.rules
+
+    def covers(self, day):
+        return (self.start is None or day >= self.start) and (self.end is None or day < self.end)
+
+    def __repr__(self):
+        return f"<RuleVersion(name='{self.name}', start={self.start}, end={self.end}, db_path='{self.db_path}')>"
+
+
+class RuleStore:
+    """
+    多个规则版本的集合，version_for() 按出院日期选版本
+
+    加入的快照先与已有版本去重（见模块说明），因此 add() 之后应使用返回版本中的快照，
+    各版本的快照和规则加入后都不应再修改。
+    """
+
+    def __init__(self):
+        self.versions = []    # 按 start 排序
+        self._starts = []
+        self._shared = {}     # 各版本共用的字符串、元组、frozenset
+
+    def __len__(self):
+        return len(self.versions)
+
+    def __iter__(self):
+        return iter(self.versions)
+
+    def rule_sets(self):
+        return [version.rules for version in self.versions]
+
+    def get(self, name):
+        for version in self.versions:
+            if version.name == name:
+                return version
+        return None
+
+    def load(self, name, db_path, start=None, end=None, snapshot_path=None, profile=BATCH_PROFILE):
+        """按规则库文件加载一个版本（通过该库的规则快照，快照有效时不访问数据库）"""
+        snapshot_path = snapshot_path or default_snapshot_path(db_path)
+        snapshot = load_or_build(db_path, snapshot_path, profile)
+        version = self.add(name, snapshot, start, end, db_path, snapshot_path)
+        version.messages = snapshot.messages
+        return version
+
+    def add(self, name, snapshot, start=None, end=None, db_path=None, snapshot_path=None):
+        """加入一个版本，返回 RuleVersion；有效期与已有版本重叠时抛出 ValueError"""
+        start, end = parse_date(start), parse_date(end)
+        if self.get(name) is not None:
+            raise ValueError(f"规则版本重复: {name}")
+        if start is not None and end is not None and end <= start:
+            raise ValueError(f"规则版本 {name} 的有效期不正确: {start} ~ {end}")
+        version = RuleVersion(name, self._share_snapshot(snapshot), start, end, db_path, snapshot_path)
+        for other in self.versions:
+            if self._overlaps(version, other):
+                raise ValueError(f"规则版本 {name} 与 {other.name} 的有效期重叠")
+        key = start or datetime.date.min
+        index = bisect.bisect_right(self._starts, key)
+        self._starts.insert(index, key)
+        self.versions.insert(index, version)
+        return version
+
+    @staticmethod
+    def _overlaps(a, b):
+        a_start, b_start = a.start or datetime.date.min, b.start or datetime.date.min
+        a_end, b_end = a.end or datetime.date.max, b.end or datetime.date.max
+        return a_start < b_end and b_start < a_end
+
+    def version_for(self, discharge_date):
+        """出院日期所用的版本，不在任何版本有效期内时返回 None"""
+        day = parse_date(discharge_date)
+        if day is None:
+            return None
+        index = bisect.bisect_right(self._starts, day) - 1
+        if index < 0:
+            return None
+        version = self.versions[index]
+        return version if version.covers(day) else None
+
+    # 去重共用
+
+    def _share_value(self, value):
+        """返回与 value 相等的共用对象：字符串、元组（逐项）、frozenset"""
+        if isinstance(value, str):
+            return self._shared.setdefault(value, value)
+        if isinstance(value, (tuple, frozenset)):
+            existing = self._shared.get(value)
+            if existing is not None:
+                return existing
+            value = value.__class__([self._share_value(item) for item in value])
+            return self._shared.setdefault(value, value)
+        return value
+
+    def _share_rows(self, rows):
+        """表中的行元组去重：整行已存在时直接取共用的行（版本之间多数行相同），否则逐个字符串去重"""
+        shared = self._shared
+        setdefault = shared.setdefault
+        result = []
+        for row in rows:
+            existing = shared.get(row)
+            if existing is None:
+                row = tuple([setdefault(value, value) if value.__class__ is str else value for value in row])
+                existing = setdefault(row, row)
+            result.append(existing)
+        return result
+
+    def _previous(self, get):
+        """已有版本中对应的对象（get(快照) 取得），用于与新版本比较"""
+        for version in self.versions:
+            value = get(version.snapshot)
+            if value is not None:
+                yield value
+
+    def _same_as_previous(self, value, get):
+        for previous in self._previous(get):
+            if previous is value or previous == value:
+                return previous
+        return value
+
+    def _share_snapshot(self, snapshot):
+        # 整表：行元组逐个去重，与已有版本相同的整表共用
+        tables = {}
+        for name, rows in snapshot.tables.items():
+            rows = self._share_rows(rows)
+            tables[name] = self._same_as_previous(rows, lambda s, name=name: s.tables.get(name))
+        for version in self.versions:
+            if all(version.snapshot.tables.get(name) is rows for name, rows in tables.items()):
+                return version.snapshot
+
+        shared = RuleSnapshot.from_tables(tables, snapshot.source)
+        # 按 ADRG/MDC/tb 的分区：与已有版本同一键下相同的分区共用
+        for attr in PARTITIONED_INDEXES:
+            partitions = getattr(shared, attr)
+            for key, rows in partitions.items():
+                partitions[key] = self._same_as_previous(
+                    rows, lambda s, attr=attr, key=key: getattr(s, attr).get(key))
+            setattr(shared, attr, self._same_as_previous(partitions, lambda s, attr=attr: getattr(s, attr)))
+        for version in self.versions:
+            if version.snapshot.tables['CC'] is tables['CC']:
+                for attr in CC_INDEXES:
+                    setattr(shared, attr, getattr(version.snapshot, attr))
+                break
+        self._share_rules(shared.rules)
+        return shared
+
+    def _share_rules(self, rules):
+        """RuleSet 各索引：值去重，嵌套的字典按键共用，整个索引与已有版本相同时共用"""
+        for attr, index in list(vars(rules).items()):
+            if isinstance(index, dict):
+                for key, value in index.items():
+                    if isinstance(value, dict):
+                        index[key] = self._same_as_previous(
+                            value, lambda s, attr=attr, key=key: getattr(s.rules, attr).get(key))
+                    else:
+                        index[key] = self._share_value(value)
+            setattr(rules, attr, self._same_as_previous(index, lambda s, attr=attr: getattr(s.rules, attr)))
+
+    # 配置
+
+    def specs(self):
+        """重建本集合所需的 (名称, 规则库路径, 快照路径, 起始日期, 截止日期) 列表，用于 spawn 方式的工作进程"""
+        specs = []
+        for version in self.versions:
+            if version.db_path is None:
+                raise ValueError(f"规则版本 {version.name} 不是从规则库文件加载的")
+            specs.append((version.name, version.db_path, version.snapshot_path, version.start, version.end))
+        return specs
+
+    @classmethod
+    def from_specs(cls, specs, profile=BATCH_PROFILE):
+        store = cls()
+        for name, db_path, snapshot_path, start, end in specs:
+            store.load(name, db_path, start, end, snapshot_path, profile)
+        return store
+
+    @classmethod
+    def from_config(cls, path, profile=BATCH_PROFILE):
+        """
+        从版本配置文件加载，每节一个版本，节名为版本名称：
+            [CHS-DRG 1.1]
+            path = GroupConfig_1.1.db   ; 相对路径相对于配置文件所在目录
+            start = 2023-01-01          ; 出院日期 >= start（可省略）
+            end = 2024-01-01            ; 出院日期 < end（可省略）
+        """
+        parser = configparser.ConfigParser(inline_comment_prefixes=(';', '#'))
+        if not parser.read(path, encoding='utf-8'):
+            raise ValueError(f"找不到规则版本配置文件: {path}")
+        base = os.path.dirname(os.path.abspath(path))
+        store = cls()
+        for name in parser.sections():
+            section = parser[name]
+            if 'path' not in section:
+                raise ValueError(f"规则版本 {name} 缺少 path")
+            db_path = os.path.join(base, os.path.expanduser(section['path']))
+            store.load(name, db_path, section.get('start') or None, section.get('end') or None, profile=profile)
+        if not store.versions:
+            raise ValueError(f"规则版本配置文件中没有版本: {path}")
+        return store
+
+
+class MultiVersionGrouper:
+    """
+    按出院日期选择规则版本的分组引擎
+
+    病例为 (主要诊断, 其他诊断, 手术, 出院日期)，每个版本各用一个 Grouper；
+    同一出院日期（原始值）只解析、选版本一次。给出 cache（GroupCache）时各版本共用，键中带版本名称；
+    给出 profile（GroupProfile）时各版本的分阶段计时、计数都累计到其中。
+    """
+
+    def __init__(self, store, cache=None, profile=None):
+        self.store = store
+        self.cache = cache
+        self.profile = profile
+        self._groupers = {}
+        self._routes = {}
+
+    def grouper_for(self, discharge_date):
+        """出院日期对应版本的 Grouper，没有对应版本时返回 None"""
+        try:
+            return self._routes[discharge_date]
+        except KeyError:
+            pass
+        except TypeError:   # 不可哈希的值不缓存
+            return self._route(discharge_date)
+        grouper = self._routes[discharge_date] = self._route(discharge_date)
+        return grouper
+
+    def _route(self, discharge_date):
+        try:
+            version = self.store.version_for(discharge_date)
+        except ValueError:
+            return None
+        if version is None:
+            return None
+        grouper = self._groupers.get(version.name)
+        if grouper is None:
+            grouper = _base_grouper(version.rules, self.profile)
+            if self.cache is not None:
+                grouper = CachingGrouper(grouper, self.cache, version.name)
+            self._groupers[version.name] = grouper
+        return grouper
+
+    def group(self, main_diag, other_diags=(), procedures=(), discharge_date=None):
+        grouper = self.grouper_for(discharge_date)
+        if grouper is None:
+            return GroupResult(None, None, UNGROUPED_DRG, 0, None, NO_VERSION)
+        return grouper.group(main_diag, other_diags, procedures)
+
+    def group_case(self, case):
+        return self.group(case[0], case[1], case[2], case[3] if len(case) > 3 else None)
+
+    def group_many(self, cases):
+        group_case = self.group_case
+        return [group_case(case) for case in cases]
+
+
+def _base_grouper(rules, profile=None):
+    return ProfilingGrouper(rules, profile) if profile is not None else Grouper(rules)
+
+
+def make_grouper(rules, cache=None, profile=None):
+    """
+    RuleSet -> Grouper；RuleStore -> 按出院日期选版本的 MultiVersionGrouper
+    给出 cache（GroupCache）时分组结果经缓存；给出 profile（GroupProfile）时用 ProfilingGrouper 分阶段计时，
+    同时给出时只有未命中缓存、实际分组的病例计入 profile
+    """
+    if isinstance(rules, RuleStore):
+        return MultiVersionGrouper(rules, cache, profile)
+    grouper = _base_grouper(rules, profile)
+    if cache is not None:
+        return CachingGrouper(grouper, cache)
+    return grouper
\ No newline at end of file
@@ -0,0 +1,173 @@
+from models.database import GUI_PROFILE, get_sessionmaker
+from models.query_timing import record_rows
+from models.adrg_model import ADRG
+from models.mdcdiagpool_model import mdcdiagpool
+from models.maindiagindex_model import MainDiagIndex
+from models.mainsurgeryindex_model import MainSurgeryIndex
+from models.otherdiagindex_model import OtherDiagIndex
+from models.cc_model import CC
+from models.exclude_model import Exclude
+from models.drgsgroup_model import DrgsGroup
+from engine.code_index import CodeIndex
+
+# 分组用到的规则表
+RULE_MODELS = (ADRG, mdcdiagpool, MainDiagIndex, MainSurgeryIndex, OtherDiagIndex, CC, Exclude, DrgsGroup)
+
+# 先期分组（MDCA）、新生儿、HIV、多发严重创伤优先于其他 MDC
+MDC_PRIORITY = ('MDCA', 'MDCP', 'MDCY', 'MDCZ')
+PRE_MDC_LETTER = 'A'
+
+# CC 级别：0 无并发症，1 一般并发症(CC)，2 严重并发症(MCC)
+# DRG 细分组编码末位：1 伴MCC，3 伴CC，5 不伴，9 不区分
+DRG_SUFFIX_BY_LEVEL = {
+    0: ('5', '9', '3', '1'),
+    1: ('3', '5', '9', '1'),
+    2: ('1', '3', '5', '9'),
+}
+
+
+def read_tables(session, models=RULE_MODELS):
+    """
+    按模型整表读取，返回 {表名: [行元组, ...]}。
+    列顺序与模型定义一致，不实例化 ORM 对象。
+    """
+    tables = {}
+    for model in models:
+        result = session.execute(model.__table__.select())
+        tables[model.__tablename__] = rows = [tuple(row) for row in result]
+        record_rows(len(rows))
+    return tables
+
+
+def is_surgical_dept(dept):
+    """ADRG 是否为外科（手术室手术）组"""
+    return bool(dept) and '外' in dept
+
+
+class RuleSet:
+    """
+    分组规则内存索引
+
+    一次性读取 GroupConfig.db 中分组用到的全部规则表，
+    按分组时的查找方式建立字典索引，分组过程中不再访问数据库。
+    """
+
+    def __init__(self):
+        self.adrg_rank = {}           # ADRG -> 优先级（表内顺序，越小越优先）
+        self.adrg_name = {}           # ADRG -> 名称
+        self.adrg_dept = {}           # ADRG -> 内外科
+        self.diag_mdcs = {}           # 诊断编码 -> (MDC, ...)
+        self.mdc_submdc = {}          # MDC -> {诊断编码: 损伤部位}
+        self.main_diag_adrgs = {}     # 主要诊断编码 -> (ADRG, ...)
+        self.oper_adrgs = {}          # 手术编码 -> (ADRG, ...)
+        self.other_diag_adrgs = {}    # 其他诊断编码 -> (ADRG, ...)
+        self.diag_required = set()    # 需要主要诊断入池的 ADRG
+        self.oper_required = set()    # 需要主要手术入池的 ADRG
+        self.other_required = set()   # 需要其他诊断入池的 ADRG
+        self.or_opers = set()         # 属于外科 ADRG 的手术编码
+        self.drgs = {}                # ADRG -> ((grpcode, grpname, paycw), ...)
+        self.drg_by_level = {}        # ADRG -> (不伴, 伴CC, 伴MCC) 对应的 (grpcode, paycw)
+        self.drg_weight = {}          # grpcode -> paycw
+        self.cc = {}                  # 诊断编码 -> (tb, ccl)
+        self.exclude_by_main = {}     # 排除表中的主要诊断编码/类目 -> frozenset(tb)
+        self.codes = CodeIndex()      # 各规则表全部编码的有序数组，用于编码规范化和前缀查询
+
+    @classmethod
+    def from_session(cls, session):
+        """从数据库会话读取全部规则表"""
+        return cls.from_tables(read_tables(session))
+
+    @classmethod
+    def from_tables(cls, tables):
+        """由 read_tables 读出的整表数据建立索引"""
+        rules = cls()
+
+        for code, name, _, dept in tables['Adrg']:
+            code = str(code)
+            rules.adrg_rank.setdefault(code, len(rules.adrg_rank))
+            rules.adrg_name[code] = name
+            rules.adrg_dept[code] = dept
+
+        diag_mdcs = {}
+        for mdccode, diagcode, _, submdc in tables['AdrgMdcDiag']:
+            diag_mdcs.setdefault(diagcode, []).append(mdccode)
+            if submdc:
+                rules.mdc_submdc.setdefault(mdccode, {})[diagcode] = submdc
+        rules.diag_mdcs = {code: cls._sort_mdcs(mdcs) for code, mdcs in diag_mdcs.items()}
+
+        rules.main_diag_adrgs = cls._build_pool(
+            ((code, acode) for acode, code, _, _ in tables['MainDiagIndex']), rules.diag_required)
+        rules.oper_adrgs = cls._build_pool(
+            ((code, acode) for acode, code, _, _ in tables['MainSurgeryIndex']), rules.oper_required)
+        rules.other_diag_adrgs = cls._build_pool(
+            ((code, acode) for acode, code, _, _ in tables['OtherDiagIndex']), rules.other_required)
+
+        # 规则表中出现但 ADRG 表未登记的 ADRG 排在最后
+        for acode in sorted(rules.diag_required | rules.oper_required | rules.other_required):
+            rules.adrg_rank.setdefault(acode, len(rules.adrg_rank))
+
+        surgical = {acode for acode, dept in rules.adrg_dept.items() if is_surgical_dept(dept)}
+        rules.or_opers = {code for code, acodes in rules.oper_adrgs.items()
+                          if any(acode in surgical for acode in acodes)}
+
+        drgs = {}
+        for grpcode, grpname, _, _, _, _, paycw, acode in tables['DrgsGroup']:
+            paycw = float(paycw) if paycw is not None else None
+            drgs.setdefault(acode, []).append((grpcode, grpname, paycw))
+            rules.drg_weight[grpcode] = paycw
+        rules.drgs = {acode: tuple(sorted(items)) for acode, items in drgs.items()}
+        rules.drg_by_level = {acode: cls._drg_levels(items) for acode, items in rules.drgs.items()}
+
+        for diagcode, tb, _, ccl in tables['CC']:
+            rules.cc[diagcode] = (tb, min(int(ccl or 0), 2))
+
+        # 倒排：主要诊断 -> 排除了它的 tb
+        exclude_by_main = {}
+        for tb, maindiag in tables['Exclude']:
+            exclude_by_main.setdefault(maindiag, set()).add(tb)
+        rules.exclude_by_main = {code: frozenset(tbs) for code, tbs in exclude_by_main.items()}
+
+        rules.codes = CodeIndex.from_tables(tables)
+        return rules
+
+    @classmethod
+    def from_database(cls, profile=GUI_PROFILE):
+        """使用指定连接配置（默认界面配置）读取规则"""
+        session = get_sessionmaker(profile)()
+        try:
+            return cls.from_session(session)
+        finally:
+            session.close()
+
+    @staticmethod
+    def _sort_mdcs(mdcs):
+        """按 MDC 优先级排序，去重并保持表内顺序"""
+        unique = list(dict.fromkeys(mdcs))
+        head = [mdc for mdc in MDC_PRIORITY if mdc in unique]
+        return tuple(head + [mdc for mdc in unique if mdc not in MDC_PRIORITY])
+
+    @staticmethod
+    def _build_pool(rows, required):
+        """编码 -> ADRG 元组，同时记录有入池要求的 ADRG"""
+        pool = {}
+        for code, acode in rows:
+            acodes = pool.setdefault(code, [])
+            if acode not in acodes:
+                acodes.append(acode)
+            required.add(acode)
+        return {code: tuple(acodes) for code, acodes in pool.items()}
+
+    @staticmethod
+    def _drg_levels(items):
+        """按 CC 级别预先选定细分组，分组时直接按级别取值"""
+        by_suffix = {}
+        for grpcode, _, paycw in items:
+            by_suffix.setdefault(grpcode[-1:], (grpcode, paycw))
+        levels = []
+        for level in (0, 1, 2):
+            chosen = next((by_suffix[s] for s in DRG_SUFFIX_BY_LEVEL[level] if s in by_suffix), None)
+            if chosen is None:
+                # 编码末位不规范时取第一条
+                chosen = (items[0][0], items[0][2])
+            levels.append(chosen)
+        return tuple(levels)
\ No newline at end of file
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import pickle
+import struct
+import threading
+from models.database import GUI_PROFILE, get_sessionmaker, get_settings
+from models.exceptdiag_model import ExceptDiag
+from models.exceptoper_model import ExceptOper
+from engine.rules import RULE_MODELS, RuleSet, read_tables
+from engine.code_index import TABLE_BITS
+
+# 快照文件格式：MAGIC + 格式版本(uint32) + pickle 数据
+SNAPSHOT_MAGIC = b'CHSDRG-RULES\n'
+SNAPSHOT_VERSION = 4
+SNAPSHOT_SUFFIX = '.snapshot'
+# 快照放在当前用户的缓存目录（可用环境变量 CHSDRG_SNAPSHOT_DIR 指定），不放在数据库文件旁边：
+# 规则库可能部署在多人可写的网络共享目录，加载别人放在那里的 pickle 文件等于执行其中的任意代码
+SNAPSHOT_DIR_ENV = 'CHSDRG_SNAPSHOT_DIR'
+
+SNAPSHOT_MODELS = RULE_MODELS + (ExceptDiag, ExceptOper)
+
+
+class SnapshotError(Exception):
+    """快照文件无法使用（格式、版本不符或已损坏）"""
+
+
+def default_db_path(profile=GUI_PROFILE):
+    """连接配置中的 SQLite 文件路径"""
+    return get_settings(profile).path
+
+
+def snapshot_dir(environ=None):
+    """当前用户的快照目录：Windows 为 %LOCALAPPDATA%\\chs-drg\\snapshots，其他平台为 ~/.cache/chs-drg/snapshots"""
+    environ = os.environ if environ is None else environ
+    path = environ.get(SNAPSHOT_DIR_ENV)
+    if path:
+        return os.path.expanduser(path)
+    if os.name == 'nt':
+        base = environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    else:
+        base = environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(base, 'chs-drg', 'snapshots')
+
+
+def default_snapshot_path(db_path=None):
+    """数据库文件对应的快照文件：文件名带数据库绝对路径的摘要，不同目录下的同名规则库互不覆盖"""
+    db_path = os.path.abspath(db_path or default_db_path())
+    digest = hashlib.blake2b(os.path.normcase(db_path).encode('utf-8'), digest_size=8).hexdigest()
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(snapshot_dir(), f"{name}-{digest}{SNAPSHOT_SUFFIX}")
+
+
+def _check_owner(f, path):
+    """POSIX 上快照文件须属于当前用户且其他人不可写，否则不加载（Windows 上依靠用户目录本身的权限）"""
+    if os.name != 'posix':
+        return
+    stat = os.fstat(f.fileno())
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+        raise SnapshotError(f"快照文件不属于当前用户或其他人可写: {path}")
+
+
+def source_fingerprint(db_path):
+    """数据库文件的大小和修改时间，用于判断快照是否过期"""
+    stat = os.stat(db_path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class RuleSnapshot:
+    """
+    规则快照
+
+    一次读取全部规则表，保存整表数据与界面、分组所需的哈希索引，
+    可序列化为带版本号的二进制文件，启动时直接加载而不访问数据库。
+    """
+
+    def __init__(self):
+        self.messages = []            # 加载时的提示（已过期重新生成、保存失败等），不写入快照文件
+        self.source = None            # 生成快照时数据库的 (大小, 修改时间)
+        self.tables = {}              # 表名 -> [行元组, ...]
+        self.rules = None             # 分组用 RuleSet
+        self.drgs_by_adrg = {}        # ADRG -> DrgsGroup 行
+        self.mdc_pool = {}            # MDC -> AdrgMdcDiag 行
+        self.main_diags_by_adrg = {}  # ADRG -> MainDiagIndex 行
+        self.opers_by_adrg = {}       # ADRG -> MainSurgeryIndex 行
+        self.other_diags_by_adrg = {} # ADRG -> OtherDiagIndex 行
+        self.cc_by_code = {}          # 诊断编码 -> CC 行
+        self.exclude_by_tb = {}       # tb -> Exclude 行
+
+    @classmethod
+    def build(cls, session, source=None):
+        """从数据库会话生成快照"""
+        return cls.from_tables(read_tables(session, SNAPSHOT_MODELS), source)
+
+    @classmethod
+    def from_tables(cls, tables, source=None):
+        """由 read_tables 读出的整表数据生成快照"""
+        snapshot = cls()
+        snapshot.source = source
+        snapshot.tables = tables
+        snapshot.rules = RuleSet.from_tables(tables)
+
+        tables = snapshot.tables
+        snapshot.drgs_by_adrg = cls._group_rows(tables['DrgsGroup'], 7)
+        snapshot.mdc_pool = cls._group_rows(tables['AdrgMdcDiag'], 0)
+        snapshot.main_diags_by_adrg = cls._group_rows(tables['MainDiagIndex'], 0)
+        snapshot.opers_by_adrg = cls._group_rows(tables['MainSurgeryIndex'], 0)
+        snapshot.other_diags_by_adrg = cls._group_rows(tables['OtherDiagIndex'], 0)
+        snapshot.cc_by_code = {row[0]: row for row in tables['CC']}
+        snapshot.exclude_by_tb = cls._group_rows(tables['Exclude'], 0)
+        return snapshot
+
+    @staticmethod
+    def _group_rows(rows, key_index):
+        """按指定列分组，保持表内顺序"""
+        groups = {}
+        for row in rows:
+            groups.setdefault(row[key_index], []).append(row)
+        return groups
+
+    def save(self, path):
+        """写入快照文件（先写临时文件再替换，避免读到半个文件），目录不存在时按只有本人可访问创建"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        state = {key: value for key, value in self.__dict__.items() if key != 'messages'}
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack('<I', SNAPSHOT_VERSION))
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """读取快照文件，不属于当前用户、格式或版本不符时抛出 SnapshotError"""
+        with open(path, 'rb') as f:
+            _check_owner(f, path)
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise SnapshotError(f"不是规则快照文件: {path}")
+            header = f.read(4)
+            if len(header) != 4 or struct.unpack('<I', header)[0] != SNAPSHOT_VERSION:
+                raise SnapshotError(f"快照版本不符: {path}")
+            try:
+                state = pickle.load(f)
+            except Exception as e:
+                raise SnapshotError(f"快照文件已损坏: {path}: {e}")
+        snapshot = cls()
+        snapshot.__dict__.update(state)
+        return snapshot
+
+    # 界面查询接口，返回与对应模型列顺序一致的行元组
+
+    def adrgs(self):
+        return self.tables['Adrg']
+
+    def drgs_of(self, acode):
+        return self.drgs_by_adrg.get(acode, [])
+
+    def mdc_diags(self, mdccode):
+        return self.mdc_pool.get(mdccode, [])
+
+    def main_diags_of(self, acode):
+        return self.main_diags_by_adrg.get(acode, [])
+
+    def opers_of(self, acode):
+        return self.opers_by_adrg.get(acode, [])
+
+    def other_diags_of(self, acode):
+        return self.other_diags_by_adrg.get(acode, [])
+
+    def main_diag_rows(self):
+        return self.tables['MainDiagIndex']
+
+    def main_oper_rows(self):
+        return self.tables['MainSurgeryIndex']
+
+    def except_diag_rows(self):
+        return self.tables['ExceptDiag']
+
+    def except_oper_rows(self):
+        return self.tables['ExceptOper']
+
+    def cc_exact(self, code):
+        row = self.cc_by_code.get(code)
+        return [row] if row is not None else []
+
+    def cc_prefix(self, prefix, limit=None):
+        """以 prefix 开头的 CC 行，按编码排序，与 prefix 完全相同的编码在最前（在 rules.codes 统一编码索引中查找）"""
+        cc_by_code = self.cc_by_code
+        return [cc_by_code[code] for code in self.rules.codes.codes(prefix, TABLE_BITS['CC'], limit)]
+
+    def excludes_of(self, tb):
+        return self.exclude_by_tb.get(tb, [])
+
+
+def load_or_build(db_path=None, path=None, profile=GUI_PROFILE):
+    """
+    优先加载与数据库文件一致的快照，否则按 profile 连接配置的设置读取 db_path 重新生成并尝试保存。
+    快照目录不可写时只在内存中使用。重新生成的原因和保存失败记在返回快照的 messages 中，由调用方决定是否显示。
+    """
+    db_path = db_path or default_db_path(profile)
+    path = path or default_snapshot_path(db_path)
+    source = source_fingerprint(db_path)
+
+    messages = []
+    if os.path.exists(path):
+        try:
+            snapshot = RuleSnapshot.load(path)
+            if snapshot.source == source:
+                return snapshot
+            messages.append(f"规则快照已过期，重新生成: {path}")
+        except (OSError, SnapshotError) as e:
+            messages.append(f"规则快照不可用，重新生成: {e}")
+
+    session = get_sessionmaker(profile, db_path)()
+    try:
+        snapshot = RuleSnapshot.build(session, source)
+    finally:
+        session.close()
+
+    try:
+        snapshot.save(path)
+    except OSError as e:
+        messages.append(f"保存规则快照失败: {e}")
+    snapshot.messages = messages
+    return snapshot
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    """进程内共享的规则快照，首次调用时加载"""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = load_or_build()
+    return _snapshot
+
+
+def reload_snapshot():
+    """按当前数据库重新加载进程内快照（数据库已变化时在后台线程调用），加载期间 get_snapshot() 仍返回旧快照"""
+    global _snapshot
+    snapshot = load_or_build()
+    with _snapshot_lock:
+        _snapshot = snapshot
+    return snapshot
+
+
+def is_snapshot_loaded():
+    """进程内快照是否已加载（已加载时查询不再访问数据库）"""
+    return _snapshot is not None
\ No newline at end of file
@@ -1,18 +1,35 @@
+from controllers import startup_timing
 import sys
 from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QTimer
+startup_timing.mark('导入Qt')
 from controllers.main_controller import MainController
+from models import query_timing
+startup_timing.mark('导入主窗口')
 
 def main():
+    # CHSDRG_SQL_TIMING=1 时记录每条 SQL 的耗时，退出时按 CHSDRG_SQL_TIMING_FILE 导出
+    query_timing.enable_from_env()
+
     app = QApplication(sys.argv)
     
     # 设置应用程序样式
     app.setStyle('Fusion')
+    startup_timing.mark('创建QApplication')
     
     # 创建主控制器
     controller = MainController()
+    startup_timing.mark('创建主窗口')
     controller.show_main_window()
+    startup_timing.mark('显示主窗口')
+
+    # CHSDRG_STARTUP_TIMING=1 时在首次进入事件循环后输出启动各阶段耗时
+    QTimer.singleShot(0, controller.on_started)
     
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    query_timing.dump_from_env()
+    startup_timing.dump_from_env()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,16 +1,94 @@
+import copy
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from models.db_config import GUI_PROFILE, BATCH_PROFILE, load_settings
 
 # 创建基类
 Base = declarative_base()
 
-# 创建数据库引擎，连接SQLite数据库
-engine = create_engine('sqlite:///./data/GroupConfig.db', echo=True)  # echo=True 用于显示SQL语句，生产环境可设为False
+# 每个连接配置（界面 gui / 批量任务 batch）各一个引擎，进程内共享，连接由连接池复用；
+# 同一配置下连接其他数据库文件（如比对新旧两版规则库）时按 (配置名, 文件路径) 各一个
+_settings = {}
+_engines = {}
+_sessionmakers = {}
+
+
+def _apply_pragmas(settings):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in settings.pragmas():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def _key(profile, path):
+    """path 为空或就是配置中的文件时用配置名，否则用 (配置名, 绝对路径)"""
+    if path is None:
+        return profile
+    path = os.path.abspath(path)
+    return profile if path == get_settings(profile).path else (profile, path)
+
+
+def get_settings(profile=GUI_PROFILE, path=None):
+    """连接配置的设置（配置文件与环境变量合并后的结果）；给出 path 时改为连接该文件"""
+    key = _key(profile, path)
+    settings = _settings.get(key)
+    if settings is None:
+        if key == profile:
+            settings = load_settings(profile)
+        else:
+            settings = copy.copy(get_settings(profile))
+            settings.path = key[1]
+        _settings[key] = settings
+    return settings
+
+
+def get_engine(profile=GUI_PROFILE, path=None):
+    """按连接配置创建（或取已创建的）数据库引擎"""
+    key = _key(profile, path)
+    engine = _engines.get(key)
+    if engine is None:
+        settings = get_settings(profile, path)
+        engine = create_engine(settings.url(), echo=settings.echo, pool_size=settings.pool_size)
+        event.listen(engine, 'connect', _apply_pragmas(settings))
+        _engines[key] = engine
+    return engine
+
+
+def create_read_only_engine(path, profile=BATCH_PROFILE):
+    """
+    以只读方式（mode=ro）连接单个数据库文件的新引擎，按 profile 连接配置的其余设置，不进入进程内共享；
+    用于临时读取的文件（如比对下载的规则库），调用方用完后 dispose() 关闭连接
+    """
+    settings = copy.copy(get_settings(profile))
+    settings.path = os.path.abspath(path)
+    settings.mode = 'ro'
+    settings.query_only = True
+    engine = create_engine(settings.url(), echo=settings.echo, pool_size=settings.pool_size)
+    event.listen(engine, 'connect', _apply_pragmas(settings))
+    return engine
+
+
+def get_sessionmaker(profile=GUI_PROFILE, path=None):
+    """按连接配置取会话工厂"""
+    key = _key(profile, path)
+    factory = _sessionmakers.get(key)
+    if factory is None:
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine(profile, path))
+        _sessionmakers[key] = factory
+    return factory
+
+
+# 界面使用的数据库引擎与会话工厂（批量任务使用 get_sessionmaker(BATCH_PROFILE)）
+engine = get_engine(GUI_PROFILE)
 
 # 创建SessionLocal类，用于获取数据库会话
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = get_sessionmaker(GUI_PROFILE)
 
 def get_db():
     """
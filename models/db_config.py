@@ -0,0 +1,144 @@
+import configparser
+import os
+from pathlib import Path
+
+# 程序根目录（相对路径都相对它解析，与启动时的工作目录无关）
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 配置文件：默认为程序目录下的 config.ini，可用环境变量 CHSDRG_CONFIG 指定
+CONFIG_ENV = 'CHSDRG_CONFIG'
+DEFAULT_CONFIG_PATH = os.path.join(APP_DIR, 'config.ini')
+CONFIG_SECTION = 'database'
+
+# 环境变量覆盖：CHSDRG_DB_<键> 作用于所有配置，CHSDRG_DB_<配置名>_<键> 只作用于该配置
+ENV_PREFIX = 'CHSDRG_DB_'
+
+GUI_PROFILE = 'gui'
+BATCH_PROFILE = 'batch'
+
+# 连接方式：rw 读写；ro 只读；immutable 只读且假定文件不会被修改（网络共享目录上免加锁）
+MODES = ('rw', 'ro', 'immutable')
+TEMP_STORES = ('default', 'file', 'memory')
+
+DEFAULTS = {
+    'path': 'data/GroupConfig.db',
+    'mode': 'rw',
+    'echo': 'false',
+    'mmap_size': str(64 * 1024 * 1024),
+    'cache_size': '-16000',      # 负数表示 KB
+    'temp_store': 'memory',
+    'query_only': 'false',
+    'pool_size': '5',
+}
+
+# 各配置相对 DEFAULTS 的差异：批量任务只读规则表，数据量大，给更大的映射和缓存
+PROFILE_DEFAULTS = {
+    GUI_PROFILE: {},
+    BATCH_PROFILE: {
+        'mmap_size': str(256 * 1024 * 1024),
+        'cache_size': '-65536',
+        'query_only': 'true',
+    },
+}
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off', '')
+
+
+def _parse_bool(key, value):
+    value = value.strip().lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError(f"数据库配置 {key} 应为 true/false: {value}")
+
+
+def _parse_int(key, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"数据库配置 {key} 应为整数: {value}")
+
+
+def _parse_choice(key, value, choices):
+    value = value.strip().lower()
+    if value not in choices:
+        raise ValueError(f"数据库配置 {key} 应为 {'/'.join(choices)} 之一: {value}")
+    return value
+
+
+class DatabaseSettings:
+    """一个连接配置（gui / batch）解析后的设置"""
+
+    def __init__(self, profile, values):
+        self.profile = profile
+        path = os.path.expanduser(values['path'])
+        self.path = path if os.path.isabs(path) else os.path.normpath(os.path.join(APP_DIR, path))
+        self.mode = _parse_choice('mode', values['mode'], MODES)
+        self.echo = _parse_bool('echo', values['echo'])
+        self.mmap_size = _parse_int('mmap_size', values['mmap_size'])
+        self.cache_size = _parse_int('cache_size', values['cache_size'])
+        self.temp_store = _parse_choice('temp_store', values['temp_store'], TEMP_STORES)
+        self.query_only = _parse_bool('query_only', values['query_only']) or self.mode != 'rw'
+        self.pool_size = _parse_int('pool_size', values['pool_size'])
+
+    @property
+    def read_only(self):
+        return self.mode != 'rw'
+
+    def url(self):
+        """SQLAlchemy 连接地址；只读方式使用 SQLite URI 文件名"""
+        if self.mode == 'rw':
+            return 'sqlite:///' + self.path
+        params = 'mode=ro'
+        if self.mode == 'immutable':
+            params += '&immutable=1'
+        return f"sqlite:///{Path(self.path).as_uri()}?{params}&uri=true"
+
+    def pragmas(self):
+        """每个新连接执行的 PRAGMA"""
+        pragmas = [
+            ('mmap_size', self.mmap_size),
+            ('cache_size', self.cache_size),
+            ('temp_store', self.temp_store.upper()),
+        ]
+        if self.query_only:
+            pragmas.append(('query_only', 'ON'))
+        return pragmas
+
+    def __repr__(self):
+        return (f"<DatabaseSettings(profile='{self.profile}', path='{self.path}', mode='{self.mode}', "
+                f"echo={self.echo}, mmap_size={self.mmap_size}, cache_size={self.cache_size}, "
+                f"temp_store='{self.temp_store}', query_only={self.query_only})>")
+
+
+def config_path(environ=None):
+    environ = os.environ if environ is None else environ
+    return environ.get(CONFIG_ENV) or DEFAULT_CONFIG_PATH
+
+
+def load_settings(profile=GUI_PROFILE, path=None, environ=None):
+    """
+    读取某个连接配置，优先级从低到高：
+    内置默认值 -> 配置文件 [database] -> 配置文件 [database.<配置名>] -> 环境变量
+    """
+    if profile not in PROFILE_DEFAULTS:
+        raise ValueError(f"未知的数据库连接配置: {profile}")
+    environ = os.environ if environ is None else environ
+    values = dict(DEFAULTS)
+    values.update(PROFILE_DEFAULTS[profile])
+
+    parser = configparser.ConfigParser()
+    parser.read(path or config_path(environ), encoding='utf-8')
+    for section in (CONFIG_SECTION, f'{CONFIG_SECTION}.{profile}'):
+        if parser.has_section(section):
+            for key, value in parser.items(section):
+                if key in DEFAULTS:
+                    values[key] = value
+
+    for key in DEFAULTS:
+        for name in (f'{ENV_PREFIX}{key.upper()}', f'{ENV_PREFIX}{profile.upper()}_{key.upper()}'):
+            if name in environ:
+                values[key] = environ[name]
+    return DatabaseSettings(profile, values)
\ No newline at end of file
@@ -0,0 +1,38 @@
+from sqlalchemy import select, literal_column
+from models.database import SessionLocal
+from models.query_timing import record_rows
+
+# 首批只取一屏多一点，保证打开表格时尽快显示
+FIRST_BATCH_SIZE = 200
+BATCH_SIZE = 2000
+
+
+def iter_batches(columns, first_size=FIRST_BATCH_SIZE, batch_size=BATCH_SIZE):
+    """
+    按 rowid 分页读取整表，逐批返回行元组列表。
+    每批单独开会话查询（WHERE rowid > 上一批末行 LIMIT n），
+    不长时间占用连接，也不随页数增加而变慢。
+    """
+    rowid = literal_column('rowid')
+    last_rowid = None
+    size = first_size
+    while True:
+        stmt = select(rowid, *columns)
+        if last_rowid is not None:
+            stmt = stmt.where(rowid > last_rowid)
+        stmt = stmt.order_by(rowid).limit(size)
+
+        session = SessionLocal()
+        try:
+            rows = session.execute(stmt).all()
+        finally:
+            session.close()
+        record_rows(len(rows))
+
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+        yield [tuple(row[1:]) for row in rows]
+        if len(rows) < size:
+            return
+        size = batch_size
\ No newline at end of file
@@ -0,0 +1,209 @@
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+# 环境变量：CHSDRG_SQL_TIMING=1 开启计时，CHSDRG_SQL_TIMING_FILE 为退出时导出的 .json/.csv 文件
+TIMING_ENV = 'CHSDRG_SQL_TIMING'
+TIMING_FILE_ENV = 'CHSDRG_SQL_TIMING_FILE'
+
+# 耗时直方图的桶上界(毫秒)，最后一个桶收集更慢的语句
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# 查找调用方时跳过的通用模块（分批读取、后台线程等），归到真正发起查询的界面方法上
+_SKIP_MODULES = ('views.column_table_model', 'views.query_worker')
+UNKNOWN_CALLER = '<其他>'
+
+
+class LatencyStats:
+    """一个调用方的语句耗时统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, elapsed_ms, rows):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        if rows > 0:
+            self.rows += rows
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+
+    def percentile(self, p):
+        """按直方图估算分位数（返回所在桶的上界，最慢的桶返回最大值）"""
+        if not self.count:
+            return 0.0
+        target = self.count * p
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'rows': self.rows,
+            'buckets': dict(zip([f'<={b}' for b in BUCKET_BOUNDS_MS] + ['>' + str(BUCKET_BOUNDS_MS[-1])],
+                                self.buckets)),
+        }
+
+
+_enabled = False
+_stats = {}                  # 调用方 -> LatencyStats
+_lock = threading.Lock()
+_local = threading.local()   # 当前线程正在执行的语句：(开始时间, 调用方)，以及最近一条的统计
+
+
+def find_caller():
+    """调用栈上最近的界面方法（如 w_adrg.load_related_data），没有时取最近的项目代码"""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith(('views.', 'engine.', 'models.', 'controllers.')) and module != __name__:
+            code = frame.f_code
+            name = getattr(code, 'co_qualname', None)
+            if name is None:
+                owner = frame.f_locals.get('self')
+                name = f"{type(owner).__name__}.{code.co_name}" if owner is not None else code.co_name
+            if module.startswith('views.') and module not in _SKIP_MODULES:
+                return name
+            if fallback is None:
+                fallback = name
+        frame = frame.f_back
+    return fallback or UNKNOWN_CALLER
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _local.started = (time.perf_counter(), find_caller())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(_local, 'started', None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started[0]) * 1000
+    _local.started = None
+    rows = cursor.rowcount if cursor.rowcount is not None else -1
+    with _lock:
+        stats = _stats.get(started[1])
+        if stats is None:
+            stats = _stats[started[1]] = LatencyStats()
+        stats.add(elapsed_ms, rows)
+    _local.last = stats
+
+
+def record_rows(count):
+    """
+    把读取到的行数记到本线程最近一条语句的调用方上。
+    SQLite 的 SELECT 执行时不知道结果行数，由读取结果的代码在取完后补记；未开启计时时直接返回。
+    """
+    if not _enabled:
+        return
+    stats = getattr(_local, 'last', None)
+    if stats is not None:
+        with _lock:
+            stats.rows += count
+
+
+def enable():
+    """开启计时：在所有数据库引擎上挂接语句执行事件"""
+    global _enabled
+    if not _enabled:
+        # 在这里才导入 SQLAlchemy，未开启计时时不拖慢程序启动
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _enabled = True
+
+
+def disable():
+    """关闭计时并移除事件，之后执行语句没有任何额外开销"""
+    global _enabled
+    if _enabled:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.remove(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.remove(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable_from_env(environ=None):
+    """按环境变量 CHSDRG_SQL_TIMING 决定是否开启，返回是否已开启"""
+    environ = os.environ if environ is None else environ
+    if environ.get(TIMING_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on'):
+        enable()
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def snapshot():
+    """各调用方统计的字典，按总耗时从大到小排列"""
+    with _lock:
+        items = sorted(_stats.items(), key=lambda item: item[1].total_ms, reverse=True)
+        return {caller: stats.to_dict() for caller, stats in items}
+
+
+def summary(limit=1):
+    """状态栏显示用的一行摘要"""
+    data = snapshot()
+    if not data:
+        return "SQL计时: 暂无语句"
+    count = sum(s['count'] for s in data.values())
+    total = sum(s['total_ms'] for s in data.values())
+    parts = [f"SQL {count} 条 共 {total:.0f} ms"]
+    for caller, s in list(data.items())[:limit]:
+        parts.append(f"最耗时 {caller}: {s['count']} 条 p95≤{s['p95_ms']} ms 最大 {s['max_ms']:.1f} ms")
+    return " | ".join(parts)
+
+
+def dump(path):
+    """导出统计，扩展名为 .csv 时写 CSV（每个调用方一行），否则写 JSON"""
+    data = snapshot()
+    if path.lower().endswith('.csv'):
+        bucket_names = [f'<={b}' for b in BUCKET_BOUNDS_MS] + ['>' + str(BUCKET_BOUNDS_MS[-1])]
+        fields = ['caller', 'count', 'total_ms', 'avg_ms', 'max_ms', 'p50_ms', 'p95_ms', 'rows']
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields + bucket_names)
+            for caller, s in data.items():
+                writer.writerow([caller] + [s[k] for k in fields[1:]] + [s['buckets'][b] for b in bucket_names])
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'bucket_bounds_ms': BUCKET_BOUNDS_MS, 'callers': data}, f, ensure_ascii=False, indent=2)
+
+
+def dump_from_env(environ=None):
+    """开启了计时且设置了 CHSDRG_SQL_TIMING_FILE 时导出统计"""
+    environ = os.environ if environ is None else environ
+    path = environ.get(TIMING_FILE_ENV)
+    if _enabled and path:
+        try:
+            dump(path)
+            print(f"SQL计时统计已导出: {path}")
+        except OSError as e:
+            print(f"导出SQL计时统计失败: {e}")
\ No newline at end of file
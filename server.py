@@ -0,0 +1,392 @@
+"""
+无界面的分组与编码查询服务（HTTP/JSON），供 HIS、结算系统调用
+
+规则来自 models 中各规则表生成的规则快照（batch 连接配置，只读），启动时加载一次常驻内存。
+单条和小批量分组直接在事件循环中完成（单条只需几十微秒），大批量交给多进程分组。
+
+用法: python server.py [--host 127.0.0.1] [--port 8765] [--workers N] [--db 规则库路径]
+
+接口（请求和响应均为 UTF-8 JSON）:
+    POST /group                       单条分组 {"main_diag": "...", "other_diags": [...], "procedures": [...]}
+    POST /group/batch                 批量分组 {"cases": [病例, ...]}，病例也可写成 [主要诊断, [其他诊断], [手术]]
+    GET  /cc/<诊断编码>[?main_diag=]   并发症级别，给出主要诊断时同时返回排除后的有效级别
+    GET  /cc?prefix=<前缀>[&limit=]    按编码前缀查询并发症
+    GET  /adrg/<ADRG>                 ADRG 及其 DRG 细分组
+    GET  /adrg/<ADRG>/<池>            主诊表 main_diags、主手术表 opers、次诊表 other_diags
+    GET  /except/diag/<编码>          是否为不应编码的诊断（/except/oper/<编码> 为手术）
+    GET  /codes/<编码>                 规范化后的编码、所在规则表、规则表中最近的上级编码和下级编码数
+查询接口中的编码先规范写法（小写、缺小数点、全角等，见 engine.code_index），分组接口按原样分组。
+    GET  /health                      服务状态
+    GET  /stats                       各接口的耗时统计
+"""
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import time
+from decimal import Decimal
+from urllib.parse import parse_qs, unquote, urlsplit
+from models.database import BATCH_PROFILE
+from models.query_timing import LatencyStats
+from engine.snapshot import default_db_path, default_snapshot_path, load_or_build
+from engine.grouper import Grouper
+from engine.code_index import normalize_code, table_names
+from engine.parallel import ParallelGrouper, available_cpus
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_BATCH_CASES = 200000
+# 不超过该条数的批量在事件循环中直接分组，更多的交给进程池
+INLINE_MAX_CASES = 256
+# 没有进程池时大批量分块分组，块与块之间让出事件循环，其他请求不必等整批完成
+INLINE_CHUNK_SIZE = 256
+DEFAULT_PREFIX_LIMIT = 50
+# 没有匹配到接口的请求（404、405）在耗时统计中合为一项，统计表不随任意请求路径增长
+UNKNOWN_ROUTE = 'unknown'
+ADRG_POOLS = ('main_diags', 'opers', 'other_diags')
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+
+class HttpError(Exception):
+    """返回给客户端的错误（状态码 + 信息）"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"无法转换为 JSON: {type(value).__name__}")
+
+
+def _codes(value, field):
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple)) or not all(isinstance(code, str) for code in value):
+        raise HttpError(400, f"{field} 应为编码列表")
+    return tuple(code.strip() for code in value if code.strip())
+
+
+def parse_case(item):
+    """请求中的病例 -> (主要诊断, 其他诊断元组, 手术元组)"""
+    if isinstance(item, dict):
+        main_diag, other_diags, procedures = item.get('main_diag'), item.get('other_diags'), item.get('procedures')
+    elif isinstance(item, (list, tuple)) and 1 <= len(item) <= 3:
+        main_diag, other_diags, procedures = (list(item) + [None, None])[:3]
+    else:
+        raise HttpError(400, "病例应为对象或 [主要诊断, 其他诊断, 手术] 数组")
+    if not isinstance(main_diag, str) or not main_diag.strip():
+        raise HttpError(400, "缺少主要诊断 main_diag")
+    return main_diag.strip(), _codes(other_diags, 'other_diags'), _codes(procedures, 'procedures')
+
+
+def result_dict(result):
+    return {
+        'mdc': result.mdc,
+        'adrg': result.adrg,
+        'drg': result.drg,
+        'ccl': result.ccl,
+        'weight': float(result.weight) if result.weight is not None else None,
+        'status': result.status,
+    }
+
+
+def _cc_dict(row):
+    diagcode, tb, cctype, ccl = row[:4]
+    return {'code': diagcode, 'tb': tb, 'cctype': cctype, 'ccl': ccl}
+
+
+class RuleService:
+    """按规则快照分组和查询，各接口返回 (状态码, 响应对象)"""
+
+    def __init__(self, snapshot, pool=None):
+        self.snapshot = snapshot
+        self.grouper = Grouper(snapshot.rules)
+        self.pool = pool
+        self.adrg_by_code = {row[0]: row for row in snapshot.adrgs()}
+        self.except_codes = {
+            'diag': {row[0]: row for row in snapshot.except_diag_rows()},
+            'oper': {row[0]: row for row in snapshot.except_oper_rows()},
+        }
+        self.started = time.time()
+
+    def group(self, body):
+        main_diag, other_diags, procedures = parse_case(body)
+        return result_dict(self.grouper.group(main_diag, other_diags, procedures))
+
+    async def group_batch(self, body):
+        cases = body.get('cases') if isinstance(body, dict) else body
+        if not isinstance(cases, list):
+            raise HttpError(400, "缺少病例列表 cases")
+        if len(cases) > MAX_BATCH_CASES:
+            raise HttpError(413, f"单次最多 {MAX_BATCH_CASES} 条病例")
+        cases = [parse_case(item) for item in cases]
+        if len(cases) <= INLINE_MAX_CASES:
+            results = self.grouper.group_many(cases)
+        elif self.pool is not None:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(None, self.pool.group_many, cases)
+        else:
+            results = []
+            for start in range(0, len(cases), INLINE_CHUNK_SIZE):
+                results.extend(self.grouper.group_many(cases[start:start + INLINE_CHUNK_SIZE]))
+                await asyncio.sleep(0)
+        return {'results': [result_dict(result) for result in results]}
+
+    def cc(self, code, main_diag=None):
+        code, main_diag = normalize_code(code), normalize_code(main_diag)
+        row = self.snapshot.cc_by_code.get(code)
+        data = _cc_dict(row) if row is not None else {'code': code, 'tb': None, 'cctype': None, 'ccl': 0}
+        if main_diag:
+            data['main_diag'] = main_diag
+            data['effective_ccl'] = self.grouper.cc.level(code, main_diag)
+        return data
+
+    def cc_prefix(self, prefix, limit):
+        prefix = normalize_code(prefix)
+        if not prefix:
+            raise HttpError(400, "缺少编码前缀 prefix")
+        return {'items': [_cc_dict(row) for row in self.snapshot.cc_prefix(prefix, limit)]}
+
+    def adrg(self, acode):
+        row = self.adrg_by_code.get(acode)
+        if row is None:
+            raise HttpError(404, f"没有 ADRG {acode}")
+        drgs = [{'drg': grpcode, 'name': grpname, 'iszz': iszz, 'iscz': iscz, 'isop': isop, 'rule': rule, 'weight': paycw}
+                for grpcode, grpname, iszz, iscz, isop, rule, paycw, _ in self.snapshot.drgs_of(acode)]
+        return {'adrg': row[0], 'name': row[1], 'scd_letter': row[2], 'dept': row[3], 'drgs': drgs}
+
+    def adrg_pool(self, acode, pool):
+        if acode not in self.adrg_by_code:
+            raise HttpError(404, f"没有 ADRG {acode}")
+        rows = {
+            'main_diags': self.snapshot.main_diags_of,
+            'opers': self.snapshot.opers_of,
+            'other_diags': self.snapshot.other_diags_of,
+        }[pool](acode)
+        return {'adrg': acode, 'items': [{'code': code, 'name': name, 'grpno': grpno} for _, code, name, grpno in rows]}
+
+    def except_code(self, kind, code):
+        code = normalize_code(code)
+        row = self.except_codes[kind].get(code)
+        return {'code': code, 'excepted': row is not None, 'name': row[1] if row is not None else None}
+
+    def code(self, code):
+        codes = self.snapshot.rules.codes
+        normalized = normalize_code(code)
+        if not normalized:
+            raise HttpError(400, "缺少编码")
+        match = codes.lookup(normalized)
+        return {
+            'input': code,
+            'code': normalized,
+            'tables': table_names(match.mask),
+            'ancestor': match.ancestor,
+            'ancestor_tables': table_names(codes.tables(match.ancestor)) if match.ancestor else [],
+            'descendants': match.hi - match.lo - (1 if match.mask else 0),
+        }
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'uptime_s': round(time.time() - self.started, 1),
+            'workers': self.pool.workers if self.pool is not None else 0,
+        }
+
+
+class GroupingServer:
+    """asyncio 上的最小 HTTP/1.1 服务（支持长连接），请求体与响应均为 JSON"""
+
+    def __init__(self, service):
+        self.service = service
+        self.stats = {}   # 接口名（或 UNKNOWN_ROUTE） -> LatencyStats
+
+    async def dispatch(self, method, target, body):
+        """返回 (接口名, 状态码, 响应对象)，没有匹配到接口时接口名为 UNKNOWN_ROUTE"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        route = UNKNOWN_ROUTE
+        try:
+            if method == 'POST' and parts in (['group'], ['group', 'batch']):
+                if len(parts) == 1:
+                    route = 'POST /group'
+                    return route, 200, self.service.group(self._json_body(body))
+                route = 'POST /group/batch'
+                return route, 200, await self.service.group_batch(self._json_body(body))
+            if method != 'GET':
+                raise HttpError(405 if parts[:1] in (['group'], ['cc'], ['adrg'], ['except'], ['codes']) else 404,
+                                f"不支持 {method} {url.path}")
+            if parts == ['health']:
+                route = 'GET /health'
+                return route, 200, self.service.health()
+            if parts == ['stats']:
+                route = 'GET /stats'
+                return route, 200, {name: stats.to_dict() for name, stats in sorted(self.stats.items())}
+            if parts == ['cc']:
+                route = 'GET /cc?prefix'
+                limit = self._int(query.get('limit'), DEFAULT_PREFIX_LIMIT)
+                return route, 200, self.service.cc_prefix(query.get('prefix', '').strip(), limit)
+            if len(parts) == 2 and parts[0] == 'cc':
+                route = 'GET /cc/{code}'
+                return route, 200, self.service.cc(parts[1].strip(), query.get('main_diag', '').strip())
+            if len(parts) == 2 and parts[0] == 'adrg':
+                route = 'GET /adrg/{adrg}'
+                return route, 200, self.service.adrg(parts[1].strip())
+            if len(parts) == 3 and parts[0] == 'adrg' and parts[2] in ADRG_POOLS:
+                route = 'GET /adrg/{adrg}/' + parts[2]
+                return route, 200, self.service.adrg_pool(parts[1].strip(), parts[2])
+            if len(parts) == 2 and parts[0] == 'codes':
+                route = 'GET /codes/{code}'
+                return route, 200, self.service.code(parts[1])
+            if len(parts) == 3 and parts[0] == 'except' and parts[1] in ('diag', 'oper'):
+                route = f"GET /except/{parts[1]}/{{code}}"
+                return route, 200, self.service.except_code(parts[1], parts[2].strip())
+            raise HttpError(404, f"没有接口 {method} {url.path}")
+        except HttpError as e:
+            return route, e.status, {'error': e.message}
+        except Exception as e:
+            print(f"处理 {method} {target} 时出错: {e}")
+            return route, 500, {'error': str(e)}
+
+    @staticmethod
+    def _json_body(body):
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise HttpError(400, f"请求体不是有效的 JSON: {e}")
+
+    @staticmethod
+    def _int(value, default):
+        if value is None or value == '':
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise HttpError(400, f"应为整数: {value}")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 400, {'error': "请求头过长"}, False)
+                    return
+                start = time.perf_counter()
+                try:
+                    request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+                    method, target, version = request_line.split(' ', 2)
+                    headers = {}
+                    for line in header_lines:
+                        name, _, value = line.partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    await self._send(writer, 400, {'error': "无效的 HTTP 请求"}, False)
+                    return
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                if 'chunked' in headers.get('transfer-encoding', '').lower():
+                    await self._send(writer, 411, {'error': "请求体须带 Content-Length"}, False)
+                    return
+                if length < 0:
+                    await self._send(writer, 400, {'error': f"无效的 Content-Length: {length}"}, False)
+                    return
+                if length > MAX_BODY_BYTES:
+                    await self._send(writer, 413, {'error': f"请求体不能超过 {MAX_BODY_BYTES} 字节"}, False)
+                    return
+                try:
+                    body = await reader.readexactly(length) if length else b''
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                route, status, payload = await self.dispatch(method.upper(), target, body)
+                await self._send(writer, status, payload, keep_alive)
+                stats = self.stats.get(route)
+                if stats is None:
+                    stats = self.stats[route] = LatencyStats()
+                stats.add((time.perf_counter() - start) * 1000, 0)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _send(writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        addresses = ', '.join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        print(f"分组服务已启动: http://{addresses}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="chs-drg 分组与编码查询服务")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="监听地址（默认只接受本机连接）")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=available_cpus(),
+                        help="大批量分组的进程数，1 为只在服务进程内分组")
+    parser.add_argument('--db', help="规则库路径，默认按 batch 连接配置")
+    args = parser.parse_args(argv)
+
+    db_path = args.db or default_db_path(BATCH_PROFILE)
+    snapshot_path = default_snapshot_path(db_path)
+    snapshot = load_or_build(db_path, snapshot_path, BATCH_PROFILE)
+    for message in snapshot.messages:
+        print(message)
+    # 规则常驻且只读，移出垃圾回收的扫描范围，避免回收时的长停顿
+    gc.freeze()
+
+    pool = None
+    if args.workers > 1:
+        # 在启动事件循环（和线程）之前创建进程池
+        pool = ParallelGrouper(args.workers, snapshot_path=snapshot_path, db_path=db_path, rules=snapshot.rules)
+        if pool.parallel:
+            pool.start()
+        else:
+            # 只有一个可用 CPU：大批量也在服务进程内分块分组
+            pool = None
+    try:
+        asyncio.run(GroupingServer(RuleService(snapshot, pool)).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("分组服务已停止")
+    finally:
+        if pool is not None:
+            pool.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
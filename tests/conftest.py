@@ -0,0 +1,112 @@
+"""
+测试共用的小规则库
+
+不依赖 data/GroupConfig.db：各规则表按 read_tables 的列顺序手工写出，覆盖分组的各条路径。
+    MDCA 先期分组     AH1（手术 31.2100，不限 MDC）
+    MDCE 呼吸系统     ES1 外科（手术 32.2900，主要诊断须在 ES1 主诊表）、ES2 肺炎、EX1 慢阻肺（也收肺炎，优先级在 ES2 之后）、
+                     ET1 呼吸衰竭（须有其他诊断 J18.900，没有 DRG 细分组）、J98.000 不在任何 ADRG
+    MDCF 循环系统     FM1 外科（手术 36.0600）、FR1 高血压
+    MDCZ 多发创伤     ZZ1（S72.000 伴其他部位创伤），单一部位时落入 MDCI 的 IZ1
+CC：E11.900 为 CC，N18.500、J96.000 为 MCC；排除表 T3 排除主要诊断 J44.000，T2 排除类目 J18。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.rules import RuleSet  # noqa: E402
+from engine.snapshot import RuleSnapshot  # noqa: E402
+
+
+def make_tables():
+    """新建一份规则表数据（各测试可以随意修改）"""
+    return {
+        'Adrg': [
+            ('AH1', '气管切开', 'A', '外科'),
+            ('ES1', '呼吸系统手术', 'E', '外科'),
+            ('ES2', '肺炎', 'E', '内科'),
+            ('EX1', '慢性阻塞性肺病', 'E', '内科'),
+            ('ET1', '呼吸衰竭', 'E', '内科'),
+            ('FM1', '冠脉搭桥', 'F', '外科'),
+            ('FR1', '高血压', 'F', '内科'),
+            ('ZZ1', '多发严重创伤', 'Z', '内科'),
+            ('IZ1', '髋部骨折', 'I', '内科'),
+        ],
+        'AdrgMdcDiag': [
+            ('MDCE', 'J18.900', '肺炎', None),
+            ('MDCE', 'J44.000', '慢性阻塞性肺病伴急性下呼吸道感染', None),
+            ('MDCE', 'J96.000', '急性呼吸衰竭', None),
+            ('MDCE', 'J98.000', '支气管疾病', None),
+            ('MDCF', 'I10.x00', '高血压', None),
+            ('MDCI', 'S72.000', '股骨颈骨折', None),
+            ('MDCZ', 'S72.000', '股骨颈骨折', '下肢'),
+            ('MDCZ', 'S06.000', '脑震荡', '头'),
+        ],
+        'MainDiagIndex': [
+            ('ES1', 'J18.900', '肺炎', 1),
+            ('ES1', 'J44.000', '慢性阻塞性肺病伴急性下呼吸道感染', 1),
+            ('ES2', 'J18.900', '肺炎', 1),
+            ('EX1', 'J44.000', '慢性阻塞性肺病伴急性下呼吸道感染', 1),
+            ('EX1', 'J18.900', '肺炎', 1),
+            ('ET1', 'J96.000', '急性呼吸衰竭', 1),
+            ('FR1', 'I10.x00', '高血压', 1),
+            ('ZZ1', 'S72.000', '股骨颈骨折', 1),
+            ('IZ1', 'S72.000', '股骨颈骨折', 1),
+        ],
+        'MainSurgeryIndex': [
+            ('AH1', '31.2100', '气管切开术', 1),
+            ('ES1', '32.2900', '肺病损切除术', 1),
+            ('FM1', '36.0600', '冠状动脉支架置入', 1),
+        ],
+        'OtherDiagIndex': [
+            ('ET1', 'J18.900', '肺炎', 1),
+        ],
+        'CC': [
+            ('E11.900', 'T1', 'CC', 1),
+            ('N18.500', 'T2', 'MCC', 2),
+            ('J96.000', 'T3', 'MCC', 2),
+        ],
+        'Exclude': [
+            ('T3', 'J44.000'),
+            ('T2', 'J18'),
+        ],
+        'DrgsGroup': [
+            ('AH19', '气管切开', 0, 0, '1', None, 6.5, 'AH1'),
+            ('ES11', '呼吸系统手术，伴严重并发症', 0, 0, '1', None, 3.2, 'ES1'),
+            ('ES13', '呼吸系统手术，伴并发症', 0, 0, '1', None, 2.6, 'ES1'),
+            ('ES15', '呼吸系统手术，不伴并发症', 0, 0, '1', None, 2.1, 'ES1'),
+            ('ES21', '肺炎，伴严重并发症', 0, 0, '0', None, 1.4, 'ES2'),
+            ('ES23', '肺炎，伴并发症', 0, 0, '0', None, 1.0, 'ES2'),
+            ('ES25', '肺炎，不伴并发症', 0, 0, '0', None, 0.8, 'ES2'),
+            ('EX19', '慢性阻塞性肺病', 0, 0, '0', None, 0.9, 'EX1'),
+            ('FM19', '冠脉搭桥', 0, 0, '1', None, 4.8, 'FM1'),
+            ('FR11', '高血压，伴严重并发症', 0, 0, '0', None, 0.9, 'FR1'),
+            ('FR13', '高血压，伴并发症', 0, 0, '0', None, 0.7, 'FR1'),
+            ('FR15', '高血压，不伴并发症', 0, 0, '0', None, 0.5, 'FR1'),
+            ('ZZ19', '多发严重创伤', 0, 0, '0', None, 5.0, 'ZZ1'),
+            ('IZ19', '髋部骨折', 0, 0, '0', None, 1.6, 'IZ1'),
+        ],
+        'ExceptDiag': [
+            ('R69.x00', '疾病'),
+        ],
+        'ExceptOper': [
+            ('00.0100', '治疗性超声'),
+        ],
+    }
+
+
+@pytest.fixture
+def tables():
+    return make_tables()
+
+
+@pytest.fixture
+def rules(tables):
+    return RuleSet.from_tables(tables)
+
+
+@pytest.fixture
+def snapshot(tables):
+    return RuleSnapshot.from_tables(tables)
\ No newline at end of file
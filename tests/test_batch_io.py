@@ -0,0 +1,99 @@
+"""CSV 批量分组：读取病例、分组、写出结果列，再作为分组结果文件读回"""
+import csv
+
+import pytest
+
+from engine.batch_io import (RESULT_FIELDS, CsvCaseReader, CsvResultWriter, group_stream, resolve_columns,
+                             result_values, split_codes, stored_result_start)
+from engine.grouper import Grouper
+
+HEADER = ['病案号', '科室', '主要诊断', '其他诊断1', '其他诊断2', '手术操作']
+ROWS = [
+    ['0001', '呼吸科', 'J18.900', 'E11.900', '', ''],
+    ['0002', '呼吸科，二病区', ' J44.000 ', 'J96.000|N18.500', '', ''],
+    ['0003', '胸外科', 'J18.900', '', '', '32.2900；99.9999'],
+    ['0004', '心内科', 'I10.x00', 'N18.500', 'E11.900', ''],
+    ['0005', '急诊', 'Z99.999', '', '', ''],
+    ['0006', '"引号"科', '', '', '', ''],
+]
+
+
+def write_csv(path, header, rows, encoding='utf-8-sig'):
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def read_csv(path, encoding='utf-8-sig'):
+    with open(path, encoding=encoding, newline='') as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture
+def input_path(tmp_path):
+    path = tmp_path / 'cases.csv'
+    write_csv(path, HEADER, ROWS)
+    return str(path)
+
+
+def test_resolve_columns():
+    assert resolve_columns(HEADER) == (2, [3, 4], [5])
+    assert resolve_columns(['MAIN_DIAG', 'other_diag_1', 'Procedure']) == (0, [1], [2])
+    assert resolve_columns(['dx', 'a', 'b'], main_col='DX', other_cols=['b']) == (0, [2], [])
+    with pytest.raises(ValueError):
+        resolve_columns(['病案号', '科室'])
+    with pytest.raises(ValueError):
+        resolve_columns(HEADER, other_cols=['其他诊断9'])
+
+
+def test_split_codes():
+    assert split_codes(['a|b; c', 'd，e', ''], [0, 1, 2, 5]) == ('a', 'b', 'c', 'd', 'e')
+
+
+def test_reader(input_path):
+    with CsvCaseReader(input_path) as reader:
+        cases = [case for _, case in reader]
+        assert reader.position() == reader.size
+    assert cases[1] == ('J44.000', ('J96.000', 'N18.500'), ())
+    assert cases[2] == ('J18.900', (), ('32.2900', '99.9999'))
+    assert cases[5] == ('', (), ())
+
+
+@pytest.mark.parametrize('encoding', ['utf-8-sig', 'gb18030'])
+def test_round_trip(tmp_path, rules, encoding):
+    input_path, output_path = tmp_path / 'in.csv', tmp_path / 'out.csv'
+    write_csv(input_path, HEADER, ROWS, encoding)
+    with CsvCaseReader(str(input_path), encoding) as reader, \
+            CsvResultWriter(str(output_path), reader.header, encoding) as writer:
+        for row, result in group_stream(reader, rules):
+            writer.write(row, result)
+
+    output = read_csv(output_path, encoding)
+    assert output[0] == HEADER + list(RESULT_FIELDS)
+    start = stored_result_start(output[0])
+    assert start == len(HEADER)
+    grouper = Grouper(rules)
+    with CsvCaseReader(str(input_path), encoding) as reader:
+        expected = [[str(value) for value in result_values(grouper.group_case(case))] for _, case in reader]
+    # 原有各列原样保留，结果列与直接分组一致
+    assert [row[:start] for row in output[1:]] == ROWS
+    assert [row[start:] for row in output[1:]] == expected
+    assert output[2][start:] == ['MDCE', 'EX1', 'EX19', '2', '0.9', 'ok']    # J96.000 被排除，N18.500 仍为 MCC
+    assert output[5][start:] == ['', '', '0000', '0', '', 'no_mdc']
+
+    # 输出文件可以再作为病例文件读取（结果列不影响病例列的识别）
+    with CsvCaseReader(str(output_path), encoding) as reader, CsvCaseReader(str(input_path), encoding) as original:
+        assert [case for _, case in reader] == [case for _, case in original]
+
+
+def test_stored_result_start_requires_result_columns():
+    with pytest.raises(ValueError):
+        stored_result_start(HEADER)
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.csv'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        CsvCaseReader(str(path))
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""病组结构汇总：按科室、内外科、月份等维度的病例数、入组病例数、总权重、CMI 与预估费用"""
+import csv
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from engine.casemix import (CaseColumns, PointValueTable, month_of, read_case_columns,  # noqa: E402
+                            summarize)
+
+INDEXES = {'drg': 0, 'dept': 1, 'date': 2, 'region': 3}
+HEADER = ['DRG', '科室', '出院日期', '统筹区']
+ROWS = [
+    ['ES25', '呼吸科', '2024-01-05', '广州'],
+    ['ES23', '呼吸科 ', '2024-01-20', '广州'],
+    ['0000', '呼吸科', '2024-02-01', '深圳'],
+    ['ES15', '胸外科', '2024-02-10', '深圳'],
+    ['FR11', '心内科', '2024-02-28 10:00', '广州'],
+    ['EX19', '心内科', '', ''],
+]
+
+
+@pytest.fixture
+def columns():
+    columns = CaseColumns()
+    # 分两块读入，编号跨块一致
+    columns.append_rows(ROWS[:3], INDEXES)
+    columns.append_rows(ROWS[3:], INDEXES)
+    columns.present = set(INDEXES)
+    return columns
+
+
+def as_dict(report):
+    return {row[:len(report.dimensions)]: row[len(report.dimensions):] for row in report.rows()}
+
+
+def test_month_of():
+    assert month_of('2024-02-28 10:00') == month_of('2024/2/1') == '2024-02'
+    assert month_of('') == month_of(None) == month_of('not a date') == ''
+
+
+def test_by_dept(columns, rules):
+    report = summarize(columns, rules, by=['dept'])
+    assert report.headers == ['科室', '病例数', '入组病例数', '总权重', 'CMI']
+    # 首尾空白不同的科室合为一行，未入组的 0000 计入病例数、不计入入组病例
+    assert as_dict(report) == {
+        ('呼吸科',): (3, 2, 1.8, 0.9),
+        ('胸外科',): (1, 1, 2.1, 2.1),
+        ('心内科',): (2, 2, 1.8, 0.9),
+    }
+    assert report.payments is None
+    cases, grouped, weights, cmi, payments = report.totals()
+    assert (cases, grouped, payments) == (6, 5, None)
+    assert weights == pytest.approx(5.7)
+    assert cmi == pytest.approx(5.7 / 5)
+
+
+def test_by_adrg_dept_and_month(columns, rules):
+    report = summarize(columns, rules, by=['adrg_dept', 'month'])
+    assert as_dict(report) == {
+        ('', '2024-02'): (1, 0, 0.0, ''),
+        ('内科', ''): (1, 1, 0.9, 0.9),
+        ('内科', '2024-01'): (2, 2, 1.8, 0.9),
+        ('内科', '2024-02'): (1, 1, 0.9, 0.9),
+        ('外科', '2024-02'): (1, 1, 2.1, 2.1),
+    }
+
+
+def test_by_drg_and_adrg(columns, rules):
+    report = summarize(columns, rules, by=['adrg', 'drg'])
+    assert [labels for labels in zip(*report.labels)] == [
+        ('', '0000'), ('ES1', 'ES15'), ('ES2', 'ES23'), ('ES2', 'ES25'), ('EX1', 'EX19'), ('FR1', 'FR11')]
+
+
+def test_totals_only(columns, rules):
+    report = summarize(columns, rules, by=[])
+    assert len(report) == 1
+    assert list(report.rows()) == [(6, 5, 5.7, 1.14)]
+
+
+def test_payments(columns, rules):
+    points = PointValueTable({'': {'': 50.0, '2024-02': 60.0}, '广州': {'': 55.0}})
+    assert points('广州', '2024-02') == 55.0
+    assert points('深圳', '2024-02') == 60.0
+    assert points('深圳', '2024-01') == 50.0
+    report = summarize(columns, rules, by=['region'], point_values=points)
+    assert report.headers[-1] == '预估费用'
+    assert {row[0]: row[-1] for row in report.rows()} == {
+        '': 0.9 * 50.0,
+        '广州': (0.8 + 1.0 + 0.9) * 55.0,
+        '深圳': 2.1 * 60.0,
+    }
+    assert PointValueTable().values == {}
+    report = summarize(columns, rules, by=['dept'], point_values=PointValueTable())
+    assert report.totals()[4] == 0.0
+
+
+def test_point_value_config(tmp_path):
+    path = tmp_path / 'points.ini'
+    path.write_text("[DEFAULT]\npoint = 50 ; 默认\n2024-07 = 52.5\n[广州]\npoint = 55\n", encoding='utf-8')
+    points = PointValueTable.from_config(str(path))
+    assert points('佛山', '2024-07') == 52.5
+    assert points('广州', '2024-07') == 55.0
+    path.write_text("[广州]\n2024-13 = 1\n", encoding='utf-8')
+    with pytest.raises(ValueError):
+        PointValueTable.from_config(str(path))
+    with pytest.raises(ValueError):
+        PointValueTable.from_config(str(tmp_path / 'missing.ini'))
+
+
+def test_missing_column(rules):
+    columns = CaseColumns()
+    indexes = {'drg': 0, 'dept': 1, 'date': None, 'region': None}
+    columns.append_rows([row[:2] for row in ROWS], indexes)
+    columns.present = {'drg', 'dept'}
+    assert len(summarize(columns, rules, by=['dept'])) == 3
+    with pytest.raises(ValueError):
+        summarize(columns, rules, by=['month'])
+    with pytest.raises(ValueError):
+        summarize(columns, rules, by=['ward'])
+
+
+def test_read_case_columns(tmp_path, rules, columns):
+    path = tmp_path / 'result.csv'
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(ROWS)
+    read = read_case_columns(str(path))
+    assert read.present == set(INDEXES)
+    assert read.count == len(ROWS)
+    by = ['dept', 'month', 'region']
+    assert list(summarize(read, rules, by=by).rows()) == list(summarize(columns, rules, by=by).rows())
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""CCEngine：单个其他诊断的有效级别与 score_many 批量判定"""
+import pytest
+
+from engine.cc import CCEngine
+
+
+@pytest.fixture
+def cc(rules):
+    return CCEngine(rules)
+
+
+@pytest.mark.parametrize('other_diag, main_diag, level', [
+    ('E11.900', 'J18.900', 1),
+    ('N18.500', 'I10.x00', 2),
+    ('N18.500', 'J18.900', 0),    # 类目 J18 被排除
+    ('N18.500', 'J18', 0),
+    ('N18.500', 'J1', 2),         # 短于类目的前缀不参与排除
+    ('J96.000', 'J44.000', 0),
+    ('J96.000', 'J44.001', 2),    # 精确编码排除只对该编码有效
+    ('X00.000', 'I10.x00', 0),    # 不在 CC 表
+    ('E11.900', '', 1),
+])
+def test_level(cc, other_diag, main_diag, level):
+    assert cc.level(other_diag, main_diag) == level
+    assert cc.is_cc(other_diag, main_diag) == (level >= 1)
+    assert cc.is_mcc(other_diag, main_diag) == (level >= 2)
+
+
+def test_score_many(cc):
+    cases = [
+        ('J18.900', ('E11.900', 'N18.500', 'X00.000')),
+        ('J44.000', ('J96.000', 'N18.500')),
+        ('I10.x00', ()),
+        ('I10.x00', ('E11.900', 'E11.900'), ('36.0600',)),   # 多出的列（手术等）忽略
+    ]
+    assert cc.score_many(cases) == [
+        (1, (1, 0, 0)),
+        (2, (0, 2)),
+        (0, ()),
+        (1, (1, 1)),
+    ]
+
+
+def test_score_many_matches_case_level(cc, rules):
+    codes = list(rules.codes.codes('')) + ['X00.000']
+    cases = [(main_diag, tuple(codes[i:i + 3])) for main_diag in ('J18.900', 'J44.000', 'I10.x00')
+             for i in range(len(codes))]
+    assert [level for level, _ in cc.score_many(cases)] == [cc.case_level(*case) for case in cases]
\ No newline at end of file
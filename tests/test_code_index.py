@@ -0,0 +1,94 @@
+"""normalize_code 编码规范化，CodeIndex 查找与 CodeNormalizer 的上级编码回退"""
+import pytest
+
+from engine.code_index import (ALL_TABLES, GROUPING_DIAG_TABLES, TABLE_BITS, CodeIndex, CodeNormalizer,
+                               normalize_code)
+
+
+@pytest.mark.parametrize('code, expected', [
+    ('J18.900', 'J18.900'),
+    ('a00001', 'A00.001'),               # 缺小数点、小写
+    ('Ａ００．００１', 'A00.001'),          # 全角
+    ('A00。001', 'A00.001'),
+    (' j18.9 ', 'J18.9'),
+    ('G01*', 'G01'),                      # 星号、剑号等标记
+    ('A17.0†', 'A17.0'),
+    ('I10.X00', 'I10.x00'),               # 编码中的 x 为小写
+    ('A01.000X001', 'A01.000x001'),
+    ('000200', '00.0200'),                # 手术编码
+    ('3229', '32.29'),
+    ('', ''),
+    ('abc', 'ABC'),                       # 无法识别的写法只转大写
+])
+def test_normalize_code(code, expected):
+    assert normalize_code(code) == expected
+    assert normalize_code(expected) == expected
+
+
+@pytest.fixture
+def index(tables):
+    return CodeIndex.from_tables(tables)
+
+
+def test_tables(index):
+    assert index.tables('J18.900') == TABLE_BITS['AdrgMdcDiag'] | TABLE_BITS['MainDiagIndex'] | TABLE_BITS['OtherDiagIndex']
+    assert index.tables('E11.900') == TABLE_BITS['CC']
+    assert index.tables('J18') == TABLE_BITS['Exclude']
+    assert index.tables('J18.9') == 0
+    assert index.tables('') == 0
+
+
+def test_codes(index):
+    assert list(index.codes('J18')) == ['J18', 'J18.900']
+    assert index.codes('J18', GROUPING_DIAG_TABLES) == ['J18.900']
+    assert list(index.codes('J', limit=2)) == ['J18', 'J18.900']
+    assert list(index.codes('Q')) == []
+
+
+@pytest.mark.parametrize('code, mask, ancestor', [
+    ('J18.900x001', ALL_TABLES, 'J18.900'),
+    ('J18.100', ALL_TABLES, 'J18'),               # 排除表中的类目
+    ('J18.100', GROUPING_DIAG_TABLES, None),
+    ('J18.900', ALL_TABLES, 'J18'),               # 只找真前缀
+    ('J18', ALL_TABLES, None),
+    ('Z99.999', ALL_TABLES, None),
+])
+def test_ancestor(index, code, mask, ancestor):
+    assert index.ancestor(code, mask) == ancestor
+
+
+def test_lookup_matches_linear_scan(index):
+    codes = list(index.codes(''))
+    probes = codes + [code + 'x001' for code in codes] + [code[:-1] for code in codes] + ['', 'J', 'Q00']
+    for code in probes:
+        match = index.lookup(code)
+        assert match.mask == index.tables(code)
+        assert list(index.keys[match.lo:match.hi]) == [c for c in codes if c.startswith(code)]
+        parents = [c for c in codes if c != code and code.startswith(c)]
+        assert match.ancestor == (max(parents, key=len) if parents else None)
+
+
+def test_union(tables):
+    other = {'CC': [('Q00.000', 'T9', 'CC', 1)], 'Exclude': [('T9', 'J18.900')]}
+    merged = CodeIndex.union([CodeIndex.from_tables(tables), CodeIndex.from_tables(other)])
+    assert merged.tables('Q00.000') == TABLE_BITS['CC']
+    assert merged.tables('J18.900') & TABLE_BITS['Exclude']
+    assert merged.tables('J18.900') & TABLE_BITS['MainDiagIndex']
+
+
+def test_normalizer_falls_back_to_ancestor(index):
+    normalizer = CodeNormalizer(index)
+    assert normalizer('j18.900X001') == 'J18.900'     # 细目不在规则表，回退到上级编码
+    assert normalizer('J18.100') == 'J18.100'         # J18 只在排除表中，不作为分组用上级编码
+    assert normalizer('Z99.999') == 'Z99.999'         # 没有上级编码时保持原样
+    assert normalizer('3229') == '32.29'              # 手术查手术表，32.2900 不是 32.29 的前缀
+    assert normalizer('32.2900x001') == '32.2900'
+    assert (normalizer.changed, normalizer.resolved) == (3, 2)
+
+
+def test_normalizer_without_index():
+    normalizer = CodeNormalizer()
+    assert normalizer('j18.900X001') == 'J18.900x001'
+    assert normalizer.case(('j18.900', ['e11.900', '', 'G01*'], ['3229'], '2024-01-01')) == \
+        ('J18.900', ('E11.900', 'G01'), ('32.29',), '2024-01-01')
+    assert normalizer.resolved == 0
\ No newline at end of file
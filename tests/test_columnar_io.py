@@ -0,0 +1,107 @@
+"""Parquet / Arrow 批量分组：列表列与分隔符字符串列读取病例，写出字典编码的结果列再读回"""
+import pytest
+
+from engine.batch_io import group_batches
+from engine.code_index import CodeNormalizer
+from engine.grouper import Grouper
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from engine.columnar_io import (ColumnarCaseReader, ColumnarResultWriter, case_columns, columnar_format,  # noqa: E402
+                                stored_results)
+
+IDS = ['0001', '0002', '0003', '0004', '0005']
+MAIN_DIAGS = ['J18.900', ' J44.000 ', 'j18.900', None, 'I10.x00']
+OTHER_DIAGS = [['E11.900'], ['J96.000', 'N18.500'], None, [], ['N18.500', ' ', 'E11.900']]
+PROCEDURES = ['', None, '32.2900；99.9999', '', '31.2100|']
+
+EXPECTED_CASES = [
+    ('J18.900', ('E11.900',), ()),
+    ('J44.000', ('J96.000', 'N18.500'), ()),
+    ('j18.900', (), ('32.2900', '99.9999')),
+    ('', (), ()),
+    ('I10.x00', ('N18.500', 'E11.900'), ('31.2100',)),
+]
+
+
+def make_table():
+    return pa.table({
+        '病案号': pa.array(IDS),
+        '主要诊断': pa.array(MAIN_DIAGS, pa.string()),
+        '其他诊断': pa.array(OTHER_DIAGS, pa.list_(pa.string())),
+        '手术操作': pa.array(PROCEDURES, pa.string()),
+    })
+
+
+def write_table(path, table, batch_size=2):
+    if columnar_format(path) == 'parquet':
+        pq.write_table(table, path, row_group_size=batch_size)
+    else:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=batch_size)
+
+
+@pytest.fixture(params=['cases.parquet', 'cases.arrow'])
+def input_path(request, tmp_path):
+    path = str(tmp_path / request.param)
+    write_table(path, make_table())
+    return path
+
+
+def test_columnar_format():
+    assert columnar_format('a.PARQUET') == columnar_format('a.pq') == 'parquet'
+    assert columnar_format('a.feather') == columnar_format('a.arrow') == 'arrow'
+    assert columnar_format('a.csv') is None
+
+
+def test_reader(input_path):
+    with ColumnarCaseReader(input_path, batch_size=2) as reader:
+        assert reader.num_rows == len(IDS)
+        batches = list(reader)
+    assert [batch.num_rows for batch, _ in batches] == [2, 2, 1]
+    assert [case for _, cases in batches for case in cases] == EXPECTED_CASES
+
+
+def test_reader_with_normalizer(input_path):
+    normalizer = CodeNormalizer()
+    with ColumnarCaseReader(input_path, normalizer=normalizer) as reader:
+        cases = [case for _, batch_cases in reader for case in batch_cases]
+    assert cases[2] == ('J18.900', (), ('32.2900', '99.9999'))
+    assert cases[1][0] == 'J44.000'
+    assert normalizer.changed >= 2
+
+
+def test_unsupported_file(tmp_path):
+    with pytest.raises(ValueError):
+        ColumnarCaseReader(str(tmp_path / 'cases.csv'))
+
+
+@pytest.mark.parametrize('output_name', ['out.parquet', 'out.arrow'])
+def test_round_trip(input_path, tmp_path, rules, output_name):
+    output_path = str(tmp_path / output_name)
+    with ColumnarCaseReader(input_path, batch_size=2) as reader, \
+            ColumnarResultWriter(output_path, reader.schema, rules) as writer:
+        for batch, results in group_batches(reader, rules):
+            writer.write(batch, results)
+
+    with ColumnarCaseReader(output_path) as reader:
+        indexes, schema = case_columns(reader.schema)
+        assert schema == make_table().schema
+        assert indexes == [0, 1, 2, 3]
+        assert pa.types.is_dictionary(reader.schema.field('drg').type)
+        assert reader.schema.field('ccl').type == pa.int8()
+        cases, results = [], []
+        for batch, batch_cases in reader:
+            cases.extend(batch_cases)
+            results.extend(stored_results(batch))
+    # 原有各列原样保留，结果与直接分组一致
+    assert cases == EXPECTED_CASES
+    assert results == Grouper(rules).group_many(EXPECTED_CASES)
+    assert results[1].drg == 'EX19' and results[4].drg == 'AH19'
+    assert results[3].status == 'no_mdc'
+
+
+def test_case_columns_requires_result_columns():
+    with pytest.raises(ValueError):
+        case_columns(make_table().schema)
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""数据库连接配置：内置默认值 -> 配置文件 [database] -> [database.<配置名>] -> 环境变量 的优先级"""
+import os
+
+import pytest
+
+from models.db_config import (APP_DIR, BATCH_PROFILE, CONFIG_ENV, DEFAULT_CONFIG_PATH, GUI_PROFILE, config_path,
+                              load_settings)
+
+CONFIG = """
+[database]
+path = rules/base.db
+cache_size = -1000
+echo = yes
+
+[database.batch]
+cache_size = -2000
+mode = ro
+unknown_key = ignored
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'config.ini'
+    path.write_text(CONFIG, encoding='utf-8')
+    return str(path)
+
+
+def load(profile, path, **environ):
+    return load_settings(profile, path, environ)
+
+
+def test_defaults(tmp_path):
+    missing = str(tmp_path / 'missing.ini')
+    gui, batch = load(GUI_PROFILE, missing), load(BATCH_PROFILE, missing)
+    assert gui.path == os.path.join(APP_DIR, 'data', 'GroupConfig.db')
+    assert (gui.mode, gui.query_only, gui.mmap_size, gui.cache_size) == ('rw', False, 64 * 1024 * 1024, -16000)
+    assert (batch.mode, batch.query_only, batch.mmap_size, batch.cache_size) == ('rw', True, 256 * 1024 * 1024,
+                                                                                   -65536)
+    assert gui.url() == 'sqlite:///' + gui.path
+    assert ('query_only', 'ON') not in gui.pragmas()
+    assert ('query_only', 'ON') in batch.pragmas()
+
+
+def test_file_sections(config_file):
+    gui, batch = load(GUI_PROFILE, config_file), load(BATCH_PROFILE, config_file)
+    # 相对路径相对程序目录解析
+    assert gui.path == batch.path == os.path.join(APP_DIR, 'rules', 'base.db')
+    assert (gui.cache_size, gui.echo, gui.mode) == (-1000, True, 'rw')
+    # [database.batch] 覆盖 [database]，未写的键沿用该配置的内置默认值
+    assert (batch.cache_size, batch.echo, batch.mode) == (-2000, True, 'ro')
+    assert batch.mmap_size == 256 * 1024 * 1024
+    assert batch.read_only and batch.query_only
+    assert batch.url().endswith('?mode=ro&uri=true')
+    assert not hasattr(batch, 'unknown_key')
+
+
+def test_environment_overrides(config_file, tmp_path):
+    db = str(tmp_path / 'env.db')
+    environ = {'CHSDRG_DB_CACHE_SIZE': '-3000', 'CHSDRG_DB_BATCH_CACHE_SIZE': '-4000', 'CHSDRG_DB_PATH': db,
+               'CHSDRG_DB_GUI_MODE': 'immutable'}
+    gui, batch = load(GUI_PROFILE, config_file, **environ), load(BATCH_PROFILE, config_file, **environ)
+    assert (gui.cache_size, batch.cache_size) == (-3000, -4000)
+    assert gui.path == batch.path == db
+    assert gui.mode == 'immutable' and gui.query_only
+    assert gui.url().endswith('?mode=ro&immutable=1&uri=true')
+    assert batch.mode == 'ro'
+
+
+def test_config_path_from_environment(tmp_path, config_file):
+    assert config_path({}) == DEFAULT_CONFIG_PATH
+    assert config_path({CONFIG_ENV: config_file}) == config_file
+    assert load_settings(BATCH_PROFILE, environ={CONFIG_ENV: config_file}).cache_size == -2000
+
+
+@pytest.mark.parametrize('key, value', [
+    ('MODE', 'readonly'),
+    ('ECHO', 'maybe'),
+    ('MMAP_SIZE', '64MB'),
+    ('TEMP_STORE', 'disk'),
+])
+def test_invalid_values(tmp_path, key, value):
+    with pytest.raises(ValueError):
+        load(GUI_PROFILE, str(tmp_path / 'missing.ini'), **{'CHSDRG_DB_' + key: value})
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        load_settings('report')
\ No newline at end of file
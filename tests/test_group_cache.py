@@ -0,0 +1,77 @@
+"""GroupCache / CachingGrouper：键与顺序、重复无关，LRU 条数与字节上限"""
+import pytest
+
+from engine.grouper import Grouper
+from engine.group_cache import CODE_BYTES, ENTRY_BYTES, CachingGrouper, GroupCache, cache_key, estimate_key_size
+
+
+def test_key_ignores_order_and_duplicates():
+    assert cache_key(None, 'J18.900', ('N18.500', 'E11.900', 'N18.500'), ('32.2900', '99.9999')) == \
+        cache_key(None, 'J18.900', ['E11.900', 'N18.500'], ('99.9999', '32.2900', '99.9999'))
+    assert cache_key('v1', 'J18.900', (), ()) != cache_key('v2', 'J18.900', (), ())
+
+
+def test_caching_grouper_hits_on_reordered_case(rules):
+    cache = GroupCache()
+    grouper = CachingGrouper(Grouper(rules), cache)
+    first = grouper.group('J18.900', ('E11.900', 'N18.500'), ('99.9999', '32.2900'))
+    again = grouper.group('J18.900', ('N18.500', 'E11.900', 'E11.900'), ('32.2900', '99.9999'))
+    assert again is first
+    assert first == Grouper(rules).group('J18.900', ('E11.900', 'N18.500'), ('99.9999', '32.2900'))
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+
+
+def test_caching_grouper_matches_uncached(rules):
+    cases = [(main_diag, others, procs) for main_diag in ('J18.900', 'J44.000', 'I10.x00', 'Z99.999')
+             for others in ((), ('E11.900',), ('N18.500', 'J96.000')) for procs in ((), ('32.2900',))]
+    cached = CachingGrouper(Grouper(rules), GroupCache(max_entries=5))
+    assert cached.group_many(cases + cases) == Grouper(rules).group_many(cases + cases)
+
+
+def test_lru_entry_limit():
+    cache = GroupCache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.put((None, key, (), ()), key)
+    cache.get((None, 'a', (), ()))          # a 变为最近使用
+    cache.put((None, 'c', (), ()), 'c')     # 淘汰 b
+    assert cache.get((None, 'b', (), ())) is None
+    assert cache.get((None, 'a', (), ())) == 'a'
+    assert cache.get((None, 'c', (), ())) == 'c'
+    assert (len(cache), cache.evictions) == (2, 1)
+
+
+def test_lru_byte_limit():
+    small = (None, 'A', (), ())
+    large = (None, 'B', ('X',) * 4, ('Y',) * 4)
+    assert estimate_key_size(small) == ENTRY_BYTES
+    assert estimate_key_size(large) == ENTRY_BYTES + 8 * CODE_BYTES
+
+    cache = GroupCache(max_entries=100, max_bytes=3 * ENTRY_BYTES)
+    for i in range(5):
+        cache.put((None, str(i), (), ()), i)
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (3, 3 * ENTRY_BYTES, 2)
+    assert cache.get((None, '0', (), ())) is None
+    assert cache.get((None, '4', (), ())) == 4
+
+    # 单个超过字节上限的条目不缓存，也不挤掉已有条目
+    cache.put(large, 'large')
+    assert cache.get(large) is None
+    assert len(cache) == 3
+
+
+def test_results_are_shared():
+    cache = GroupCache()
+    first = cache.put((None, 'A', (), ()), ('MDCE', 'ES2'))
+    second = cache.put((None, 'B', (), ()), ('MDCE', 'ES2'))
+    assert second is first
+
+
+@pytest.mark.parametrize('hits, misses, rate', [(0, 0, 0.0), (3, 1, 0.75)])
+def test_merge_counts(hits, misses, rate):
+    worker = GroupCache()
+    worker.hits, worker.misses = hits, misses
+    parent = GroupCache()
+    parent.merge_counts(worker.take_counts())
+    assert (parent.hits, parent.misses, parent.stats()['hit_rate']) == (hits, misses, rate)
+    assert (worker.hits, worker.misses) == (0, 0)
\ No newline at end of file
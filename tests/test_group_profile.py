@@ -0,0 +1,78 @@
+"""ProfilingGrouper：结果与 Grouper 相同，按分组路径计数，工作进程的数据可以汇总到父进程"""
+import pytest
+
+from engine.group_profile import STAGES, GroupProfile, ProfilingGrouper
+from engine.grouper import Grouper
+
+CASES = [
+    ('J18.900', (), ('31.2100',)),      # 先期分组 AH19
+    ('J18.900', (), ('32.2900',)),      # 手术 ES15
+    ('J18.900', ('E11.900',), ()),      # 内科 ES23，伴 CC
+    ('J44.000', ('N18.500',), ()),      # 内科 EX19，伴 MCC
+    ('J96.000', (), ()),                # 缺少其他诊断 J18.900，无 ADRG
+    ('J96.000', ('J18.900',), ()),      # ET1 没有细分组
+    ('J98.000', (), ()),                # 无 ADRG
+    ('Z99.999', (), ()),                # 无 MDC
+    ('S72.000', ('S06.000',), ()),      # 多发创伤 ZZ19
+    ('S72.000', (), ()),                # 单一部位 IZ19
+    ('I10.x00', (), ('32.2900',)),      # 手术不属于 MDCF，QY
+    ('I10.x00', (), ('36.0600',)),      # 手术 FM19
+]
+
+EXPECTED_COUNTS = {
+    'surgical': 3, 'pre_mdc': 1, 'medical': 5, 'qy': 1, 'no_mdc': 1, 'no_adrg': 2, 'no_drg': 1,
+    'multiple_sites': 2, 'ccl_0': 6, 'ccl_1': 1, 'ccl_2': 1,
+}
+
+
+@pytest.fixture
+def profiled(rules):
+    grouper = ProfilingGrouper(rules)
+    results = grouper.group_many(CASES)
+    return grouper.profile, results
+
+
+def test_results_match_grouper(rules, profiled):
+    _, results = profiled
+    assert results == Grouper(rules).group_many(CASES)
+
+
+def test_counts(profiled):
+    profile, _ = profiled
+    assert profile.cases == len(CASES)
+    assert dict(profile.counts) == EXPECTED_COUNTS
+    assert profile.total_ns > 0
+    assert profile.stage_calls['cc'] >= profile.stage_calls['drg'] > 0
+    seconds = profile.stage_seconds()
+    assert set(seconds) == set(STAGES)
+    assert all(value >= 0 for value in seconds.values())
+
+
+def test_take_and_merge_counts(profiled):
+    profile, _ = profiled
+    counts = profile.take_counts()
+    # 取出后清零
+    assert profile.cases == 0 and not profile.counts
+    merged = GroupProfile()
+    merged.merge_counts(counts)
+    merged.merge_counts(counts)
+    assert merged.cases == 2 * len(CASES)
+    assert merged.counts['surgical'] == 2 * EXPECTED_COUNTS['surgical']
+    assert merged.stage_calls['adrg'] == 2 * counts[4]['adrg']
+    assert merged.total_ns == 2 * counts[2]
+
+
+def test_shared_profile(rules):
+    profile = GroupProfile()
+    ProfilingGrouper(rules, profile).group_many(CASES[:4])
+    ProfilingGrouper(rules, profile).group_many(CASES[4:])
+    assert dict(profile.counts) == EXPECTED_COUNTS
+
+
+def test_summary_lines(profiled):
+    profile, _ = profiled
+    lines = profile.summary_lines()
+    assert lines[0].startswith("分组剖析: 12 条")
+    assert len(lines) == 1 + len(STAGES) + 2
+    assert "歧义组(QY) 1 (8.3%)" in lines[-2]
+    assert GroupProfile().summary_lines() == ["分组剖析: 没有分组的病例"]
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Grouper：MDC/ADRG/DRG 各条分组路径、CC/MCC 与排除表、未入组"""
+import pytest
+
+from engine.grouper import Grouper, GroupResult, UNGROUPED_DRG
+
+
+@pytest.fixture
+def grouper(rules):
+    return Grouper(rules)
+
+
+@pytest.mark.parametrize('case, expected', [
+    # 内科组，按 CC 级别选细分组
+    (('J18.900', (), ()), ('MDCE', 'ES2', 'ES25', 0, 0.8, 'ok')),
+    (('J18.900', ('E11.900',), ()), ('MDCE', 'ES2', 'ES23', 1, 1.0, 'ok')),
+    (('I10.x00', ('N18.500',), ()), ('MDCF', 'FR1', 'FR11', 2, 0.9, 'ok')),
+    # 只有一个细分组（末位 9）时各级别都落在这一组
+    (('J44.000', ('N18.500',), ()), ('MDCE', 'EX1', 'EX19', 2, 0.9, 'ok')),
+    # 先期分组不论主要诊断所属 MDC
+    (('I10.x00', (), ('31.2100',)), ('MDCA', 'AH1', 'AH19', 0, 6.5, 'ok')),
+    # 手术组：手术与主要诊断都在 ES1 池中
+    (('J18.900', (), ('32.2900',)), ('MDCE', 'ES1', 'ES15', 0, 2.1, 'ok')),
+    (('I10.x00', (), ('36.0600',)), ('MDCF', 'FM1', 'FM19', 0, 4.8, 'ok')),
+    # 不属于任何外科 ADRG 的手术不影响内科入组
+    (('J18.900', (), ('99.9999',)), ('MDCE', 'ES2', 'ES25', 0, 0.8, 'ok')),
+    # 多发创伤须涉及两个部位，单一部位落入下一个 MDC
+    (('S72.000', ('S06.000',), ()), ('MDCZ', 'ZZ1', 'ZZ19', 0, 5.0, 'ok')),
+    (('S72.000', (), ()), ('MDCI', 'IZ1', 'IZ19', 0, 1.6, 'ok')),
+])
+def test_group(grouper, case, expected):
+    assert grouper.group(*case) == GroupResult(*expected)
+
+
+def test_other_diag_requirement(grouper):
+    # ET1 须有其他诊断 J18.900；入组后没有 DRG 细分组
+    assert grouper.group('J96.000', ('J18.900',)) == GroupResult('MDCE', 'ET1', UNGROUPED_DRG, 0, None, 'no_drg')
+    assert grouper.group('J96.000').status == 'no_adrg'
+
+
+@pytest.mark.parametrize('case', [
+    ('J96.000', (), ('32.2900',)),   # 本 MDC 的外科手术，主要诊断不在 ES1 主诊表
+    ('J18.900', (), ('36.0600',)),   # 其他 MDC 的外科手术
+])
+def test_ambiguous(grouper, case):
+    assert grouper.group(*case) == GroupResult('MDCE', None, 'EQY', 0, None, 'qy')
+
+
+@pytest.mark.parametrize('main_diag, expected', [
+    ('Z99.999', GroupResult(None, None, UNGROUPED_DRG, 0, None, 'no_mdc')),
+    ('', GroupResult(None, None, UNGROUPED_DRG, 0, None, 'no_mdc')),
+    ('J98.000', GroupResult('MDCE', None, UNGROUPED_DRG, 0, None, 'no_adrg')),
+])
+def test_ungrouped(grouper, main_diag, expected):
+    assert grouper.group(main_diag) == expected
+
+
+def test_excluded_cc(grouper):
+    # J96.000 (MCC) 的排除表 T3 排除主要诊断 J44.000
+    assert grouper.group('J44.000', ('J96.000',)).ccl == 0
+    # N18.500 (MCC) 的排除表 T2 按类目 J18 排除，E11.900 (CC) 仍有效
+    assert grouper.group('J18.900', ('E11.900', 'N18.500')).ccl == 1
+    # 同一其他诊断在不被排除的主要诊断下有效
+    assert grouper.group('I10.x00', ('J96.000',)).ccl == 2
+
+
+def test_order_and_duplicates_do_not_matter(grouper):
+    expected = grouper.group('J18.900', ('E11.900', 'I10.x00'), ('32.2900', '99.9999'))
+    assert grouper.group('J18.900', ('I10.x00', 'E11.900', 'I10.x00'), ('99.9999', '32.2900', '32.2900')) == expected
+
+
+def test_group_many_keeps_order(grouper):
+    cases = [('I10.x00', (), ()), ('Z99.999', (), ()), ('J18.900', ('E11.900',), ())]
+    assert grouper.group_many(cases) == [grouper.group_case(case) for case in cases]
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""DbChangeMonitor 检测数据库变化；RuleLookup 在后台重新加载规则快照，加载完成前沿用旧快照"""
+import sqlite3
+import threading
+
+import pytest
+
+import engine.snapshot as snapshot_module
+from conftest import make_tables
+from engine.lookup_cache import DbChangeMonitor, RuleLookup
+from engine.snapshot import RuleSnapshot
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'rules.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE t (x)')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def write(path, journal_mode='delete'):
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA journal_mode={journal_mode}')
+    conn.execute('INSERT INTO t VALUES (1)')
+    conn.commit()
+    conn.close()
+
+
+def test_monitor_detects_commit(db_path):
+    monitor = DbChangeMonitor(db_path, interval=0)
+    assert not monitor.changed()
+    write(db_path)
+    assert monitor.changed()
+    assert not monitor.changed()    # 同一变化只报告一次
+
+
+def test_monitor_detects_wal_commit(db_path):
+    write(db_path, 'wal')
+    monitor = DbChangeMonitor(db_path, interval=0)
+    keep_open = sqlite3.connect(db_path)    # 保持连接，提交只写入 WAL 文件
+    try:
+        write(db_path, 'wal')
+        assert monitor.changed()
+    finally:
+        keep_open.close()
+
+
+def test_monitor_checks_at_most_once_per_interval(db_path):
+    monitor = DbChangeMonitor(db_path, interval=3600)
+    write(db_path)
+    assert not monitor.changed()
+
+
+def test_monitor_missing_file(tmp_path):
+    monitor = DbChangeMonitor(str(tmp_path / 'missing.db'), interval=0)
+    assert not monitor.changed()
+
+
+class ChangedOnce:
+    """第一次检查时报告数据库已变化"""
+
+    def __init__(self):
+        self.pending = True
+
+    def changed(self):
+        pending, self.pending = self.pending, False
+        return pending
+
+
+@pytest.fixture
+def lookup(db_path, snapshot, monkeypatch):
+    monkeypatch.setattr(snapshot_module, '_snapshot', snapshot)
+    lookup = RuleLookup(db_path)
+    lookup.monitor = ChangedOnce()
+    return lookup
+
+
+def test_reload_in_background(lookup, snapshot, monkeypatch):
+    tables = make_tables()
+    tables['Exclude'].append(('T1', 'I10'))
+    new_snapshot = RuleSnapshot.from_tables(tables)
+    release = threading.Event()
+
+    def slow_load_or_build(*args, **kwargs):
+        release.wait(10)
+        return new_snapshot
+
+    monkeypatch.setattr(snapshot_module, 'load_or_build', slow_load_or_build)
+    # 重新加载未完成时不等待，继续返回旧快照中的行
+    assert lookup.excludes_of('T1') == []
+    assert lookup.drgs_of('ES2') == snapshot.drgs_of('ES2')
+    thread = lookup._reloading
+    assert thread is not None and thread.is_alive()
+    release.set()
+    thread.join(10)
+    assert lookup.excludes_of('T1') == [('T1', 'I10')]
+    assert snapshot_module.get_snapshot() is new_snapshot
+    assert lookup._reloading is None
+
+
+def test_changes_during_reload_reload_again(lookup, monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def load_or_build(*args, **kwargs):
+        calls.append(1)
+        release.wait(10)
+        return RuleSnapshot.from_tables(make_tables())
+
+    monkeypatch.setattr(snapshot_module, 'load_or_build', load_or_build)
+    thread = lookup.reload()
+    assert lookup.reload() is thread
+    assert lookup.reload() is thread
+    release.set()
+    thread.join(10)
+    assert len(calls) == 2      # 加载期间的多次变化合为再加载一次
+
+
+def test_failed_reload_keeps_old_snapshot(lookup, snapshot, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("disk error")
+
+    monkeypatch.setattr(snapshot_module, 'load_or_build', broken)
+    lookup.reload().join(10)
+    assert isinstance(lookup.reload_error, OSError)
+    assert snapshot_module.get_snapshot() is snapshot
+    assert lookup.main_diags_of('ES1') == snapshot.main_diags_of('ES1')
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""ParallelGrouper：进程池分组与本进程内分组的结果一致，按需才启动进程池"""
+import multiprocessing
+
+import pytest
+
+import engine.parallel as parallel
+from engine.group_cache import GroupCache
+from engine.group_profile import GroupProfile
+from engine.grouper import Grouper
+from engine.parallel import ParallelGrouper, iter_chunks
+
+CASES = [(main_diag, others, procs) for main_diag in ('J18.900', 'J44.000', 'I10.x00', 'S72.000', 'Z99.999')
+         for others in ((), ('E11.900',), ('N18.500', 'S06.000')) for procs in ((), ('32.2900',), ('31.2100',))] * 3
+
+needs_fork = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="需要 fork")
+
+
+@pytest.fixture
+def two_cpus(monkeypatch):
+    monkeypatch.setattr(parallel, 'available_cpus', lambda: 2)
+
+
+def test_iter_chunks():
+    assert list(iter_chunks(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_chunks([], 3)) == []
+
+
+def test_workers_default_to_available_cpus(two_cpus):
+    assert ParallelGrouper().workers == 2
+
+
+@pytest.mark.parametrize('workers, cpus, parallel_expected', [(1, 4, False), (4, 1, False), (2, 2, True)])
+def test_parallel_only_with_several_cpus(monkeypatch, rules, workers, cpus, parallel_expected):
+    monkeypatch.setattr(parallel, 'available_cpus', lambda: cpus)
+    assert ParallelGrouper(workers, rules=rules).parallel == parallel_expected
+
+
+def test_serial_fallback_on_one_cpu(monkeypatch, rules):
+    monkeypatch.setattr(parallel, 'available_cpus', lambda: 1)
+    cache, profile = GroupCache(), GroupProfile()
+    with ParallelGrouper(4, chunk_size=8, rules=rules, cache=cache, profile=profile) as pool:
+        pool.start()
+        assert pool.group_many(CASES) == Grouper(rules).group_many(CASES)
+        assert pool._pool is None
+    # 本进程内分组时缓存和计时直接记在传入的对象中
+    assert cache.hits + cache.misses == len(CASES)
+    assert profile.cases == cache.misses
+
+
+def test_small_input_stays_in_process(two_cpus, rules):
+    with ParallelGrouper(2, chunk_size=len(CASES) + 1, rules=rules) as pool:
+        assert pool.group_many(CASES) == Grouper(rules).group_many(CASES)
+        assert pool._pool is None
+        assert pool.group_many([]) == []
+
+
+@needs_fork
+def test_pool_matches_serial(two_cpus, rules):
+    cache, profile = GroupCache(), GroupProfile()
+    with ParallelGrouper(2, chunk_size=7, rules=rules, cache=cache, profile=profile) as pool:
+        results = pool.group_many(iter(CASES))
+        assert pool._pool is not None
+        assert results == Grouper(rules).group_many(CASES)
+    assert pool._pool is None
+    # 各工作进程的缓存统计和计时汇总到父进程
+    assert cache.hits + cache.misses == len(CASES)
+    assert len(cache) == 0
+    assert profile.cases == cache.misses
\ No newline at end of file
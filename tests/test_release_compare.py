@@ -0,0 +1,102 @@
+"""规则库版本对比：按主键得到新增、删除、修改，编码换组报告为移动"""
+import sqlite3
+
+import pytest
+
+from conftest import make_tables
+from engine.release_compare import (ADDED, CHANGED, MOVED, REMOVED, TableLayout, compare_databases, compare_tables,
+                                    read_release)
+from engine.snapshot import SNAPSHOT_MODELS
+from models.exclude_model import Exclude
+from models.maindiagindex_model import MainDiagIndex
+
+
+def replace_row(rows, old, new):
+    rows[rows.index(old)] = new
+
+
+@pytest.fixture
+def new_tables():
+    tables = make_tables()
+    tables['Adrg'].append(('ES3', '肺结核', 'E', '内科'))
+    tables['ExceptOper'].clear()
+    replace_row(tables['DrgsGroup'], ('EX19', '慢性阻塞性肺病', 0, 0, '0', None, 0.9, 'EX1'),
+                ('EX19', '慢性阻塞性肺病', 0, 0, '0', None, 1.1, 'EX1'))
+    replace_row(tables['CC'], ('E11.900', 'T1', 'CC', 1), ('E11.900', 'T1', 'MCC', 2))
+    # J44.000 从 EX1 移到 ES2
+    replace_row(tables['MainDiagIndex'], ('EX1', 'J44.000', '慢性阻塞性肺病伴急性下呼吸道感染', 1),
+                ('ES2', 'J44.000', '慢性阻塞性肺病伴急性下呼吸道感染', 1))
+    return tables
+
+
+def test_no_changes(tables):
+    comparison = compare_tables(tables, make_tables())
+    assert comparison.total() == 0
+    assert not any(comparison.tables.values())
+    assert list(comparison.tables) == [model.__tablename__ for model in SNAPSHOT_MODELS]
+
+
+def test_changes(tables, new_tables):
+    comparison = compare_tables(tables, new_tables)
+    counts = comparison.counts()
+    assert counts['Adrg'] == {ADDED: 1, REMOVED: 0, CHANGED: 0, MOVED: 0}
+    assert counts['ExceptOper'] == {ADDED: 0, REMOVED: 1, CHANGED: 0, MOVED: 0}
+    assert counts['DrgsGroup'] == {ADDED: 0, REMOVED: 0, CHANGED: 1, MOVED: 0}
+    assert counts['CC'] == {ADDED: 0, REMOVED: 0, CHANGED: 1, MOVED: 0}
+    assert counts['MainDiagIndex'] == {ADDED: 0, REMOVED: 0, CHANGED: 0, MOVED: 1}
+    assert comparison.total() == 5
+    assert set(comparison.entries()) == {
+        ('ADRG', ADDED, 'ES3', '', '', '肺结核 / E / 内科'),
+        ('不应编码手术', REMOVED, '00.0100', '', '治疗性超声', ''),
+        ('DRG细分组', CHANGED, 'EX19', 'paycw', '0.9', '1.1'),
+        ('并发症表', CHANGED, 'E11.900', 'cctype', 'CC', 'MCC'),
+        ('并发症表', CHANGED, 'E11.900', 'ccl', '1', '2'),
+        ('ADRG主要诊断表', MOVED, 'J44.000', 'acode', 'EX1', 'ES2'),
+    }
+    assert len(comparison.summary_lines()) == len(SNAPSHOT_MODELS) + 1
+
+
+def test_ambiguous_move_is_added_and_removed(tables):
+    # 编码在旧版的一个组删除、新版同时加入两个组时无法对应，分别报告新增和删除
+    new_tables = make_tables()
+    new_tables['MainDiagIndex'].remove(('ET1', 'J96.000', '急性呼吸衰竭', 1))
+    new_tables['MainDiagIndex'] += [('ES2', 'J96.000', '急性呼吸衰竭', 1), ('EX1', 'J96.000', '急性呼吸衰竭', 1)]
+    table = compare_tables(tables, new_tables).tables['MainDiagIndex']
+    assert (len(table.added), len(table.removed), len(table.moved)) == (2, 1, 0)
+
+
+def test_values_by_key():
+    layout = TableLayout(MainDiagIndex)
+    assert layout.key_indexes == (0, 1)
+    rows = [('ES1', 'J18.900', '肺炎', 1), ('ES1', 'J18.900', '肺炎（新）', 1)]
+    assert layout.values_by_key(rows) == {('ES1', 'J18.900'): ('肺炎（新）', 1)}
+    # 全部列都是主键的表
+    layout = TableLayout(Exclude)
+    assert layout.values_by_key([('T3', 'J44.000')]) == {('T3', 'J44.000'): None}
+
+
+def write_release(path, tables):
+    """按模型的表名、列名建一个规则库文件（不带列类型，与发布包一样原样存值）"""
+    conn = sqlite3.connect(path)
+    for model in SNAPSHOT_MODELS:
+        table = model.__table__
+        columns = table.columns.keys()
+        conn.execute(f'CREATE TABLE "{table.name}" ({", ".join(columns)})')
+        conn.executemany(f'INSERT INTO "{table.name}" VALUES ({", ".join("?" * len(columns))})', tables[table.name])
+    conn.commit()
+    conn.close()
+
+
+def test_compare_databases(tmp_path, tables, new_tables):
+    old_path, new_path = tmp_path / 'old.db', tmp_path / 'new.db'
+    write_release(old_path, tables)
+    write_release(new_path, new_tables)
+    assert read_release(str(old_path))['MainDiagIndex'] == tables['MainDiagIndex']
+    comparison = compare_databases(str(old_path), str(new_path))
+    assert comparison.total() == 5
+    assert comparison.old_path == str(old_path)
+
+
+def test_missing_release(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        read_release(str(tmp_path / 'missing.db'))
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""rule_diff：按差异增量重新分组的结果须与按新规则全部重新分组一致"""
+from itertools import combinations
+
+import pytest
+
+from conftest import make_tables
+from engine.code_index import CodeNormalizer
+from engine.grouper import Grouper
+from engine.rule_diff import affected_codes, diff_tables, regroup_stream
+from engine.snapshot import RuleSnapshot
+
+MAIN_DIAGS = ('J18.900', 'J44.000', 'J96.000', 'J98.000', 'I10.x00', 'S72.000', 'S06.000', 'Z99.999')
+OTHER_DIAGS = ('E11.900', 'N18.500', 'J96.000', 'J18.900', 'S06.000', 'I10.x00')
+PROCEDURES = ('31.2100', '32.2900', '36.0600', '99.9999')
+
+
+def all_cases():
+    others = [combo for n in range(3) for combo in combinations(OTHER_DIAGS, n)]
+    procedures = [combo for n in range(2) for combo in combinations(PROCEDURES, n)]
+    return [(main_diag, other_diags, procs) for main_diag in MAIN_DIAGS
+            for other_diags in others for procs in procedures]
+
+
+def replace_row(rows, old, new):
+    rows[rows.index(old)] = new
+
+
+def move_diag(tables):
+    """J44.000 从 EX1 移到 ES2"""
+    replace_row(tables['MainDiagIndex'], ('EX1', 'J44.000', '慢性阻塞性肺病伴急性下呼吸道感染', 1),
+                ('ES2', 'J44.000', '慢性阻塞性肺病伴急性下呼吸道感染', 1))
+
+
+def change_cc_level(tables):
+    replace_row(tables['CC'], ('E11.900', 'T1', 'CC', 1), ('E11.900', 'T1', 'MCC', 2))
+
+
+def add_exclude(tables):
+    tables['Exclude'].append(('T1', 'I10'))
+
+
+def change_drgs(tables):
+    replace_row(tables['DrgsGroup'], ('ES25', '肺炎，不伴并发症', 0, 0, '0', None, 0.8, 'ES2'),
+                ('ES25', '肺炎，不伴并发症', 0, 0, '0', None, 0.85, 'ES2'))
+    tables['DrgsGroup'].append(('EX11', '慢性阻塞性肺病，伴严重并发症', 0, 0, '0', None, 1.3, 'EX1'))
+
+
+def change_dept(tables):
+    """ES1 改为内科：32.2900 不再是手术室手术"""
+    replace_row(tables['Adrg'], ('ES1', '呼吸系统手术', 'E', '外科'), ('ES1', '呼吸系统手术', 'E', '内科'))
+
+
+def drop_sites(tables):
+    """MDCZ 不再判断损伤部位"""
+    tables['AdrgMdcDiag'] = [row[:3] + (None,) if row[0] == 'MDCZ' else row for row in tables['AdrgMdcDiag']]
+
+
+def drop_other_requirement(tables):
+    tables['OtherDiagIndex'] = []
+
+
+def add_oper(tables):
+    tables['MainSurgeryIndex'].append(('ES1', '36.0600', '冠状动脉支架置入', 1))
+
+
+def swap_priority(tables):
+    """EX1 排到 ES2 之前：肺炎改入 EX1"""
+    adrgs = tables['Adrg']
+    adrgs[2], adrgs[3] = adrgs[3], adrgs[2]
+
+
+def rename_only(tables):
+    """只改名称：不影响分组，不应重新分组任何病例"""
+    replace_row(tables['Adrg'], ('ES2', '肺炎', 'E', '内科'), ('ES2', '肺炎（新名称）', 'E', '内科'))
+
+
+CHANGES = [move_diag, change_cc_level, add_exclude, change_drgs, change_dept, drop_sites,
+           drop_other_requirement, add_oper, swap_priority, rename_only]
+
+
+def regroup(old_snapshot, new_snapshot, cases):
+    old_results = Grouper(old_snapshot.rules).group_many(cases)
+    affected = affected_codes(old_snapshot, new_snapshot)
+    items = ((old, case, old.adrg, old.drg) for case, old in zip(cases, old_results))
+    merged = [old if new is None else new
+              for old, new in regroup_stream(items, affected, Grouper(new_snapshot.rules), block_size=97)]
+    return merged, affected
+
+
+@pytest.mark.parametrize('change', CHANGES, ids=[change.__name__ for change in CHANGES])
+def test_incremental_matches_full_regroup(change):
+    old_tables, new_tables = make_tables(), make_tables()
+    change(new_tables)
+    old_snapshot, new_snapshot = RuleSnapshot.from_tables(old_tables), RuleSnapshot.from_tables(new_tables)
+    cases = all_cases()
+    merged, affected = regroup(old_snapshot, new_snapshot, cases)
+    assert merged == Grouper(new_snapshot.rules).group_many(cases)
+    if change is rename_only:
+        assert not affected
+
+
+def test_combined_changes():
+    old_tables, new_tables = make_tables(), make_tables()
+    for change in (move_diag, change_cc_level, add_exclude, change_drgs, drop_sites):
+        change(new_tables)
+    old_snapshot, new_snapshot = RuleSnapshot.from_tables(old_tables), RuleSnapshot.from_tables(new_tables)
+    cases = all_cases()
+    merged, affected = regroup(old_snapshot, new_snapshot, cases)
+    assert merged == Grouper(new_snapshot.rules).group_many(cases)
+    assert not affected.everything
+
+
+def remove_code(tables, code):
+    """编码从各规则表中删除"""
+    for name, rows in tables.items():
+        tables[name] = [row for row in rows if code not in row]
+
+
+@pytest.mark.parametrize('removed_in', ['new', 'old'])
+def test_ancestor_normalization(removed_in):
+    # 原始编码 J44.000x001 规范化为有该编码的一版中的 J44.000，在另一版中没有上级编码（无 MDC）
+    old_tables, new_tables = make_tables(), make_tables()
+    remove_code(new_tables if removed_in == 'new' else old_tables, 'J44.000')
+    old_snapshot, new_snapshot = RuleSnapshot.from_tables(old_tables), RuleSnapshot.from_tables(new_tables)
+    cases = [('J44.000x001', ('N18.500',), ()), ('J18.900x001', ('E11.900x001',), ()),
+             ('j18.900', ('J44.000x001',), ('32.2900x002',))] + all_cases()
+    old_normalizer, new_normalizer = CodeNormalizer(old_snapshot.rules.codes), CodeNormalizer(new_snapshot.rules.codes)
+    old_results = Grouper(old_snapshot.rules).group_many([old_normalizer.case(case) for case in cases])
+    affected = affected_codes(old_snapshot, new_snapshot)
+    items = ((old, case, old.adrg, old.drg) for case, old in zip(cases, old_results))
+    merged = [old if new is None else new
+              for old, new in regroup_stream(items, affected, Grouper(new_snapshot.rules), block_size=97,
+                                             normalizers=(old_normalizer, new_normalizer))]
+    expected = Grouper(new_snapshot.rules).group_many([new_normalizer.case(case) for case in cases])
+    assert merged == expected
+    assert old_results[0] != expected[0]
+    assert 'no_mdc' in (old_results[0].status, expected[0].status)
+
+
+def test_diff_tables():
+    old_tables, new_tables = make_tables(), make_tables()
+    move_diag(new_tables)
+    diffs = diff_tables(old_tables, new_tables)
+    assert diffs['MainDiagIndex'].removed == [('EX1', 'J44.000')]
+    assert diffs['MainDiagIndex'].added == [('ES2', 'J44.000')]
+    assert not any(diff for name, diff in diffs.items() if name != 'MainDiagIndex')
\ No newline at end of file
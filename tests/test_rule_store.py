@@ -0,0 +1,98 @@
+"""RuleStore：按出院日期选版本（起始日含、截止日不含）、有效期重叠与日期解析"""
+import datetime
+
+import pytest
+
+from engine.rule_store import NO_VERSION, MultiVersionGrouper, RuleStore, parse_date
+
+D = datetime.date
+
+
+@pytest.fixture
+def store(snapshot):
+    store = RuleStore()
+    # 2023 年版本之后留空一个月，2024 年版本不限截止日
+    store.add('v2024', snapshot, '2024-02-01', None)
+    store.add('v2023', snapshot, '20230101', '2024/1/1')
+    return store
+
+
+@pytest.mark.parametrize('day, name', [
+    ('2022-12-31', None),
+    ('2023-01-01', 'v2023'),        # 起始日含
+    ('2023-12-31', 'v2023'),
+    ('2024-01-01', None),           # 截止日不含
+    ('2024-01-31', None),
+    ('2024-02-01', 'v2024'),
+    ('2099-12-31', 'v2024'),
+    ('2023-06-15 10:30:00', 'v2023'),
+    ('2023年6月15日', 'v2023'),
+    ('2023-06-15T08:00', 'v2023'),
+    (datetime.datetime(2024, 2, 1, 0, 1), 'v2024'),
+    (D(2024, 1, 31), None),
+    (None, None),
+    ('', None),
+])
+def test_version_for(store, day, name):
+    version = store.version_for(day)
+    assert (version.name if version else None) == name
+
+
+def test_versions_sorted_by_start(store):
+    assert [version.name for version in store] == ['v2023', 'v2024']
+    assert store.get('v2023').end == D(2024, 1, 1)
+    assert store.get('missing') is None
+
+
+def test_open_start(snapshot):
+    store = RuleStore()
+    store.add('old', snapshot, None, '2020-01-01')
+    store.add('new', snapshot, '2020-01-01')
+    assert store.version_for('1900-01-01').name == 'old'
+    assert store.version_for('2019-12-31').name == 'old'
+    assert store.version_for('2020-01-01').name == 'new'
+
+
+@pytest.mark.parametrize('name, start, end', [
+    ('v2023', '2025-01-01', None),              # 名称重复
+    ('bad', '2025-01-01', '2025-01-01'),        # 截止日不晚于起始日
+    ('bad', '2025-01-01', '2024-12-31'),
+    ('overlap', '2023-12-31', '2024-01-02'),    # 与 v2023 重叠一天
+    ('overlap', '2024-01-15', '2024-02-02'),    # 与 v2024 重叠一天
+    ('overlap', None, '2023-01-02'),
+    ('overlap', '2030-01-01', None),
+    ('overlap', None, None),
+])
+def test_add_rejects(store, snapshot, name, start, end):
+    with pytest.raises(ValueError):
+        store.add(name, snapshot, start, end)
+    assert len(store) == 2
+
+
+def test_add_adjacent(store, snapshot):
+    # 恰好填满空档：与前一版本的截止日、后一版本的起始日相接不算重叠
+    store.add('gap', snapshot, '2024-01-01', '2024-02-01')
+    assert [version.name for version in store] == ['v2023', 'gap', 'v2024']
+    assert store.version_for('2024-01-01').name == 'gap'
+    assert store.version_for('2024-01-31').name == 'gap'
+    assert store.version_for('2024-02-01').name == 'v2024'
+
+
+@pytest.mark.parametrize('value', ['2024-13-01', '2024-02-30', '20241', 'yesterday', '2024-01', '01/02'])
+def test_parse_date_errors(value):
+    with pytest.raises(ValueError):
+        parse_date(value)
+
+
+def test_parse_date():
+    assert parse_date('2024/5/1') == parse_date('20240501') == parse_date(' 2024-05-01 ') == D(2024, 5, 1)
+    assert parse_date(datetime.datetime(2024, 5, 1, 23, 59)) == D(2024, 5, 1)
+    assert parse_date('  ') is None
+
+
+def test_multi_version_grouper(store):
+    grouper = MultiVersionGrouper(store)
+    assert grouper.group('J18.900', (), (), '2023-06-01').drg == 'ES25'
+    assert grouper.group('J18.900', (), (), '2024-01-15').status == NO_VERSION
+    assert grouper.group('J18.900', (), (), 'not a date').status == NO_VERSION
+    assert grouper.group_case(('J18.900', (), (), ['unhashable'])).status == NO_VERSION
\ No newline at end of file
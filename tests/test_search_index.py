@@ -0,0 +1,73 @@
+"""SearchIndex：检索结果须与逐行子串扫描一致"""
+import random
+
+import pytest
+
+from views.search_index import COLUMN_SEPARATOR, ROW_SEPARATOR, SearchIndex, column_texts, normalize_query
+
+ALPHABET = 'abcAB.x019肺炎高血压伴并发症'
+
+
+def random_texts(rng, count):
+    return [COLUMN_SEPARATOR.join(''.join(rng.choice(ALPHABET) for _ in range(rng.randrange(0, 8)))
+                                  for _ in range(3)) for _ in range(count)]
+
+
+def scan(texts, query, within=None):
+    query = normalize_query(query)
+    rows = range(len(texts)) if within is None else within
+    return [row for row in rows if query in texts[row].lower()]
+
+
+@pytest.fixture(scope='module')
+def texts():
+    return random_texts(random.Random(20240501), 600)
+
+
+def queries(texts, rng):
+    found = set()
+    for text in rng.sample(texts, 100):
+        for n in (1, 2, 3, 5):
+            if len(text) >= n:
+                i = rng.randrange(len(text) - n + 1)
+                found.add(text[i:i + n])
+    found.update(['', 'zz', '肺炎伴', 'AB', 'q', 'A' + COLUMN_SEPARATOR + 'b', ROW_SEPARATOR])
+    return sorted(found)
+
+
+def test_matches_substring_scan(texts):
+    index = SearchIndex(texts)
+    assert len(index) == len(texts)
+    for query in queries(texts, random.Random(1)):
+        assert index.search(query) == scan(texts, query), query
+
+
+def test_within_narrows_previous_result(texts):
+    index = SearchIndex(texts)
+    for query in ('肺', '肺炎', '肺炎伴', 'a', 'ab', 'ab.'):
+        previous = index.search(query[:-1]) if len(query) > 1 else None
+        assert index.search(query, previous) == scan(texts, query)
+
+
+def test_extend_matches_single_build(texts):
+    built = SearchIndex(texts)
+    index = SearchIndex()
+    for start in range(0, len(texts), 97):
+        rows = index.extend(texts[start:start + 97])
+        assert rows == range(start, min(start + 97, len(texts)))
+    assert index.extend([]) == range(len(texts), len(texts))
+    for gram in ('a', 'ab', '肺炎', 'x0', COLUMN_SEPARATOR):
+        assert list(index.postings(gram)) == list(built.postings(gram))
+    for query in queries(texts, random.Random(2)):
+        assert index.search(query) == built.search(query)
+
+
+def test_matches_do_not_cross_columns():
+    index = SearchIndex([COLUMN_SEPARATOR.join(['J18.900', '肺炎']), 'J18.900肺炎'])
+    assert index.search('900肺') == [1]
+    assert index.search('j18') == [0, 1]
+    assert list(index.postings('0肺')) == [1]
+
+
+def test_column_texts():
+    assert column_texts(['a', None, 1, 2.5]) == ['a', '', '1', '2.5']
\ No newline at end of file
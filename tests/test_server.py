@@ -0,0 +1,170 @@
+"""分组服务：请求校验、接口路由与状态码（直接调用 dispatch，以及经过套接字的 HTTP 请求）"""
+import asyncio
+import json
+
+import pytest
+
+import server
+from server import GroupingServer, HttpError, RuleService, UNKNOWN_ROUTE, parse_case
+
+
+@pytest.fixture
+def app(snapshot):
+    return GroupingServer(RuleService(snapshot))
+
+
+def dispatch(app, method, target, body=b''):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode('utf-8')
+    return asyncio.run(app.dispatch(method, target, body))
+
+
+@pytest.mark.parametrize('item, expected', [
+    ({'main_diag': ' J18.900 ', 'other_diags': ['E11.900', ' ', ''], 'procedures': '32.2900'},
+     ('J18.900', ('E11.900',), ('32.2900',))),
+    (['J18.900'], ('J18.900', (), ())),
+    (['J18.900', ['E11.900'], None], ('J18.900', ('E11.900',), ())),
+])
+def test_parse_case(item, expected):
+    assert parse_case(item) == expected
+
+
+@pytest.mark.parametrize('item', [
+    {},
+    {'main_diag': '  '},
+    {'main_diag': 1},
+    {'main_diag': 'J18.900', 'other_diags': [1]},
+    {'main_diag': 'J18.900', 'procedures': {'code': '32.2900'}},
+    [],
+    ['J18.900', [], [], '2024-01-01'],
+    'J18.900',
+    None,
+])
+def test_parse_case_errors(item):
+    with pytest.raises(HttpError) as info:
+        parse_case(item)
+    assert info.value.status == 400
+
+
+@pytest.mark.parametrize('method, target, body, route, status', [
+    ('POST', '/group', {'main_diag': 'J18.900'}, 'POST /group', 200),
+    ('POST', '/group', b'{bad json', 'POST /group', 400),
+    ('POST', '/group', {'other_diags': []}, 'POST /group', 400),
+    ('POST', '/group/batch', {'cases': [['J18.900'], {'main_diag': 'I10.x00'}]}, 'POST /group/batch', 200),
+    ('POST', '/group/batch', {'items': []}, 'POST /group/batch', 400),
+    ('POST', '/group/batch', {'cases': [['J18.900'], {}]}, 'POST /group/batch', 400),
+    ('GET', '/health', b'', 'GET /health', 200),
+    ('GET', '/stats', b'', 'GET /stats', 200),
+    ('GET', '/cc?prefix=n18', b'', 'GET /cc?prefix', 200),
+    ('GET', '/cc?prefix=', b'', 'GET /cc?prefix', 400),
+    ('GET', '/cc?prefix=N&limit=x', b'', 'GET /cc?prefix', 400),
+    ('GET', '/cc/n18.500?main_diag=J18.900', b'', 'GET /cc/{code}', 200),
+    ('GET', '/adrg/ES2', b'', 'GET /adrg/{adrg}', 200),
+    ('GET', '/adrg/XX9', b'', 'GET /adrg/{adrg}', 404),
+    ('GET', '/adrg/ES1/opers', b'', 'GET /adrg/{adrg}/opers', 200),
+    ('GET', '/adrg/XX9/opers', b'', 'GET /adrg/{adrg}/opers', 404),
+    ('GET', '/codes/j18.900x001', b'', 'GET /codes/{code}', 200),
+    ('GET', '/except/diag/r69.x00', b'', 'GET /except/diag/{code}', 200),
+    ('GET', '/except/other/R69.x00', b'', UNKNOWN_ROUTE, 404),
+    ('GET', '/adrg/ES1/unknown_pool', b'', UNKNOWN_ROUTE, 404),
+    ('POST', '/adrg/ES2', b'', UNKNOWN_ROUTE, 405),
+    ('POST', '/health', b'', UNKNOWN_ROUTE, 404),
+    ('PUT', '/cc/N18.500', b'', UNKNOWN_ROUTE, 405),
+    ('DELETE', '/nothing/here', b'', UNKNOWN_ROUTE, 404),
+    ('GET', '/', b'', UNKNOWN_ROUTE, 404),
+])
+def test_dispatch(app, method, target, body, route, status):
+    got_route, got_status, payload = dispatch(app, method, target, body)
+    assert (got_route, got_status) == (route, status)
+    assert ('error' in payload) == (status != 200)
+
+
+def test_responses(app):
+    assert dispatch(app, 'POST', '/group', {'main_diag': 'J18.900', 'other_diags': ['E11.900']})[2] == \
+        {'mdc': 'MDCE', 'adrg': 'ES2', 'drg': 'ES23', 'ccl': 1, 'weight': 1.0, 'status': 'ok'}
+    assert dispatch(app, 'GET', '/cc/n18.500?main_diag=J18.900')[2] == \
+        {'code': 'N18.500', 'tb': 'T2', 'cctype': 'MCC', 'ccl': 2, 'main_diag': 'J18.900', 'effective_ccl': 0}
+    code = dispatch(app, 'GET', '/codes/j18.900x001')[2]
+    assert (code['code'], code['tables'], code['ancestor']) == ('J18.900x001', [], 'J18.900')
+    assert dispatch(app, 'GET', '/except/diag/r69.x00')[2] == {'code': 'R69.x00', 'excepted': True, 'name': '疾病'}
+
+
+def test_batch_matches_single(app, monkeypatch):
+    # 超过 INLINE_MAX_CASES 且没有进程池时分块分组
+    monkeypatch.setattr(server, 'INLINE_MAX_CASES', 4)
+    monkeypatch.setattr(server, 'INLINE_CHUNK_SIZE', 3)
+    cases = [[main_diag, others] for main_diag in ('J18.900', 'I10.x00', 'Z99.999') for others in ([], ['N18.500'])]
+    results = dispatch(app, 'POST', '/group/batch', {'cases': cases})[2]['results']
+    assert results == [dispatch(app, 'POST', '/group', {'main_diag': m, 'other_diags': o})[2] for m, o in cases]
+
+
+def test_batch_limit(app, monkeypatch):
+    monkeypatch.setattr(server, 'MAX_BATCH_CASES', 3)
+    assert dispatch(app, 'POST', '/group/batch', {'cases': [['J18.900']] * 3})[1] == 200
+    assert dispatch(app, 'POST', '/group/batch', {'cases': [['J18.900']] * 4})[1] == 413
+
+
+async def _exchange(app, request):
+    """起一个临时服务，发送原始请求字节，返回 [(状态码, 响应对象), ...]（直到服务端关闭连接）"""
+    listener = await asyncio.start_server(app.handle_connection, '127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        await writer.drain()
+        responses = []
+        while True:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except asyncio.IncompleteReadError:
+                break
+            lines = head.decode('latin-1').split('\r\n')
+            headers = dict(line.lower().split(': ', 1) for line in lines[1:] if line)
+            body = await reader.readexactly(int(headers['content-length']))
+            responses.append((int(lines[0].split(' ')[1]), json.loads(body)))
+            if headers['connection'] == 'close':
+                break
+        writer.close()
+        return responses
+    finally:
+        listener.close()
+        await listener.wait_closed()
+
+
+def exchange(app, request):
+    return asyncio.run(_exchange(app, request))
+
+
+def test_http_keep_alive(app):
+    body = json.dumps({'main_diag': 'J18.900'}).encode('utf-8')
+    request = (b'GET /health HTTP/1.1\r\nHost: x\r\n\r\n'
+               b'POST /group HTTP/1.1\r\nContent-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body +
+               b'GET /cc/E11.900 HTTP/1.1\r\nConnection: close\r\n\r\n')
+    responses = exchange(app, request)
+    assert [status for status, _ in responses] == [200, 200, 200]
+    assert responses[1][1]['drg'] == 'ES25'
+    assert responses[2][1]['ccl'] == 1
+
+
+@pytest.mark.parametrize('request_bytes, status', [
+    (b'GARBAGE\r\n\r\n', 400),                                                  # 请求行不完整
+    (b'POST /group HTTP/1.1\r\nContent-Length: abc\r\n\r\n', 400),
+    (b'POST /group HTTP/1.1\r\nContent-Length: -5\r\n\r\n', 400),
+    (b'POST /group HTTP/1.1\r\nContent-Length: %d\r\n\r\n' % (server.MAX_BODY_BYTES + 1), 413),
+    (b'POST /group HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n', 411),
+    (b'POST /group HTTP/1.1\r\nContent-Length: 5\r\nConnection: close\r\n\r\n{bad}', 400),
+    (b'GET /no/such/path HTTP/1.0\r\n\r\n', 404),
+])
+def test_http_validation(app, request_bytes, status):
+    responses = exchange(app, request_bytes)
+    assert len(responses) == 1
+    assert responses[0][0] == status
+    assert 'error' in responses[0][1]
+
+
+def test_unknown_routes_share_one_stats_entry(app):
+    request = b''.join(b'GET /bogus/%d HTTP/1.1\r\n\r\n' % i for i in range(20))
+    request += b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n'
+    assert len(exchange(app, request)) == 21
+    assert sorted(app.stats) == ['GET /health', UNKNOWN_ROUTE]
+    assert app.stats[UNKNOWN_ROUTE].to_dict()['count'] == 20
\ No newline at end of file
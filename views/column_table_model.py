@@ -0,0 +1,291 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from views.search_index import SearchIndex, COLUMN_SEPARATOR, column_texts, normalize_query
+
+# 过滤输入停顿多久(毫秒)后才执行过滤
+FILTER_DELAY_MS = 150
+# 行数达到该值的表格在数据载入后空闲时预先建立检索索引，第一次过滤不必等待
+INDEX_WARMUP_ROWS = 10000
+# 空闲时每次加入检索索引的行数，分段建立，界面不会长时间无响应
+INDEX_WARMUP_STEP = 5000
+
+
+def index_texts(columns, filter_columns, start=0, stop=None):
+    """第 start 行起（到 stop 行前）各行的检索文本（参与过滤的列用 COLUMN_SEPARATOR 拼接）"""
+    texts = [column_texts(columns[i][start:stop]) for i in filter_columns]
+    if len(texts) == 1:
+        return texts[0]
+    return map(COLUMN_SEPARATOR.join, zip(*texts))
+
+
+class PreparedColumns:
+    """
+    预先整理好的列数据，可以在后台线程中生成（不涉及 Qt 对象），
+    界面线程用 ColumnTableModel.set_prepared() 直接挂到模型上。
+    行数较多时同时建好检索索引，第一次过滤也不必等待。
+    """
+
+    def __init__(self, rows, columns, filter_columns=None):
+        rows = rows if isinstance(rows, (list, tuple)) else list(rows)
+        self.columns = [[row[i] for row in rows] for i in columns]
+        self.row_count = len(rows)
+        self.filter_columns = tuple(filter_columns) if filter_columns is not None else tuple(range(len(self.columns)))
+        self.search_index = None
+        if self.row_count >= INDEX_WARMUP_ROWS:
+            self.search_index = SearchIndex(index_texts(self.columns, self.filter_columns))
+
+
+class ColumnTableModel(QAbstractTableModel):
+    """
+    按列存储的只读表格模型
+
+    每列保存为一个值列表，不为单元格创建 QStandardItem，
+    视图只对可见单元格调用 data() 时才生成显示文本。
+    也可以用 set_source() 接一个分批数据源，按 Qt 的 fetchMore 协议滚动时再继续读取。
+    set_filter() 通过 SearchIndex 做子串过滤，行号参数(value、row_values)均指过滤后显示的行。
+    """
+
+    def __init__(self, headers, parent=None, alignment=None, cell_style=None, filter_columns=None):
+        super().__init__(parent)
+        self._headers = list(headers)
+        self._columns = [[] for _ in self._headers]
+        self._row_count = 0
+        self._placeholder = False
+        # 单元格对齐方式，None 为默认
+        self._alignment = alignment
+        # cell_style(column, value) -> (背景色, 前景色) 或 None
+        self._cell_style = cell_style
+        # 分批数据源：每次 next() 返回一批行元组，读完后置为 None
+        self._batches = None
+        self._source_columns = None
+        self._draining = False
+        # 过滤：参与过滤的列(默认全部)、当前过滤文本、显示行对应的原始行号(None 表示不过滤)
+        self._filter_columns = tuple(filter_columns) if filter_columns is not None else tuple(range(len(self._headers)))
+        self._filter_text = ''
+        self._visible = None
+        self._search_index = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._row_count if self._visible is None else len(self._visible)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            if 0 <= section < len(self._headers):
+                return self._headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row() if self._visible is None else self._visible[index.row()]
+        value = self._columns[index.column()][row]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return "" if value is None else str(value)
+        if role == Qt.ItemDataRole.UserRole:
+            return value
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            if self._placeholder:
+                return Qt.AlignmentFlag.AlignCenter
+            return self._alignment
+        if self._cell_style is not None and role in (Qt.ItemDataRole.BackgroundRole,
+                                                     Qt.ItemDataRole.ForegroundRole):
+            style = self._cell_style(index.column(), value)
+            if style is not None:
+                return style[0] if role == Qt.ItemDataRole.BackgroundRole else style[1]
+        return None
+
+    def set_rows(self, rows, columns=None):
+        """
+        用行数据整体替换模型内容。
+        columns 为每个显示列取自行元组的下标，默认按顺序取前几列。
+        """
+        if columns is None:
+            columns = range(len(self._headers))
+        rows = rows if isinstance(rows, (list, tuple)) else list(rows)
+        self.beginResetModel()
+        self._columns = [[row[i] for row in rows] for i in columns]
+        self._row_count = len(rows)
+        self._placeholder = False
+        self._batches = None
+        self._search_index = None
+        self._visible = self._match(self._filter_text) if self._filter_text else None
+        self.endResetModel()
+        if self._search_index is None and self._row_count >= INDEX_WARMUP_ROWS:
+            QTimer.singleShot(0, self._warm_index)
+
+    def set_prepared(self, prepared):
+        """挂上 PreparedColumns 准备好的数据（参与过滤的列须与本模型一致，否则索引作废重建）"""
+        self.beginResetModel()
+        self._columns = prepared.columns
+        self._row_count = prepared.row_count
+        self._placeholder = False
+        self._batches = None
+        self._search_index = prepared.search_index if prepared.filter_columns == self._filter_columns else None
+        self._visible = self._match(self._filter_text) if self._filter_text else None
+        self.endResetModel()
+        if self._search_index is None and self._row_count >= INDEX_WARMUP_ROWS:
+            QTimer.singleShot(0, self._warm_index)
+
+    def set_source(self, batches, columns=None):
+        """
+        使用分批数据源，立即读取第一批，其余在视图滚动或过滤时继续读取。
+        batches 为可迭代对象，每项是一批行元组。
+        """
+        self.set_rows([])
+        self._batches = iter(batches)
+        self._source_columns = tuple(columns) if columns is not None else tuple(range(len(self._headers)))
+        self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._batches is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._batches is None:
+            return
+        try:
+            rows = next(self._batches)
+        except StopIteration:
+            self._batches = None
+            return
+        except Exception as e:
+            self._batches = None
+            print(f"分批读取数据时出错: {str(e)}")
+            return
+        if not rows:
+            return
+        start = self._row_count
+        if self._visible is None:
+            self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        for column, i in zip(self._columns, self._source_columns):
+            column.extend(row[i] for row in rows)
+        self._row_count += len(rows)
+        if self._visible is None:
+            self.endInsertRows()
+            return
+        # 过滤中：只在新读入的行里匹配，追加到显示行末尾
+        new_rows = self._sync_index()
+        matched = self._search_index.search(self._filter_text, new_rows)
+        if matched:
+            first = len(self._visible)
+            self.beginInsertRows(QModelIndex(), first, first + len(matched) - 1)
+            self._visible.extend(matched)
+            self.endInsertRows()
+
+    def fetch_remaining(self):
+        """在事件循环空闲时逐批读完剩余数据（过滤时需要全部数据）"""
+        if self._batches is not None and not self._draining:
+            self._draining = True
+            QTimer.singleShot(0, self._fetch_next_batch)
+
+    def _fetch_next_batch(self):
+        if self._batches is None:
+            self._draining = False
+            return
+        self.fetchMore(QModelIndex())
+        QTimer.singleShot(0, self._fetch_next_batch)
+
+    def set_filter(self, text):
+        """
+        只显示任一过滤列包含 text 的行（不区分大小写），空文本显示全部。
+        新文本包含上一次的过滤文本时（继续输入），只在上一次的结果里收窄。
+        分批数据源会在后台读完，新读入的行随到随过滤。
+        """
+        query = normalize_query(text)
+        if query == self._filter_text:
+            return
+        if self._placeholder:
+            self._filter_text = query
+            return
+        within = None
+        if self._visible is not None and self._filter_text and self._filter_text in query:
+            within = self._visible
+        self.beginResetModel()
+        self._visible = self._match(query, within) if query else None
+        self._filter_text = query
+        self.endResetModel()
+        if query:
+            self.fetch_remaining()
+
+    def build_search_index(self):
+        """立即建好（或补齐）全部已读入行的检索索引，之后第一次过滤不必等待；返回新加入的行数"""
+        if self._placeholder:
+            return 0
+        return len(self._sync_index())
+
+    def _match(self, query, within=None):
+        self._sync_index()
+        return self._search_index.search(query, within)
+
+    def _sync_index(self):
+        """检索索引在第一次过滤时才建立，之后只追加新读入的行；返回新加入的行号范围"""
+        if self._search_index is None:
+            self._search_index = SearchIndex()
+        index = self._search_index
+        return index.extend(index_texts(self._columns, self._filter_columns, len(index)))
+
+    def _warm_index(self):
+        """空闲时分段建立检索索引，每次 INDEX_WARMUP_STEP 行，没建完时再排下一段"""
+        if self._placeholder or self._row_count < INDEX_WARMUP_ROWS:
+            return
+        if self._search_index is None:
+            self._search_index = SearchIndex()
+        index = self._search_index
+        start = len(index)
+        if start >= self._row_count:
+            return
+        index.extend(index_texts(self._columns, self._filter_columns, start, start + INDEX_WARMUP_STEP))
+        if len(index) < self._row_count:
+            QTimer.singleShot(0, self._warm_index)
+
+    def set_placeholder(self, text):
+        """显示一行居中的提示文字（如“无数据”），提示行不参与过滤"""
+        self.set_rows([(text,) + ("",) * (len(self._headers) - 1)])
+        self.beginResetModel()
+        self._visible = None
+        self._search_index = None
+        self._placeholder = True
+        self.endResetModel()
+
+    def clear(self):
+        self.set_rows([])
+
+    def value(self, row, column):
+        """取显示行的原始值"""
+        return self._columns[column][self.source_row(row)]
+
+    def row_values(self, row):
+        row = self.source_row(row)
+        return tuple(col[row] for col in self._columns)
+
+    def source_row(self, row):
+        """显示行对应的原始行号"""
+        return row if self._visible is None else self._visible[row]
+
+    def total_row_count(self):
+        """不计过滤的全部行数"""
+        return self._row_count
+
+
+def connect_filter(line_edit, on_filter, delay=FILTER_DELAY_MS):
+    """
+    输入框文本变化后停顿 delay 毫秒才调用 on_filter(text)，
+    连续输入时不会每个字符都过滤一次；清空输入框时立即调用。
+    """
+    timer = QTimer(line_edit)
+    timer.setSingleShot(True)
+    timer.setInterval(delay)
+    timer.timeout.connect(lambda: on_filter(line_edit.text()))
+
+    def on_text_changed(text):
+        if text:
+            timer.start()
+        else:
+            timer.stop()
+            on_filter(text)
+
+    line_edit.textChanged.connect(on_text_changed)
+    return timer
\ No newline at end of file
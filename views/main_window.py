@@ -1,21 +1,29 @@
-import os
-from PySide6.QtWidgets import QMainWindow,QListWidget,QTabWidget,QStatusBar
-from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import Qt
-from views.w_cc_query import w_cc_query
-from views.w_adrg import w_adrg
-from views.w_except import w_except
-from views.w_group_query import w_group_query
+import importlib
+import time
+from PySide6.QtWidgets import QMainWindow,QListWidget,QTabWidget,QStatusBar,QLabel,QApplication
+from PySide6.QtCore import Qt,QTimer
+from controllers import startup_timing
+from models import query_timing
+from views.ui_loader import load_ui
+from views.prefetch import Prefetcher, is_prefetch_enabled, view_task
+
+# 菜单项 -> (模块, 类)。各功能模块（连同 SQLAlchemy 和模型）在首次打开时才导入，主窗口先显示出来
+FUNCTIONS = {
+    "并发症查询": ("views.w_cc_query", "w_cc_query"),
+    "ADRG查询": ("views.w_adrg", "w_adrg"),
+    "不应编码诊断与手术": ("views.w_except", "w_except"),
+    "入组查询": ("views.w_group_query", "w_group_query"),
+    "版本对比": ("views.w_compare", "w_compare"),
+}
+# 主窗口显示后空闲时按此顺序在后台预读的标签页（并发症查询按输入查询，无需预读）
+PREFETCH_ORDER = ("ADRG查询", "入组查询", "不应编码诊断与手术")
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         
-        # 动态加载 UI 文件
-        ui_path = os.path.join(os.path.dirname(__file__), '../ui/main_window.ui')
-        
-        loader = QUiLoader()
-        self.ui = loader.load(ui_path)
+        # 加载 UI（优先使用预编译的界面类）
+        self.ui = load_ui('main_window')
         self.setCentralWidget(self.ui)
         self.listWidgetMenu = self.ui.findChild(QListWidget, "listWidgetMenu")
         self.tabWidget = self.ui.findChild(QTabWidget,"tabWidget")
@@ -31,12 +39,16 @@ class MainWindow(QMainWindow):
         self.setup_ui()
 
         # 存储标签页引用
-        self.function_tabs = {
-            "并发症查询": None,
-            "ADRG查询": None,
-            "不应编码诊断与手术": None,
-            "入组查询": None
-        }
+        self.function_tabs = {name: None for name in FUNCTIONS}
+
+        self.prefetcher = Prefetcher(self)
+        for name in PREFETCH_ORDER:
+            self.prefetcher.add(name, view_task(*FUNCTIONS[name]))
+
+    def start_prefetch(self):
+        """主窗口显示后开始空闲预读"""
+        if is_prefetch_enabled():
+            self.prefetcher.start()
     
     def setup_connections(self):
         """连接信号和槽"""
@@ -47,10 +59,22 @@ class MainWindow(QMainWindow):
         """初始化 UI 设置"""
         self.setWindowTitle("chs-drg 2.0")
         self.statusbar.showMessage("就绪")
+
+        # 开启了 SQL 计时时，在状态栏右侧定时显示统计摘要
+        if query_timing.is_enabled():
+            self.setup_timing_label()
         
         # 设置标签页样式
         self.setup_tab_style()
     
+    def setup_timing_label(self):
+        """状态栏 SQL 计时摘要，每 2 秒刷新"""
+        self.timing_label = QLabel(query_timing.summary())
+        self.statusbar.addPermanentWidget(self.timing_label)
+        self.timing_timer = QTimer(self)
+        self.timing_timer.timeout.connect(lambda: self.timing_label.setText(query_timing.summary()))
+        self.timing_timer.start(2000)
+
     def setup_tab_style(self):
         """设置标签页样式"""
         # 设置标签页较小
@@ -81,102 +105,47 @@ class MainWindow(QMainWindow):
     def on_menu_item_clicked(self, item):
         """菜单项点击事件"""
         function_name = item.text()
-        
-        if function_name == "并发症查询":
-            self.open_function1()
-        elif function_name == "ADRG查询":
-            self.open_function2()
-        elif function_name == "不应编码诊断与手术":
-            self.open_function3()
-        elif function_name == "入组查询":
-            self.open_function4()
-    
-    def open_function1(self):
-        """打开功能1标签页"""
-        # 如果标签页已经存在，则激活它
-        if self.function_tabs["并发症查询"] is not None:
-            index = self.tabWidget.indexOf(self.function_tabs["并发症查询"])
-            if index >= 0:
-                self.tabWidget.setCurrentIndex(index)
-                return
-            else:
-                # 标签页不存在了，清理引用
-                self.function_tabs["并发症查询"] = None
-        
-        # 创建新的功能窗口
-        function_widget = w_cc_query()
-        
-        # 添加到标签页
-        index = self.tabWidget.addTab(function_widget, "并发症查询")
-        self.tabWidget.setCurrentIndex(index)
-        
-        # 保存引用
-        self.function_tabs["并发症查询"] = function_widget
-        self.statusbar.showMessage("并发症查询")
-    
-    def open_function2(self):
-        """打开ADRG查询2标签页"""
-        # 如果标签页已经存在，则激活它
-        if self.function_tabs["ADRG查询"] is not None:
-            index = self.tabWidget.indexOf(self.function_tabs["ADRG查询"])
-            if index >= 0:
-                self.tabWidget.setCurrentIndex(index)
-                return
-            else:
-                # 标签页不存在了，清理引用
-                self.function_tabs["ADRG查询"] = None
-        
-        # 创建新的功能窗口
-        function_widget = w_adrg()
-        
-        # 添加到标签页
-        index = self.tabWidget.addTab(function_widget, "ADRG查询")
-        self.tabWidget.setCurrentIndex(index)
-        
-        # 保存引用
-        self.function_tabs["ADRG查询"] = function_widget
-        self.statusbar.showMessage("已打开ADRG查询")
-    
-    def open_function3(self):
-        """打开功能3标签页"""
-        # 如果标签页已经存在，则激活它
-        if self.function_tabs["不应编码诊断与手术"] is not None:
-            index = self.tabWidget.indexOf(self.function_tabs["不应编码诊断与手术"])
-            if index >= 0:
-                self.tabWidget.setCurrentIndex(index)
-                return
-            else:
-                # 标签页不存在了，清理引用
-                self.function_tabs["不应编码诊断与手术"] = None
-        
-        # 创建新的功能窗口
-        function_widget = w_except()  # 替换为实际的功能窗口类
-        
-        # 添加到标签页
-        index = self.tabWidget.addTab(function_widget, "不应编码诊断与手术")
-        self.tabWidget.setCurrentIndex(index)
-        
-        # 保存引用
-        self.function_tabs["不应编码诊断与手术"] = function_widget
-        self.statusbar.showMessage("已打开不应编码诊断与手术")
+        if function_name in FUNCTIONS:
+            self.open_function(function_name)
 
-    def open_function4(self):
-        """打开功能4标签页"""
-        if self.function_tabs["入组查询"] is not None:
-            index = self.tabWidget.indexOf(self.function_tabs["入组查询"])
+    def open_function(self, function_name):
+        """打开功能标签页"""
+        # 如果标签页已经存在，则激活它
+        if self.function_tabs[function_name] is not None:
+            index = self.tabWidget.indexOf(self.function_tabs[function_name])
             if index >= 0:
                 self.tabWidget.setCurrentIndex(index)
                 return
             else:
                 # 标签页不存在了，清理引用
-                self.function_tabs["不应编码诊断与手术"] = None
+                self.function_tabs[function_name] = None
 
-        function_widget = w_group_query()  # 替换为实际的功能窗口类
+        # 创建新的功能窗口（首次打开时导入模块）
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            start = time.perf_counter()
+            # 已预读的标签页直接挂上准备好的数据，未完成的预读取消
+            prefetched = self.prefetcher.take(function_name)
+            module_name, class_name = FUNCTIONS[function_name]
+            widget_class = getattr(importlib.import_module(module_name), class_name)
+            imported = time.perf_counter()
+            function_widget = widget_class(prefetched=prefetched) if prefetched is not None else widget_class()
+            created = time.perf_counter()
+        finally:
+            QApplication.restoreOverrideCursor()
+        startup_timing.record(f"导入{function_name}", (imported - start) * 1000)
+        startup_timing.record(f"创建{function_name}", (created - imported) * 1000)
+        if startup_timing.is_enabled():
+            print(f"打开{function_name}{'（已预读）' if prefetched is not None else ''}: "
+                  f"导入 {(imported - start) * 1000:.1f} ms, 创建 {(created - imported) * 1000:.1f} ms")
 
-        index = self.tabWidget.addTab(function_widget, "入组查询")
+        # 添加到标签页
+        index = self.tabWidget.addTab(function_widget, function_name)
         self.tabWidget.setCurrentIndex(index)
-        self.function_tabs["入组查询"] = function_widget
-        self.statusbar.showMessage("已打开入组查询")
+
+        # 保存引用
+        self.function_tabs[function_name] = function_widget
+        self.statusbar.showMessage(f"已打开{function_name}")
 
     def on_tab_close_requested(self, index):
         """标签页关闭请求事件"""
@@ -0,0 +1,171 @@
+import importlib
+import os
+import time
+from PySide6.QtCore import QObject, QEvent, QThreadPool, QTimer, Signal
+from PySide6.QtWidgets import QApplication
+from views.query_worker import QueryWorker
+
+# 环境变量 CHSDRG_PREFETCH=0 关闭空闲预读（内存紧张的机器）
+PREFETCH_ENV = 'CHSDRG_PREFETCH'
+# 主窗口显示后多久开始预读(毫秒)
+START_DELAY_MS = 300
+# 最后一次键盘/鼠标操作后空闲多久才继续预读(毫秒)
+IDLE_DELAY_MS = 800
+
+# 视为用户正在操作的事件
+ACTIVITY_EVENTS = (
+    QEvent.Type.KeyPress,
+    QEvent.Type.MouseButtonPress,
+    QEvent.Type.MouseButtonDblClick,
+    QEvent.Type.Wheel,
+)
+
+
+def is_prefetch_enabled(environ=None):
+    environ = os.environ if environ is None else environ
+    return environ.get(PREFETCH_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def view_task(module_name, class_name):
+    """
+    预读一个功能标签页：先在后台导入模块（连同 SQLAlchemy 和模型），
+    再执行该类的 prefetch() 生成器，其返回值在打开标签页时传给构造函数
+    """
+    def task():
+        module = importlib.import_module(module_name)
+        yield
+        return (yield from getattr(module, class_name).prefetch())
+    return task
+
+
+def _advance(generator):
+    """在工作线程中执行任务的一步，返回 (是否完成, 任务结果)"""
+    try:
+        next(generator)
+        return False, None
+    except StopIteration as stop:
+        return True, stop.value
+
+
+class Prefetcher(QObject):
+    """
+    空闲时在后台线程按优先级依次预读各标签页的数据
+
+    每个任务是一个生成器，每次 yield 为一步，步与步之间检查用户是否在操作：
+    最近 IDLE_DELAY_MS 内有键盘或鼠标操作就暂停，空闲后从下一步继续。
+    结果由 take(名称) 取走；标签页在预读完成前被打开时，该任务取消，由标签页自己读取。
+    """
+    ready = Signal(str)   # 某个任务已完成
+
+    def __init__(self, parent=None, idle_delay=IDLE_DELAY_MS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.idle_delay = idle_delay
+        self.tasks = []          # [(名称, 任务函数)]，按优先级排列
+        self.results = {}
+        self.generation = 0
+        self.last_activity = 0.0
+        self._current = None     # (名称, 生成器)
+        self._running = False
+        self._watching = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._step)
+
+    def add(self, name, task):
+        self.tasks.append((name, task))
+
+    def start(self, delay=START_DELAY_MS):
+        if not self.tasks:
+            return
+        if not self._watching:
+            # 只在预读期间监视输入事件，预读完成后移除
+            QApplication.instance().installEventFilter(self)
+            self._watching = True
+        self.timer.start(delay)
+
+    def stop(self):
+        """放弃全部未完成的任务"""
+        self.generation += 1
+        self.pool.clear()
+        self.tasks.clear()
+        self._current = None
+        self._running = False
+        self.timer.stop()
+        self._unwatch()
+
+    def take(self, name):
+        """取走预读结果；尚未完成时取消该任务并返回 None"""
+        if name in self.results:
+            return self.results.pop(name)
+        self.tasks = [(n, task) for n, task in self.tasks if n != name]
+        if self._current is not None and self._current[0] == name:
+            # 正在执行的一步结果到达后丢弃，接着执行下一个任务
+            self.generation += 1
+            self._current = None
+            self._running = False
+            self.timer.start(0)
+        return None
+
+    def is_active(self):
+        return self._current is not None or bool(self.tasks)
+
+    def eventFilter(self, obj, event):
+        if event.type() in ACTIVITY_EVENTS:
+            self.last_activity = time.monotonic()
+        return False
+
+    def _unwatch(self):
+        if self._watching:
+            QApplication.instance().removeEventFilter(self)
+            self._watching = False
+
+    def _idle_remaining(self):
+        """距可以继续预读还有多少毫秒，0 表示用户已空闲"""
+        elapsed = (time.monotonic() - self.last_activity) * 1000
+        return max(0, int(self.idle_delay - elapsed))
+
+    def _is_current(self, generation):
+        return generation == self.generation
+
+    def _step(self):
+        if self._running:
+            return
+        remaining = self._idle_remaining()
+        if remaining:
+            # 用户正在操作，暂停到空闲后再继续
+            self.timer.start(remaining)
+            return
+        if self._current is None:
+            if not self.tasks:
+                self._unwatch()
+                return
+            name, task = self.tasks.pop(0)
+            self._current = (name, task())
+        self._running = True
+        worker = QueryWorker(self.generation, _advance, self._current[1], is_current=self._is_current)
+        worker.signals.finished.connect(self._on_step_finished)
+        worker.signals.failed.connect(self._on_step_failed)
+        self.pool.start(worker)
+
+    def _on_step_finished(self, generation, result):
+        if generation != self.generation:
+            return
+        self._running = False
+        done, value = result
+        if done:
+            name = self._current[0]
+            self._current = None
+            self.results[name] = value
+            print(f"已预读: {name}")
+            self.ready.emit(name)
+        self.timer.start(0)
+
+    def _on_step_failed(self, generation, message):
+        if generation != self.generation:
+            return
+        print(f"预读 {self._current[0]} 时出错: {message}")
+        self._running = False
+        self._current = None
+        self.timer.start(0)
\ No newline at end of file
@@ -0,0 +1,34 @@
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+
+class WorkerSignals(QObject):
+    """后台查询的结果信号，在界面线程中接收"""
+    finished = Signal(int, object)  # (代号, 查询结果)
+    failed = Signal(int, str)       # (代号, 错误信息)
+
+
+class QueryWorker(QRunnable):
+    """
+    在线程池中执行一次查询
+
+    每个请求带一个递增的代号（generation），is_current(generation) 返回 False
+    表示已有更新的请求：尚未开始的查询直接放弃，已完成的结果由接收方按代号丢弃。
+    """
+
+    def __init__(self, generation, fn, *args, is_current=None):
+        super().__init__()
+        self.generation = generation
+        self.fn = fn
+        self.args = args
+        self.is_current = is_current
+        self.signals = WorkerSignals()
+
+    def run(self):
+        if self.is_current is not None and not self.is_current(self.generation):
+            return
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.signals.finished.emit(self.generation, result)
\ No newline at end of file
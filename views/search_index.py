@@ -0,0 +1,78 @@
+from array import array
+from operator import add
+
+# 列与列、行与行之间的分隔符（ASCII 单元/记录分隔符），保证匹配不会跨列跨行
+COLUMN_SEPARATOR = '\x1f'
+ROW_SEPARATOR = '\x1e'
+
+
+def normalize_query(text):
+    """过滤文本统一转小写（与原来的不区分大小写过滤一致）"""
+    if not text:
+        return ''
+    return text.replace(COLUMN_SEPARATOR, '').replace(ROW_SEPARATOR, '').lower()
+
+
+def column_texts(values):
+    """把一列值转成检索用文本（大小写在加入索引时统一转换），各列再用 COLUMN_SEPARATOR 拼成行文本"""
+    return [v if type(v) is str else '' if v is None else str(v) for v in values]
+
+
+class SearchIndex:
+    """
+    表格行的子串检索索引
+
+    全部行的小写检索文本按行保存，加入行时即为每个单字和二元组(相邻两个字符)建好倒排表
+    (包含它的行号，升序)，第一次输入也不必现算。
+    单字、两个字的查询直接返回倒排表；更长的查询取各二元组中最短的倒排表作为候选，再逐行确认子串匹配。
+    行只能追加（对应分批读取），倒排表随之增量更新。
+    """
+
+    def __init__(self, texts=()):
+        self._texts = []
+        self._grams = {}
+        self.extend(texts)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def extend(self, texts):
+        """追加行文本，返回新增行的行号范围"""
+        start = len(self._texts)
+        texts = list(texts)
+        if not texts:
+            return range(start, start)
+        # 整批一次转小写再切开，比逐行调用 lower() 快
+        new_texts = ROW_SEPARATOR.join(texts).lower().split(ROW_SEPARATOR)
+        self._texts.extend(new_texts)
+        grams = self._grams
+        for row, text in enumerate(new_texts, start):
+            for gram in {*text, *map(add, text, text[1:])}:
+                rows = grams.get(gram)
+                if rows is None:
+                    rows = grams[gram] = array('I')
+                rows.append(row)
+        return range(start, len(self._texts))
+
+    def postings(self, gram):
+        """包含 gram（单字或二元组）的全部行号（升序）"""
+        return self._grams.get(gram, ())
+
+    def search(self, query, within=None):
+        """
+        返回检索文本包含 query 的行号列表（升序）。
+        within 为候选行号（如上一次较短查询的结果），只在其中确认，
+        用于输入追加字符时在上次结果上继续收窄。
+        """
+        query = normalize_query(query)
+        texts = self._texts
+        if not query:
+            return list(within) if within is not None else list(range(len(texts)))
+
+        if within is None:
+            # 取查询串各二元组中最短的倒排表作为候选
+            grams = self._grams
+            within = min((grams.get(query[i:i + 2], ()) for i in range(max(len(query) - 1, 1))), key=len)
+            if len(query) <= 2:
+                return list(within)
+        return [row for row in within if query in texts[row]]
\ No newline at end of file
@@ -0,0 +1,43 @@
+import importlib
+import os
+from PySide6 import QtWidgets
+
+UI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ui')
+
+
+def compiled_path(name):
+    """build_ui.py 生成的预编译模块 ui/ui_<name>.py"""
+    return os.path.join(UI_DIR, f'ui_{name}.py')
+
+
+def _compiled_module(name, ui_path):
+    """预编译模块存在且不比 .ui 文件旧时返回该模块，否则返回 None"""
+    path = compiled_path(name)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(ui_path):
+            print(f"{os.path.basename(path)} 比 {name}.ui 旧，改用运行时加载（请重新运行 build_ui.py）")
+            return None
+    except OSError:
+        return None
+    try:
+        return importlib.import_module(f'ui.ui_{name}')
+    except ImportError as e:
+        print(f"导入预编译界面 ui_{name} 失败，改用运行时加载: {e}")
+        return None
+
+
+def load_ui(name):
+    """
+    加载 ui/<name>.ui 定义的界面，返回顶层部件（与 QUiLoader().load 的结果相同，子部件可用 findChild 查找）
+
+    优先使用预编译的界面类，省去运行时解析 XML；没有预编译模块时退回 QUiLoader。
+    """
+    ui_path = os.path.join(UI_DIR, f'{name}.ui')
+    module = _compiled_module(name, ui_path)
+    if module is None:
+        from PySide6.QtUiTools import QUiLoader
+        return QUiLoader().load(ui_path)
+    widget = getattr(QtWidgets, module.UI_BASE_CLASS)()
+    form = module.UI_CLASS()
+    form.setupUi(widget)
+    return widget
\ No newline at end of file
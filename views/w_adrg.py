@@ -1,24 +1,16 @@
-import os
 from PySide6.QtWidgets import QWidget, QMessageBox, QHeaderView,QTableView,QLineEdit,QHBoxLayout
-from PySide6.QtGui import QStandardItemModel, QStandardItem
-from PySide6.QtCore import Qt,QSortFilterProxyModel
-from PySide6.QtUiTools import QUiLoader
-from sqlalchemy import text
-from sqlalchemy.orm import Session
-from models.adrg_model import ADRG
-from models.database import SessionLocal
-from models.mdcdiagpool_model import mdcdiagpool
-from models.drgsgroup_model import DrgsGroup
-from models.maindiagindex_model import MainDiagIndex
-from models.mainsurgeryindex_model import MainSurgeryIndex
-from models.otherdiagindex_model import OtherDiagIndex
+from PySide6.QtCore import Qt,QThreadPool
+from views.ui_loader import load_ui
+from engine.snapshot import get_snapshot
+from engine.lookup_cache import get_lookup
+from views.column_table_model import ColumnTableModel, PreparedColumns, connect_filter
+from views.query_worker import QueryWorker
 
 class w_adrg(QWidget):
-    def __init__(self):
+    def __init__(self, prefetched=None):
         super().__init__()
-        loader = QUiLoader()
-        ui_path = os.path.join(os.path.dirname(__file__), '../ui/adrg.ui')
-        self.ui = loader.load(ui_path)
+        # 加载 UI（优先使用预编译的界面类）
+        self.ui = load_ui('adrg')
 
         layout = QHBoxLayout()
         layout.addWidget(self.ui)
@@ -44,11 +36,16 @@ class w_adrg(QWidget):
         self.AdrgOperPool.setEditTriggers(QTableView.NoEditTriggers)
         self.MdcDiagPool.setEditTriggers(QTableView.NoEditTriggers)
 
+        # 联动查询放到后台线程，只保留最新一次选择的结果
+        self.query_pool = QThreadPool(self)
+        self.query_pool.setMaxThreadCount(1)
+        self.query_generation = 0
+
         self.setup_ui()
         self.setup_table_models()
         self.setup_filter_connections()
         self.setup_selection_connections()
-        self.query_adrg()
+        self.query_adrg(prefetched)
 
     def setup_ui(self):
         """初始化 UI 设置"""
@@ -60,14 +57,8 @@ class w_adrg(QWidget):
         self.filterOtherDiag.setPlaceholderText("输入关键字过滤ADRG次池中所有列...")
 
     def setup_table_models(self):
-        self.adrg_model = QStandardItemModel()
-        self.adrg_model.setHorizontalHeaderLabels(['ADRG代码', 'ADRG名称', '内外科'])
-
-        # 新增：创建代理模型用于过滤
-        self.adrg_proxy_model = QSortFilterProxyModel()
-        self.adrg_proxy_model.setSourceModel(self.adrg_model)
-        self.adrg_proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.AdrgTable.setModel(self.adrg_proxy_model)
+        self.adrg_model = ColumnTableModel(['ADRG代码', 'ADRG名称', '内外科'], alignment=Qt.AlignmentFlag.AlignCenter)
+        self.AdrgTable.setModel(self.adrg_model)
 
         # 其他表格模型
         self.setup_drg_table_model()
@@ -80,97 +71,75 @@ class w_adrg(QWidget):
 
     def setup_drg_table_model(self):
         """设置DRG表格模型"""
-        self.drgsgroup_model = QStandardItemModel()
-        self.drgsgroup_model.setHorizontalHeaderLabels(['DRG组', '名称','判定主诊','判定主手','判定次诊','特殊判定','特殊规则','权重'])
+        self.drgsgroup_model = ColumnTableModel(['DRG组', '名称','判定主诊','判定主手','判定次诊','特殊判定','特殊规则','权重'], alignment=Qt.AlignmentFlag.AlignCenter)
         self.DrgTable.setModel(self.drgsgroup_model)
 
     def setup_mdc_diag_pool_model(self):
         """设置MDC诊断池表格模型"""
-        self.mdcdiagpool_model = QStandardItemModel()
-        self.mdcdiagpool_model.setHorizontalHeaderLabels(['MDC','诊断编码', '诊断名称', '损伤部位'])
-        self.proxy_mdcdiagpool_model = QSortFilterProxyModel()
-        self.proxy_mdcdiagpool_model.setSourceModel(self.mdcdiagpool_model)
-        self.proxy_mdcdiagpool_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.MdcDiagPool.setModel(self.proxy_mdcdiagpool_model)
+        self.mdcdiagpool_model = ColumnTableModel(['MDC','诊断编码', '诊断名称', '损伤部位'], alignment=Qt.AlignmentFlag.AlignCenter)
+        self.MdcDiagPool.setModel(self.mdcdiagpool_model)
 
     def setup_adrg_diag_pool_model(self):
         """设置ADRG诊断池表格模型"""
-        self.maindiagindex_model = QStandardItemModel()
-        self.maindiagindex_model.setHorizontalHeaderLabels(['ADRG','诊断编码', '诊断名称','组别序号'])
-        self.proxy_maindiagindex_model = QSortFilterProxyModel()
-        self.proxy_maindiagindex_model.setSourceModel(self.maindiagindex_model)
-        self.proxy_maindiagindex_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.AdrgDiagPool.setModel(self.proxy_maindiagindex_model)
+        self.maindiagindex_model = ColumnTableModel(['ADRG','诊断编码', '诊断名称','组别序号'], alignment=Qt.AlignmentFlag.AlignCenter)
+        self.AdrgDiagPool.setModel(self.maindiagindex_model)
 
     def setup_adrg_oper_pool_model(self):
         """设置ADRG手术池表格模型"""
-        self.mainsurgeryindex_model = QStandardItemModel()
-        self.mainsurgeryindex_model.setHorizontalHeaderLabels(['ADRG','手术编码', '手术名称','组别序号'])
-        self.proxy_mainsurgeryindex_model = QSortFilterProxyModel()
-        self.proxy_mainsurgeryindex_model.setSourceModel(self.mainsurgeryindex_model)
-        self.proxy_mainsurgeryindex_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.AdrgOperPool.setModel(self.proxy_mainsurgeryindex_model)
+        self.mainsurgeryindex_model = ColumnTableModel(['ADRG','手术编码', '手术名称','组别序号'], alignment=Qt.AlignmentFlag.AlignCenter)
+        self.AdrgOperPool.setModel(self.mainsurgeryindex_model)
 
     def setup_adrg_other_diag_pool_model(self):
         """设置ADRG其他诊断池表格模型"""
-        self.otherdiagindex_model = QStandardItemModel()
-        self.otherdiagindex_model.setHorizontalHeaderLabels(['ADRG','诊断编码', '诊断名称','组别序号'])
-        self.proxy_otherdiagindex_model = QSortFilterProxyModel()
-        self.proxy_otherdiagindex_model.setSourceModel(self.otherdiagindex_model)
-        self.proxy_otherdiagindex_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.OtherDiagPool.setModel(self.proxy_otherdiagindex_model)
+        self.otherdiagindex_model = ColumnTableModel(['ADRG','诊断编码', '诊断名称','组别序号'], alignment=Qt.AlignmentFlag.AlignCenter)
+        self.OtherDiagPool.setModel(self.otherdiagindex_model)
 
     def setup_filter_connections(self):
-        """设置过滤信号连接"""
+        """设置过滤信号连接（输入停顿后才过滤）"""
         # ADRG过滤
-        self.filterAdrg.textChanged.connect(self.filter_adrg_table)
-        self.filterMdcDiag.textChanged.connect(self.filter_mdc_diag_table)
-        self.filterAdrgDiag.textChanged.connect(self.filter_adrg_diag_pool_table)
-        self.filterAdrgOper.textChanged.connect(self.filter_adrg_oper_pool_table)
-        self.filterOtherDiag.textChanged.connect(self.filter_other_diag_pool_table)
+        connect_filter(self.filterAdrg, self.filter_adrg_table)
+        connect_filter(self.filterMdcDiag, self.filter_mdc_diag_table)
+        connect_filter(self.filterAdrgDiag, self.filter_adrg_diag_pool_table)
+        connect_filter(self.filterAdrgOper, self.filter_adrg_oper_pool_table)
+        connect_filter(self.filterOtherDiag, self.filter_other_diag_pool_table)
     
     def filter_other_diag_pool_table(self, text):
         """过滤ADRG其他诊断池表格"""
         try:
-            # 设置过滤模式 - 在所有列中搜索
-            self.proxy_otherdiagindex_model.setFilterKeyColumn(-1)  # -1 表示搜索所有列
-            self.proxy_otherdiagindex_model.setFilterFixedString(text)
+            # 在所有列中检索
+            self.otherdiagindex_model.set_filter(text)
         except Exception as e:
             print(f"过滤ADRG其他诊断池表格时出错: {str(e)}")
 
     def filter_adrg_diag_pool_table(self, text):
         """过滤ADRG诊断池表格"""
         try:
-            # 设置过滤模式 - 在所有列中搜索
-            self.proxy_maindiagindex_model.setFilterKeyColumn(-1)  # -1 表示搜索所有列
-            self.proxy_maindiagindex_model.setFilterFixedString(text)
+            # 在所有列中检索
+            self.maindiagindex_model.set_filter(text)
         except Exception as e:
             print(f"过滤ADRG诊断池表格时出错: {str(e)}")
 
     def filter_adrg_oper_pool_table(self, text):
         """过滤ADRG手术池表格"""
         try:
-            # 设置过滤模式 - 在所有列中搜索
-            self.proxy_mainsurgeryindex_model.setFilterKeyColumn(-1)  # -1 表示搜索所有列
-            self.proxy_mainsurgeryindex_model.setFilterFixedString(text)
+            # 在所有列中检索
+            self.mainsurgeryindex_model.set_filter(text)
         except Exception as e:
             print(f"过滤ADRG手术池表格时出错: {str(e)}")
 
     def filter_adrg_table(self, text):
         """过滤ADRG表格"""
         try:
-            # 设置过滤模式 - 在所有列中搜索
-            self.adrg_proxy_model.setFilterKeyColumn(-1)  # -1 表示搜索所有列
-            self.adrg_proxy_model.setFilterFixedString(text)
+            # 在所有列中检索
+            self.adrg_model.set_filter(text)
         except Exception as e:
             print(f"过滤ADRG表格时出错: {str(e)}")
     
     def filter_mdc_diag_table(self, text):
         """过滤MDC诊断池表格"""
         try:
-            # 设置过滤模式 - 在所有列中搜索
-            self.proxy_mdcdiagpool_model.setFilterKeyColumn(-1)  # -1 表示搜索所有列
-            self.proxy_mdcdiagpool_model.setFilterFixedString(text)
+            # 在所有列中检索
+            self.mdcdiagpool_model.set_filter(text)
         except Exception as e:
             print(f"过滤MDC诊断池表格时出错: {str(e)}")
 
@@ -207,33 +176,25 @@ class w_adrg(QWidget):
         self.AdrgOperPool.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
         self.OtherDiagPool.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
 
-    def query_adrg(self):
+    @staticmethod
+    def prefetch():
+        """空闲时在后台线程预读（见 views.prefetch）：加载规则快照，整理ADRG表格数据"""
+        snapshot = get_snapshot()
+        yield
+        return PreparedColumns(snapshot.adrgs(), (0, 1, 3))
+
+    def query_adrg(self, prefetched=None):
         """执行ADRG查询并显示结果"""
         try:
-            # 清空现有数据
-            self.adrg_model.removeRows(0, self.adrg_model.rowCount())
-            
-            # 从数据库查询ADRG数据
-            session = SessionLocal()
+            # 从规则快照读取ADRG数据（代码、名称、内外科），已预读时直接使用
             try:
-                adrg_list = session.query(ADRG).all()
-                
-                # 填充数据到表格
-                for adrg in adrg_list:
-                    row = [
-                        QStandardItem(adrg.AdrgCode or ""),
-                        QStandardItem(adrg.AdrgName or ""),
-                        QStandardItem(adrg.Dept or "")
-                    ]
-                    # 设置文本对齐方式
-                    for item in row:
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    
-                    self.adrg_model.appendRow(row)
+                if prefetched is not None:
+                    self.adrg_model.set_prepared(prefetched)
+                else:
+                    self.adrg_model.set_rows(get_snapshot().adrgs(), columns=(0, 1, 3))
             except Exception as e:
+                self.adrg_model.clear()
                 QMessageBox.critical(self, "查询错误", f"查询ADRG数据时出错: {str(e)}")
-            finally:
-                session.close()
                 
         except Exception as e:
             QMessageBox.critical(self, "系统错误", f"系统错误: {str(e)}")
@@ -245,22 +206,15 @@ class w_adrg(QWidget):
     def on_adrg_selection_changed(self, selected, deselected):
         """ADRG表格选择变化事件"""
         try:
-            # 获取当前选中的行（在代理模型中的索引）
+            # 获取当前选中的行
             selected_indexes = self.AdrgTable.selectionModel().selectedRows()
             
             if selected_indexes:
-                # 获取第一个选中的行（在代理模型中的索引）
-                proxy_index = selected_indexes[0]
-                
-                # 转换为源模型索引
-                source_index = self.adrg_proxy_model.mapToSource(proxy_index)
-                
-                # 获取ADRG代码（第一列）
-                adrg_code_item = self.adrg_model.item(source_index.row(), 0)
+                # 获取ADRG代码（第一列，按过滤后显示的行取值）
+                adrg_code = self.adrg_model.value(selected_indexes[0].row(), 0)
                 
-                if adrg_code_item:
-                    adrg_code = adrg_code_item.text().strip()
-                    self.query_related_data(adrg_code)
+                if adrg_code:
+                    self.query_related_data(str(adrg_code).strip())
             else:
                 # 没有选中行时清空其他表格
                 self.clear_related_tables()
@@ -269,216 +223,118 @@ class w_adrg(QWidget):
             print(f"处理选择变化时出错: {str(e)}")
     
     def query_related_data(self, adrg_code):
-        """根据ADRG代码查询相关数据"""
+        """根据ADRG代码在后台查询相关数据"""
         try:
-            session = SessionLocal()
-            try:
-                # 查询DRG细分组数据
-                self.query_drg_data(session, adrg_code)
-                
-                # 查询MDC诊断池数据
-                self.query_mdc_diag_data(session, adrg_code)
-                
-                # 查询ADRG诊断池数据
-                self.query_adrg_diag_data(session, adrg_code)
+            # 新的选择使之前的请求作废：未开始的直接移出队列，已在执行的结果到达后丢弃
+            self.query_generation += 1
+            self.query_pool.clear()
+
+            worker = QueryWorker(self.query_generation, self.load_related_data, adrg_code,
+                                 is_current=self.is_current_query)
+            worker.signals.finished.connect(self.on_related_data_loaded)
+            worker.signals.failed.connect(self.on_related_data_failed)
+            self.query_pool.start(worker)
                 
-                # 查询ADRG手术池数据
-                self.query_adrg_oper_data(session, adrg_code)
-
-                # 查询ADRG其他诊断池数据
-                self.query_adrg_other_diag_data(session, adrg_code)
-                
-            except Exception as e:
-                QMessageBox.critical(self, "查询错误", f"查询相关数据时出错: {str(e)}")
-            finally:
-                session.close()
-                
-        except Exception as e:
-            QMessageBox.critical(self, "系统错误", f"系统错误: {str(e)}")
-
-    def query_adrg_other_diag_data(self, session, adrg_code):
-        """查询ADRG其他诊断池数据"""
-        try:
-            self.otherdiagindex_model.removeRows(0, self.otherdiagindex_model.rowCount())
-            try:
-                other_diag_list = session.query(OtherDiagIndex).filter(OtherDiagIndex.acode == adrg_code).all()
-                
-                # 填充数据到表格
-                for diag in other_diag_list:
-                    row = [
-                        QStandardItem(diag.acode or ""), 
-                        QStandardItem(diag.diagcode or ""), 
-                        QStandardItem(diag.diagname or ""),   
-                        QStandardItem(str(diag.grpno) if diag.grpno is not None else "")
-                    ]
-                    # 设置文本对齐方式
-                    for item in row:
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    
-                    self.otherdiagindex_model.appendRow(row)
-                    
-            except Exception as e:
-                QMessageBox.critical(self, "查询错误", f"查询ADRG其他诊断池数据时出错: {str(e)}")
-                # 注意：这里不要关闭session，因为session是在外部统一管理的
         except Exception as e:
             QMessageBox.critical(self, "系统错误", f"系统错误: {str(e)}")
 
-    def query_adrg_oper_data(self, session, adrg_code):
-        """查询ADRG手术池数据"""
+    def is_current_query(self, generation):
+        """是否仍是最新一次选择（工作线程中调用，只读比较）"""
+        return generation == self.query_generation
+
+    @staticmethod
+    def load_related_data(adrg_code):
+        """在工作线程中执行：读取五个联动表格的数据（按键缓存），不访问任何界面对象"""
+        lookup = get_lookup()
+        MDC = "MDC"+adrg_code[0:1]
+        return {
+            'drg': w_adrg.format_drg_rows(lookup.drgs_of(adrg_code)),
+            'mdc_diag': lookup.mdc_diags(MDC),
+            'adrg_diag': lookup.main_diags_of(adrg_code),
+            'adrg_oper': lookup.opers_of(adrg_code),
+            'other_diag': lookup.other_diags_of(adrg_code),
+        }
+
+    def on_related_data_loaded(self, generation, data):
+        """后台查询完成，过期的结果直接丢弃"""
+        if generation != self.query_generation:
+            return
         try:
-            self.mainsurgeryindex_model.removeRows(0, self.mainsurgeryindex_model.rowCount())
-            try:
-                oper_list = session.query(MainSurgeryIndex).filter(MainSurgeryIndex.acode == adrg_code).all()
-                
-                # 填充数据到表格
-                for oper in oper_list:
-                    row = [
-                        QStandardItem(oper.acode or ""), 
-                        QStandardItem(oper.opercode or ""), 
-                        QStandardItem(oper.opername or ""),   
-                        QStandardItem(str(oper.grpno) if oper.grpno is not None else "")
-                    ]
-                    # 设置文本对齐方式
-                    for item in row:
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    
-                    self.mainsurgeryindex_model.appendRow(row)
-                    
-            except Exception as e:
-                QMessageBox.critical(self, "查询错误", f"查询ADRG手术池数据时出错: {str(e)}")
-                # 注意：这里不要关闭session，因为session是在外部统一管理的
+            self.drgsgroup_model.set_rows(data['drg'])
+            self.mdcdiagpool_model.set_rows(data['mdc_diag'])
+            self.maindiagindex_model.set_rows(data['adrg_diag'])
+            self.mainsurgeryindex_model.set_rows(data['adrg_oper'])
+            self.otherdiagindex_model.set_rows(data['other_diag'])
         except Exception as e:
             QMessageBox.critical(self, "系统错误", f"系统错误: {str(e)}")
 
-    def query_adrg_diag_data(self, session, adrg_code):
-        """查询ADRG诊断池数据"""
-        try:
-            self.maindiagindex_model.removeRows(0, self.maindiagindex_model.rowCount())
-            try:
-                diag_list = session.query(MainDiagIndex).filter(MainDiagIndex.acode == adrg_code).all()
-                
-                # 填充数据到表格
-                for diag in diag_list:
-                    row = [
-                        QStandardItem(diag.acode or ""), 
-                        QStandardItem(diag.diagcode or ""), 
-                        QStandardItem(diag.diagname or ""),
-                        QStandardItem(str(diag.grpno) if diag.grpno is not None else "")
-                    ]
-                    # 设置文本对齐方式
-                    for item in row:
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    
-                    self.maindiagindex_model.appendRow(row)
-                    
-            except Exception as e:
-                QMessageBox.critical(self, "查询错误", f"查询ADRG诊断池数据时出错: {str(e)}")
-                # 注意：这里不要关闭session，因为session是在外部统一管理的
-        except Exception as e:
-            QMessageBox.critical(self, "系统错误", f"系统错误: {str(e)}")
+    def on_related_data_failed(self, generation, message):
+        """后台查询出错"""
+        if generation != self.query_generation:
+            return
+        self.clear_related_tables()
+        QMessageBox.critical(self, "查询错误", f"查询相关数据时出错: {message}")
+
+    @staticmethod
+    def format_drg_rows(drg_list):
+        """DRG细分组数据转换为表格显示的行"""
+        rows = []
+        for grpcode, grpname, iszz, iscz, isop, rule, paycw, _ in drg_list:
+            if iszz and iszz == 1:
+                iszz_text = "是"
+            else:
+                iszz_text = "否"    
 
-    def query_mdc_diag_data(self,session, adrg_code):
-        """查询MDC诊断池数据"""
-        try:
-            self.mdcdiagpool_model.removeRows(0, self.mdcdiagpool_model.rowCount())
-            try:
-                MDC = "MDC"+adrg_code[0:1]
-                mdc_diag_list = session.query(mdcdiagpool).filter(mdcdiagpool.mdccode == MDC).all()
-                
-                # 填充数据到表格
-                for diag in mdc_diag_list:
-                    row = [
-                        QStandardItem(diag.mdccode or ""), 
-                        QStandardItem(diag.diagcode or ""), 
-                        QStandardItem(diag.diagname or ""),   
-                        QStandardItem(diag.submdc or "")
-                    ]
-                    # 设置文本对齐方式
-                    for item in row:
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    
-                    self.mdcdiagpool_model.appendRow(row)
-                    
-            except Exception as e:
-                QMessageBox.critical(self, "查询错误", f"查询MDC诊断池数据时出错: {str(e)}")
-                # 注意：这里不要关闭session，因为session是在外部统一管理的
-        except Exception as e:
-            QMessageBox.critical(self, "系统错误", f"系统错误: {str(e)}")
+            if isop and isop.strip() == "1":
+                isop_text = "是"    
+            else:
+                isop_text = "否"
+            
+            if rule != None and rule.strip() != "":
+                needmop_text = "是" 
+            else:
+                needmop_text = "否"
+            
+            if iscz and iscz == 1:
+                iscz_text = "是"
+            else:
+                iscz_text = "否"
 
-    def query_drg_data(self, session, adrg_code):
-        """查询DRG细分组数据"""
-        try:
-            self.drgsgroup_model.removeRows(0, self.drgsgroup_model.rowCount())
-          
-            try:
-                drg_list = session.query(DrgsGroup).filter(DrgsGroup.acode == adrg_code).all()
-                
-                # 填充数据到表格
-                for drg in drg_list:  # 这里应该是drg，不是drg_list
-                    if drg.iszz and drg.iszz == 1:
-                        iszz_text = "是"
-                    else:
-                        iszz_text = "否"    
-
-                    if drg.isop and drg.isop.strip() == "1":
-                        isop_text = "是"    
-                    else:
-                        isop_text = "否"
-                    
-                    if drg.rule != None and drg.rule.strip() != "":
-                        needmop_text = "是" 
-                    else:
-                        needmop_text = "否"
-                    
-                    if drg.iscz and drg.iscz == 1:
-                        iscz_text = "是"
-                    else:
-                        iscz_text = "否"
-
-                    row = [
-                        QStandardItem(drg.grpcode or ""), 
-                        QStandardItem(drg.grpname or ""), 
-                        QStandardItem(iszz_text or ""),   
-                        QStandardItem(isop_text or ""),
-                        QStandardItem(iscz_text or ""),
-                        QStandardItem(needmop_text or ""),
-                        QStandardItem(drg.rule or ""),
-                        QStandardItem(str(drg.paycw) if drg.paycw is not None else "")
-                    ]
-                    # 设置文本对齐方式
-                    for item in row:
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    
-                    self.drgsgroup_model.appendRow(row)
-                    
-            except Exception as e:
-                QMessageBox.critical(self, "查询错误", f"查询细分组数据时出错: {str(e)}")
-            # 注意：这里不要关闭session，因为session是在外部统一管理的
-        except Exception as e:
-            QMessageBox.critical(self, "系统错误", f"系统错误: {str(e)}")
+            rows.append((grpcode, grpname, iszz_text, isop_text, iscz_text, needmop_text, rule, paycw))
+        return rows
 
     def clear_related_tables(self):
         """清空所有相关表格的数据"""
         try:
+            # 作废尚未返回的后台查询
+            self.query_generation += 1
+            self.query_pool.clear()
+
             # 清空DRG表格
             if hasattr(self, 'drgsgroup_model'):
-                self.drgsgroup_model.removeRows(0, self.drgsgroup_model.rowCount())
+                self.drgsgroup_model.clear()
             
             # 清空MDC诊断池表格
             if hasattr(self, 'mdcdiagpool_model'):
-                self.mdcdiagpool_model.removeRows(0, self.mdcdiagpool_model.rowCount())
+                self.mdcdiagpool_model.clear()
             
             # 清空ADRG诊断池表格
             if hasattr(self, 'maindiagindex_model'):
-                self.maindiagindex_model.removeRows(0, self.maindiagindex_model.rowCount())
+                self.maindiagindex_model.clear()
             
             # 清空ADRG手术池表格
             if hasattr(self, 'mainsurgeryindex_model'):
-                self.mainsurgeryindex_model.removeRows(0, self.mainsurgeryindex_model.rowCount())
+                self.mainsurgeryindex_model.clear()
             
             # 清空ADRG其他诊断池表格
             if hasattr(self, 'otherdiagindex_model'):
-                self.otherdiagindex_model.removeRows(0, self.otherdiagindex_model.rowCount())
+                self.otherdiagindex_model.clear()
                 
         except Exception as e:
-            print(f"清空相关表格时出错: {str(e)}")
\ No newline at end of file
+            print(f"清空相关表格时出错: {str(e)}")
+
+    def closeEvent(self, event):
+        """窗口关闭时作废后台查询"""
+        self.query_generation += 1
+        self.query_pool.clear()
+        super().closeEvent(event)
\ No newline at end of file
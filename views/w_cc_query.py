@@ -1,21 +1,17 @@
-import os
 from PySide6.QtWidgets import QWidget, QMessageBox, QHeaderView,QTableView,QPushButton,QLineEdit,QHBoxLayout
-from PySide6.QtGui import QStandardItemModel, QStandardItem
-from PySide6.QtCore import Qt,QSortFilterProxyModel
-from PySide6.QtUiTools import QUiLoader
-from sqlalchemy import text
-from sqlalchemy.orm import Session
-from models.cc_model import CC
-from models.exclude_model import Exclude
-from models.database import SessionLocal
+from PySide6.QtGui import QColor
+from PySide6.QtCore import Qt
+from views.ui_loader import load_ui
+from engine.snapshot import get_snapshot
+from engine.code_index import normalize_code
+from engine.lookup_cache import get_lookup
+from views.column_table_model import ColumnTableModel, connect_filter
 
 class w_cc_query(QWidget):
     def __init__(self):
         super().__init__()
-        loader = QUiLoader()
-        # 动态加载 UI 文件
-        ui_path = os.path.join(os.path.dirname(__file__), '../ui/cc.ui')
-        self.ui = loader.load(ui_path)
+        # 加载 UI（优先使用预编译的界面类）
+        self.ui = load_ui('cc')
 
         # 设置布局
         layout = QHBoxLayout()
@@ -41,34 +37,27 @@ class w_cc_query(QWidget):
         """初始化 UI 设置"""
         self.setWindowTitle("功能1 - 并发症查询")
         self.queryButton.setText("查询")
-        self.inputBox.setPlaceholderText("请输入并发症编码查询...")
+        self.queryButton.hide()  # 输入即查询，不再需要查询按钮
+        self.inputBox.setPlaceholderText("输入并发症编码，按前缀实时查询...")
         self.filterBox.setPlaceholderText("输入主要诊断进行过滤...")
     
     def setup_connections(self):
         """连接信号和槽"""
-        self.queryButton.clicked.connect(self.on_query_clicked)
+        self.input_timer = connect_filter(self.inputBox, self.on_input_text_changed)
         self.inputBox.returnPressed.connect(self.on_query_clicked)
         self.ccView.selectionModel().selectionChanged.connect(self.on_cc_selection_changed)
-        self.filterBox.textChanged.connect(self.on_filter_text_changed)
+        connect_filter(self.filterBox, self.on_filter_text_changed)
 
     def setup_table_models(self):
         """初始化表格数据模型"""
         # 左侧表格模型 - 显示并发症信息
-        self.cc_model = QStandardItemModel()
-        self.cc_model.setHorizontalHeaderLabels(['诊断编码', '排除表', '并发症类型', 'CCL级别'])
+        self.cc_model = ColumnTableModel(['诊断编码', '排除表', '并发症类型', 'CCL级别'], cell_style=self.ccl_cell_style)
         self.ccView.setModel(self.cc_model)
         
         # 右侧表格模型 - 显示排除条件或其他相关信息
-        self.exclude_model = QStandardItemModel()
-        
-        # 新增：创建代理模型用于过滤
-        self.exclude_proxy_model = QSortFilterProxyModel()
-        self.exclude_proxy_model.setSourceModel(self.exclude_model)
-        self.exclude_proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)  # 不区分大小写
-        self.exclude_proxy_model.setFilterKeyColumn(1)  # 在第1列（主要诊断列）进行过滤
-        
-        self.exclude_model.setHorizontalHeaderLabels(['排除表', '主要诊断'])
-        self.excludeView.setModel(self.exclude_proxy_model) 
+        # 只在第1列（主要诊断列）进行过滤，不区分大小写
+        self.exclude_model = ColumnTableModel(['排除表', '主要诊断'], filter_columns=(1,))
+        self.excludeView.setModel(self.exclude_model) 
 
         # 设置表格属性
         self.setup_table_properties()
@@ -91,100 +80,71 @@ class w_cc_query(QWidget):
         """处理filterBox文本变化，实现过滤功能"""
         print(f"🔍 过滤文本变化: '{text}'")
         
-        # 设置过滤模式为正则表达式，支持更灵活的过滤
-        self.exclude_proxy_model.setFilterRegularExpression(text)
+        self.exclude_model.set_filter(text)
         
         # 显示过滤结果信息（可选）
-        filtered_count = self.exclude_proxy_model.rowCount()
-        total_count = self.exclude_model.rowCount()
+        filtered_count = self.exclude_model.rowCount()
+        total_count = self.exclude_model.total_row_count()
         print(f"📊 过滤结果: {filtered_count}/{total_count} 条记录")
 
+    def on_input_text_changed(self, text):
+        """输入停顿后按前缀查询，清空输入时清空表格"""
+        code = normalize_code(text)
+        if not code:
+            self.cc_model.clear()
+            self.clear_exclude_table()
+            return
+        self.perform_query(code)
+
     def on_query_clicked(self):
-        """查询按钮点击事件"""
-        code = self.inputBox.text().strip()
-        if len(code) < 3:
-            QMessageBox.warning(self, "输入错误", "请输入不小于三位数的并发症编码!")
+        """回车立即查询"""
+        self.input_timer.stop()  # 已立即查询，取消尚未触发的输入查询
+        code = normalize_code(self.inputBox.text())
+        if not code:
             return
         print(f"查询并发症: {code}")
-        self.perform_query(code)
+        if not self.perform_query(code):
+            QMessageBox.information(self, "查询结果", "未找到相关记录")
     
     def perform_query(self, code):
-        """执行数据库查询操作"""
-        db: Session = SessionLocal()
+        """
+        在规则快照的 CC 编码前缀索引中查询，一次查找同时得到精确匹配（排在最前）
+        和以该编码开头的全部记录。返回是否查到记录。
+        """
         try:
-            # 查询匹配的诊断编码
-            cc_records = db.query(CC).filter(CC.diagcode == code).all()
+            cc_records = get_snapshot().cc_prefix(code)
             
             if cc_records:
                 # 查询到记录，更新表格显示
                 self.display_query_results(cc_records)
-            else:
-                # 未找到记录，尝试模糊查询
-                self.try_fuzzy_query(db, code)
-                
-        except Exception as e:
-            QMessageBox.critical(self, "查询错误", f"查询过程中发生错误: {str(e)}")
-            print(f"Database error: {e}")
-            
-        finally:
-            db.close()
-    
-    def try_fuzzy_query(self, db: Session, code: str):
-        """尝试模糊查询"""
-        try:
-            # 使用like进行模糊查询
-            cc_records = db.query(CC).filter(CC.diagcode.like(f'{code}%')).all()
-            
-            if cc_records:
-                self.display_query_results(cc_records)
             else:
                 self.clear_table_views()
-                QMessageBox.information(self, "查询结果", "未找到相关记录")
+            return bool(cc_records)
                 
         except Exception as e:
-            QMessageBox.critical(self, "查询错误", f"模糊查询过程中发生错误: {str(e)}")
+            QMessageBox.critical(self, "查询错误", f"查询过程中发生错误: {str(e)}")
+            print(f"Query error: {e}")
+            return False
     
     def display_query_results(self, cc_records):
         """在表格中显示查询结果"""
-        # 清空现有数据
-        self.cc_model.removeRows(0, self.cc_model.rowCount())
-        self.exclude_model.removeRows(0, self.exclude_model.rowCount())
-        
         # 填充左侧表格 - 主要并发症信息
-        for record in cc_records:
-            self.add_cc_record_to_table(record)
+        self.cc_model.set_rows(cc_records)
+        self.exclude_model.clear()
         # 如果有数据，默认选择第一行
         # if cc_records:
         #     self.ccView.selectRow(0) 
     
-    def add_cc_record_to_table(self, record: CC):
-        """添加单个CC记录到左侧表格"""
-        row = self.cc_model.rowCount()
-        
-        # 诊断编码
-        diagcode_item = QStandardItem(record.diagcode or "")
-        diagcode_item.setData(record.diagcode, Qt.ItemDataRole.UserRole)  # 保存原始数据
-        
-        # TB字段
-        tb_item = QStandardItem(record.tb or "")
-        
-        # 并发症类型
-        cctype_item = QStandardItem(record.cctype or "")
-        
-        # CCL等级
-        ccl_item = QStandardItem(str(record.ccl) if record.ccl is not None else "")
-        
-        # 根据CCL等级设置不同的背景色
-        if record.ccl is not None:
-            if record.ccl == 2:
-                ccl_item.setBackground(Qt.GlobalColor.red)
-                ccl_item.setForeground(Qt.GlobalColor.white)
-            elif record.ccl == 1:
-                ccl_item.setBackground(Qt.GlobalColor.green)
-                ccl_item.setForeground(Qt.GlobalColor.black)
-        
-        # 添加到模型
-        self.cc_model.appendRow([diagcode_item, tb_item, cctype_item, ccl_item])
+    @staticmethod
+    def ccl_cell_style(column, value):
+        """根据CCL等级设置不同的背景色"""
+        if column != 3 or value is None:
+            return None
+        if value == 2:
+            return QColor(Qt.GlobalColor.red), QColor(Qt.GlobalColor.white)
+        if value == 1:
+            return QColor(Qt.GlobalColor.green), QColor(Qt.GlobalColor.black)
+        return None
     
     def on_cc_selection_changed(self, selected, deselected):
         """左侧表格选择变化事件"""
@@ -250,10 +210,9 @@ class w_cc_query(QWidget):
     
     def query_exclude_by_tb(self, tb_value):
         """根据tb值查询Exclude表"""
-        db: Session = SessionLocal()
         try:
-            # 查询Exclude表中匹配的记录
-            exclude_records = db.query(Exclude).filter(Exclude.tb == tb_value).all()
+            # 查询该排除表的记录（取自规则快照，数据库变化后在后台重新加载）
+            exclude_records = get_lookup().excludes_of(tb_value)
             
             # 更新右侧表格
             self.update_exclude_table(exclude_records)
@@ -263,52 +222,31 @@ class w_cc_query(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "查询错误", f"查询排除表时发生错误: {str(e)}")
             print(f"Exclude query error: {e}")
-            
-        finally:
-            db.close()  
     
     def update_exclude_table(self, exclude_records):
         """更新右侧排除表格"""
-        # 清空现有数据
-        self.exclude_model.removeRows(0, self.exclude_model.rowCount())
-        
         self.filterBox.clear()
 
         if exclude_records:
             # 填充排除数据
-            for record in exclude_records:
-                tb_item = QStandardItem(record.tb or "")
-                maindiag_item = QStandardItem(record.maindiag or "")
-                
-                self.exclude_model.appendRow([tb_item, maindiag_item])
+            self.exclude_model.set_rows(exclude_records)
         else:
             # 没有排除记录
-            no_data_item = QStandardItem("无排除数据")
-            no_data_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.exclude_model.appendRow([no_data_item, QStandardItem("")])    
+            self.exclude_model.set_placeholder("无排除数据")
     
     def clear_exclude_table(self):
         """清空右侧表格"""
-        self.exclude_model.removeRows(0, self.exclude_model.rowCount())
-        no_data_item = QStandardItem("请选择左侧行")
-        no_data_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.exclude_model.appendRow([no_data_item, QStandardItem("")])
+        self.exclude_model.set_placeholder("请选择左侧行")
 
         self.filterBox.clear()
     
     def clear_table_views(self):
         """清空表格显示"""
-        self.cc_model.removeRows(0, self.cc_model.rowCount())
-        self.exclude_model.removeRows(0, self.exclude_model.rowCount())
-        
         self.filterBox.clear()
 
         # 添加提示信息
-        no_data_item = QStandardItem("无数据")
-        no_data_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.cc_model.appendRow([no_data_item, QStandardItem(""), QStandardItem(""), QStandardItem("")])
-        
-        self.exclude_model.appendRow([QStandardItem("无"), QStandardItem("未找到匹配记录")])
+        self.cc_model.set_placeholder("无数据")
+        self.exclude_model.set_rows([("无", "未找到匹配记录")])
     
     def closeEvent(self, event):
         """窗口关闭事件，用于清理资源"""
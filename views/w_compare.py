@@ -0,0 +1,144 @@
+from PySide6.QtWidgets import QWidget, QMessageBox, QHeaderView, QTableView, QLineEdit, QPushButton, QLabel, QFileDialog, QHBoxLayout
+from PySide6.QtGui import QColor
+from PySide6.QtCore import QThreadPool
+from views.ui_loader import load_ui
+from engine.snapshot import default_db_path
+from engine.release_compare import ADDED, REMOVED, CHANGED, MOVED, ENTRY_HEADERS, compare_databases
+from views.column_table_model import ColumnTableModel, PreparedColumns, connect_filter
+from views.query_worker import QueryWorker
+
+# 变化类型 -> (背景色, 前景色)
+KIND_COLORS = {
+    ADDED: ('#d9f2d9', '#000000'),
+    REMOVED: ('#f8d7da', '#000000'),
+    CHANGED: ('#fff3cd', '#000000'),
+    MOVED: ('#d6e4f5', '#000000'),
+}
+
+class w_compare(QWidget):
+    def __init__(self):
+        super().__init__()
+        # 加载 UI（优先使用预编译的界面类）
+        self.ui = load_ui('compare')
+
+        layout = QHBoxLayout()
+        layout.addWidget(self.ui)
+        layout.setContentsMargins(0,0,0,0)
+        self.setLayout(layout)
+
+        # 查找控件
+        self.oldPath = self.ui.findChild(QLineEdit,"oldPath")
+        self.newPath = self.ui.findChild(QLineEdit,"newPath")
+        self.browseOld = self.ui.findChild(QPushButton,"browseOld")
+        self.browseNew = self.ui.findChild(QPushButton,"browseNew")
+        self.compareButton = self.ui.findChild(QPushButton,"compareButton")
+        self.summaryLabel = self.ui.findChild(QLabel,"summaryLabel")
+        self.filterBox = self.ui.findChild(QLineEdit,"filterBox")
+        self.resultView = self.ui.findChild(QTableView,"resultView")
+
+        self.resultView.setEditTriggers(QTableView.NoEditTriggers)
+
+        # 比较在后台线程中进行，只保留最新一次的结果
+        self.query_pool = QThreadPool(self)
+        self.query_pool.setMaxThreadCount(1)
+        self.query_generation = 0
+
+        self.setup_ui()
+        self.setup_table_models()
+        self.setup_connections()
+
+    def setup_ui(self):
+        """初始化 UI 设置"""
+        self.setWindowTitle("规则库版本对比")
+        self.oldPath.setPlaceholderText("选择旧版 GroupConfig.db")
+        self.newPath.setText(default_db_path())
+        self.filterBox.setPlaceholderText("输入编码、表名或变化类型进行过滤")
+
+    def setup_connections(self):
+        """连接信号和槽"""
+        self.browseOld.clicked.connect(lambda: self.choose_db(self.oldPath))
+        self.browseNew.clicked.connect(lambda: self.choose_db(self.newPath))
+        self.compareButton.clicked.connect(self.on_compare_clicked)
+        connect_filter(self.filterBox, self.on_filter_text_changed)
+
+    def setup_table_models(self):
+        """差异明细：按列存储的虚拟模型，只为可见单元格生成显示文本"""
+        self.result_model = ColumnTableModel(ENTRY_HEADERS, cell_style=self.kind_cell_style)
+        self.resultView.setModel(self.result_model)
+
+        header = self.resultView.horizontalHeader()
+        for column, width in enumerate((120, 60, 200, 100, 220)):
+            header.setSectionResizeMode(column, QHeaderView.ResizeMode.Interactive)
+            self.resultView.setColumnWidth(column, width)
+        header.setStretchLastSection(True)
+        self.resultView.setAlternatingRowColors(True)
+        self.resultView.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+
+    @staticmethod
+    def kind_cell_style(column, value):
+        """变化列按类型着色"""
+        if column != 1 or value not in KIND_COLORS:
+            return None
+        background, foreground = KIND_COLORS[value]
+        return QColor(background), QColor(foreground)
+
+    def choose_db(self, line_edit):
+        path, _ = QFileDialog.getOpenFileName(self, "选择规则库", line_edit.text(), "SQLite 数据库 (*.db);;所有文件 (*)")
+        if path:
+            line_edit.setText(path)
+
+    def on_filter_text_changed(self, text):
+        """处理过滤文本变化"""
+        self.result_model.set_filter(text)
+
+    def on_compare_clicked(self):
+        """在后台线程中加载两版规则并比较"""
+        old_path = self.oldPath.text().strip()
+        new_path = self.newPath.text().strip()
+        if not old_path or not new_path:
+            QMessageBox.information(self, "版本对比", "请先选择旧版和新版规则库")
+            return
+        self.query_generation += 1
+        self.query_pool.clear()
+        self.compareButton.setEnabled(False)
+        self.summaryLabel.setText("正在比较...")
+        worker = QueryWorker(self.query_generation, self.load_comparison, old_path, new_path,
+                             is_current=self.is_current_query)
+        worker.signals.finished.connect(self.on_comparison_loaded)
+        worker.signals.failed.connect(self.on_comparison_failed)
+        self.query_pool.start(worker)
+
+    def is_current_query(self, generation):
+        """是否仍是最新一次比较（工作线程中调用，只读比较）"""
+        return generation == self.query_generation
+
+    @staticmethod
+    def load_comparison(old_path, new_path):
+        """在工作线程中执行：比较两版规则库，整理好明细列数据和摘要，不访问任何界面对象"""
+        comparison = compare_databases(old_path, new_path)
+        parts = []
+        for table in comparison.tables.values():
+            counts = ", ".join(f"{kind}{count}" for kind, count in table.counts().items() if count)
+            if counts:
+                parts.append(f"{table.title}: {counts}")
+        summary = (f"共 {comparison.total():,} 处差异（{comparison.elapsed:.2f} 秒）  " + "；".join(parts)
+                   if parts else "两个版本的规则相同")
+        return PreparedColumns(list(comparison.entries()), range(len(ENTRY_HEADERS))), summary
+
+    def on_comparison_loaded(self, generation, data):
+        """后台比较完成，过期的结果直接丢弃"""
+        if generation != self.query_generation:
+            return
+        prepared, summary = data
+        self.compareButton.setEnabled(True)
+        self.result_model.set_prepared(prepared)
+        self.summaryLabel.setText(summary)
+        self.summaryLabel.setToolTip(summary)
+
+    def on_comparison_failed(self, generation, message):
+        """后台比较出错"""
+        if generation != self.query_generation:
+            return
+        self.compareButton.setEnabled(True)
+        self.summaryLabel.setText("")
+        QMessageBox.critical(self, "版本对比", f"比较规则库时出错: {message}")
\ No newline at end of file
@@ -1,21 +1,15 @@
-import os
 from PySide6.QtWidgets import QWidget, QMessageBox, QHeaderView,QTableView,QLineEdit,QVBoxLayout
-from PySide6.QtGui import QStandardItemModel, QStandardItem
-from PySide6.QtCore import Qt,QSortFilterProxyModel
-from PySide6.QtUiTools import QUiLoader
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from views.ui_loader import load_ui
 from models.exceptdiag_model import ExceptDiag
 from models.exceptoper_model import ExceptOper
-from models.database import SessionLocal
+from models.paging import iter_batches
+from views.column_table_model import ColumnTableModel, PreparedColumns, connect_filter
 
 class w_except(QWidget):
-    def __init__(self):
+    def __init__(self, prefetched=None):
         super().__init__()
-        loader = QUiLoader()
-        # 动态加载 UI 文件
-        ui_path = os.path.join(os.path.dirname(__file__), '../ui/except.ui')
-        self.ui = loader.load(ui_path)
+        # 加载 UI（优先使用预编译的界面类）
+        self.ui = load_ui('except')
         # 设置布局
         layout = QVBoxLayout()
         layout.addWidget(self.ui)
@@ -35,7 +29,7 @@ class w_except(QWidget):
         self.setup_ui()        
         self.setup_table_models()
         self.setup_filter_connections()
-        self.query_except()
+        self.query_except(prefetched)
 
     def setup_ui(self):
         """初始化 UI 设置"""
@@ -44,37 +38,27 @@ class w_except(QWidget):
         self.filterOper.setPlaceholderText("输入手术编码或名称进行过滤")
     
     def setup_filter_connections(self):
-        """设置过滤信号连接"""
-        self.filterDiag.textChanged.connect(self.on_filter_diag_text_changed)
-        self.filterOper.textChanged.connect(self.on_filter_oper_text_changed)
+        """设置过滤信号连接（输入停顿后才过滤）"""
+        connect_filter(self.filterDiag, self.on_filter_diag_text_changed)
+        connect_filter(self.filterOper, self.on_filter_oper_text_changed)
 
     def on_filter_diag_text_changed(self, text):
         """处理诊断过滤文本变化"""
-        self.proxy_exceptdiag_model.setFilterKeyColumn(-1)  # 过滤所有列
-        self.proxy_exceptdiag_model.setFilterFixedString(text)
+        self.exceptdiag_model.set_filter(text)  # 过滤所有列，未读完的数据后台逐批读入并过滤
 
     def on_filter_oper_text_changed(self, text):
         """处理手术过滤文本变化"""
-        self.proxy_exceptoper_model.setFilterKeyColumn(-1)  # 过滤所有列
-        self.proxy_exceptoper_model.setFilterFixedString(text)
+        self.exceptoper_model.set_filter(text)  # 过滤所有列，未读完的数据后台逐批读入并过滤
 
     def setup_table_models(self):
         """设置表格模型"""
         # 不应编码诊断模型
-        self.exceptdiag_model = QStandardItemModel()
-        self.exceptdiag_model.setHorizontalHeaderLabels(['诊断编码', '诊断名称'])
-        self.proxy_exceptdiag_model = QSortFilterProxyModel()
-        self.proxy_exceptdiag_model.setSourceModel(self.exceptdiag_model)
-        self.proxy_exceptdiag_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.ExceptDiag.setModel(self.proxy_exceptdiag_model)
+        self.exceptdiag_model = ColumnTableModel(['诊断编码', '诊断名称'])
+        self.ExceptDiag.setModel(self.exceptdiag_model)
 
         # 不应编码手术模型
-        self.exceptoper_model = QStandardItemModel()
-        self.exceptoper_model.setHorizontalHeaderLabels(['手术编码', '手术名称'])
-        self.proxy_exceptoper_model = QSortFilterProxyModel()
-        self.proxy_exceptoper_model.setSourceModel(self.exceptoper_model)
-        self.proxy_exceptoper_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.ExceptOper.setModel(self.proxy_exceptoper_model)
+        self.exceptoper_model = ColumnTableModel(['手术编码', '手术名称'])
+        self.ExceptOper.setModel(self.exceptoper_model)
 
         self.setup_table_properties()
     
@@ -96,28 +80,32 @@ class w_except(QWidget):
         self.ExceptDiag.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
         self.ExceptOper.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
 
-    def query_except(self):
+    @staticmethod
+    def prefetch():
+        """空闲时在后台线程预读（见 views.prefetch）：逐批读完两张表，每批之间可暂停"""
+        prepared = {}
+        for key, columns in (('diag', (ExceptDiag.diagcode, ExceptDiag.diagname)),
+                             ('oper', (ExceptOper.opercode, ExceptOper.opername))):
+            rows = []
+            for batch in iter_batches(columns):
+                rows.extend(batch)
+                yield
+            prepared[key] = PreparedColumns(rows, (0, 1))
+        return prepared
+
+    def query_except(self, prefetched=None):
         """查询不应编码诊断与手术数据"""
         try:
-            session = SessionLocal()
-
-            # 查询不应编码诊断数据
-            self.exceptdiag_model.removeRows(0, self.exceptdiag_model.rowCount())
-            except_diag_records = session.query(ExceptDiag).all()
-            for record in except_diag_records:
-                diag_code_item = QStandardItem(record.diagcode)
-                diag_name_item = QStandardItem(record.diagname)
-                self.exceptdiag_model.appendRow([diag_code_item, diag_name_item])
-
-            # 查询不应编码手术数据
-            self.exceptoper_model.removeRows(0, self.exceptoper_model.rowCount())
-            except_oper_records = session.query(ExceptOper).all()
-            for record in except_oper_records:
-                oper_code_item = QStandardItem(record.opercode)
-                oper_name_item = QStandardItem(record.opername)
-                self.exceptoper_model.appendRow([oper_code_item, oper_name_item])
+            if prefetched is not None:
+                self.exceptdiag_model.set_prepared(prefetched['diag'])
+                self.exceptoper_model.set_prepared(prefetched['oper'])
+                return
+
+            # 分页查询不应编码诊断数据，先显示第一屏，其余随滚动读取
+            self.exceptdiag_model.set_source(iter_batches((ExceptDiag.diagcode, ExceptDiag.diagname)))
+
+            # 分页查询不应编码手术数据
+            self.exceptoper_model.set_source(iter_batches((ExceptOper.opercode, ExceptOper.opername)))
 
         except Exception as e:
-            QMessageBox.critical(self, "查询错误", f"查询不应编码数据时出错: {str(e)}")
-        finally:
-            session.close()
\ No newline at end of file
+            QMessageBox.critical(self, "查询错误", f"查询不应编码数据时出错: {str(e)}")
\ No newline at end of file
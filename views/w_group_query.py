@@ -1,21 +1,16 @@
-import os
 from PySide6.QtWidgets import QWidget, QMessageBox, QHeaderView,QTableView,QHBoxLayout,QLineEdit,QToolButton
-from PySide6.QtGui import QStandardItemModel, QStandardItem
-from PySide6.QtCore import Qt,QSortFilterProxyModel
-from PySide6.QtUiTools  import QUiLoader
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from views.ui_loader import load_ui
 from models.maindiagindex_model import MainDiagIndex
 from models.mainsurgeryindex_model import MainSurgeryIndex
-from models.database import SessionLocal
+from models.paging import iter_batches
+from engine.snapshot import get_snapshot, is_snapshot_loaded
+from views.column_table_model import ColumnTableModel, PreparedColumns, connect_filter
 
 class w_group_query(QWidget):
-    def __init__(self):
+    def __init__(self, prefetched=None):
         super().__init__()
-        loader = QUiLoader()
-        # 动态加载 UI 文件
-        ui_path = os.path.join(os.path.dirname(__file__), '../ui/group_query.ui')
-        self.ui = loader.load(ui_path)
+        # 加载 UI（优先使用预编译的界面类）
+        self.ui = load_ui('group_query')
 
         layout = QHBoxLayout()
         layout.addWidget(self.ui)
@@ -35,7 +30,7 @@ class w_group_query(QWidget):
         self.setup_ui()
         self.setup_table_models()
         self.setup_filter_connections()
-        self.query_group()
+        self.query_group(prefetched)
 
     def setup_ui(self):
         """初始化 UI 设置"""
@@ -44,9 +39,9 @@ class w_group_query(QWidget):
         self.OperInput.setPlaceholderText("输入任意内容进行过滤")
     
     def setup_filter_connections(self):
-        """设置过滤信号连接"""
-        self.DiagInput.textChanged.connect(self.on_filter_diag_text_changed)
-        self.OperInput.textChanged.connect(self.on_filter_oper_text_changed)
+        """设置过滤信号连接（输入停顿后才过滤）"""
+        connect_filter(self.DiagInput, self.on_filter_diag_text_changed)
+        connect_filter(self.OperInput, self.on_filter_oper_text_changed)
 
         self.ClearDiag.clicked.connect(self.on_clear_diag)
         self.ClearOper.clicked.connect(self.on_clear_oper)
@@ -61,31 +56,21 @@ class w_group_query(QWidget):
 
     def on_filter_diag_text_changed(self, text):
         """处理诊断过滤文本变化"""
-        self.proxy_maindiagindex_model.setFilterKeyColumn(-1)  # 过滤所有列
-        self.proxy_maindiagindex_model.setFilterFixedString(text)
+        self.maindiagindex_model.set_filter(text)  # 过滤所有列，未读完的数据后台逐批读入并过滤
 
     def on_filter_oper_text_changed(self, text):
         """处理手术过滤文本变化"""
-        self.proxy_mainoperindex_model.setFilterKeyColumn(-1)  # 过滤所有列
-        self.proxy_mainoperindex_model.setFilterFixedString(text)
+        self.mainoperindex_model.set_filter(text)  # 过滤所有列，未读完的数据后台逐批读入并过滤
     
     def setup_table_models(self):
         """设置表格模型"""
         # 诊断索引模型
-        self.maindiagindex_model = QStandardItemModel()
-        self.maindiagindex_model.setHorizontalHeaderLabels(['诊断编码', '诊断名称', 'ADRG'])
-        self.proxy_maindiagindex_model = QSortFilterProxyModel()
-        self.proxy_maindiagindex_model.setSourceModel(self.maindiagindex_model)
-        self.proxy_maindiagindex_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.DiagView.setModel(self.proxy_maindiagindex_model)
+        self.maindiagindex_model = ColumnTableModel(['诊断编码', '诊断名称', 'ADRG'])
+        self.DiagView.setModel(self.maindiagindex_model)
 
         # 手术索引模型
-        self.mainoperindex_model = QStandardItemModel()
-        self.mainoperindex_model.setHorizontalHeaderLabels(['手术编码', '手术名称', 'ADRG'])
-        self.proxy_mainoperindex_model = QSortFilterProxyModel()
-        self.proxy_mainoperindex_model.setSourceModel(self.mainoperindex_model)
-        self.proxy_mainoperindex_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.OperView.setModel(self.proxy_mainoperindex_model)
+        self.mainoperindex_model = ColumnTableModel(['手术编码', '手术名称', 'ADRG'])
+        self.OperView.setModel(self.mainoperindex_model)
 
         self.setup_table_properties()
     
@@ -109,32 +94,35 @@ class w_group_query(QWidget):
         self.OperView.setColumnWidth(1, 280) 
         self.OperView.setColumnWidth(2, 50)
 
-    def query_group(self):
+    @staticmethod
+    def prefetch():
+        """空闲时在后台线程预读（见 views.prefetch）：整理诊断、手术索引的列数据并建好检索索引"""
+        snapshot = get_snapshot()
+        yield
+        diag = PreparedColumns(snapshot.main_diag_rows(), (1, 2, 0))
+        yield
+        oper = PreparedColumns(snapshot.main_oper_rows(), (1, 2, 0))
+        return {'diag': diag, 'oper': oper}
+
+    def query_group(self, prefetched=None):
         """查询 DRG 分组数据"""
-        session = SessionLocal()
         try:
-            # 查询诊断索引数据
-            diag_results = session.query(MainDiagIndex).all()
-            self.maindiagindex_model.setRowCount(0)  # 清空现有数据
-            for diag in diag_results:
-                items = [
-                    QStandardItem(diag.diagcode),
-                    QStandardItem(diag.diagname),
-                    QStandardItem(diag.acode)
-                ]
-                self.maindiagindex_model.appendRow(items)
-            
-            # 查询手术索引数据
-            oper_results = session.query(MainSurgeryIndex).all()
-            self.mainoperindex_model.setRowCount(0)  # 清空现有数据
-            for oper in oper_results:
-                items = [
-                    QStandardItem(oper.opercode),
-                    QStandardItem(oper.opername),
-                    QStandardItem(oper.acode)
-                ]
-                self.mainoperindex_model.appendRow(items)
+            if prefetched is not None:
+                self.maindiagindex_model.set_prepared(prefetched['diag'])
+                self.mainoperindex_model.set_prepared(prefetched['oper'])
+            elif is_snapshot_loaded():
+                snapshot = get_snapshot()
+
+                # 查询诊断索引数据（诊断编码、名称、ADRG）
+                self.maindiagindex_model.set_rows(snapshot.main_diag_rows(), columns=(1, 2, 0))
+                
+                # 查询手术索引数据（手术编码、名称、ADRG）
+                self.mainoperindex_model.set_rows(snapshot.main_oper_rows(), columns=(1, 2, 0))
+            else:
+                # 快照尚未加载时分页读库，先显示第一屏，其余随滚动读取
+                self.maindiagindex_model.set_source(iter_batches(
+                    (MainDiagIndex.diagcode, MainDiagIndex.diagname, MainDiagIndex.acode)))
+                self.mainoperindex_model.set_source(iter_batches(
+                    (MainSurgeryIndex.opercode, MainSurgeryIndex.opername, MainSurgeryIndex.acode)))
         except Exception as e:
-            QMessageBox.critical(self, "错误", f"查询 DRG 分组数据时出错: {e}")
-        finally:
-            session.close()
\ No newline at end of file
+            QMessageBox.critical(self, "错误", f"查询 DRG 分组数据时出错: {e}")
\ No newline at end of file